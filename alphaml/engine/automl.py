@@ -1,3 +1,5 @@
+import time
+import pickle
 import logging
 from alphaml.engine.components.components_manager import ComponentsManager
 from alphaml.engine.components.data_manager import DataManager
@@ -6,7 +8,10 @@ from alphaml.engine.components.ensemble.bagging import Bagging
 from alphaml.engine.components.ensemble.blending import Blending
 from alphaml.engine.components.ensemble.stacking import Stacking
 from alphaml.engine.components.ensemble.ensemble_selection import EnsembleSelection
+from alphaml.engine.components.ensemble.distillation import EnsembleDistiller
+from alphaml.engine.optimizer.warm_start import WarmStartStore, get_meta_features, get_canonical_config
 from alphaml.utils.label_util import to_categorical, map_label, get_classnum
+from alphaml.utils.constants import FAILED
 import numpy as np
 
 
@@ -53,6 +58,15 @@ class AutoML(object):
         self.metric = None
         self.logger = logging.getLogger(__name__)
         self.ensemble_model = None
+        # Wall-clock time spent in the search and in building the final model.
+        self.search_time = None
+        self.ensemble_time = None
+        self.data_manager = None
+        # The distilled model replaces the ensemble for inference once deployed.
+        self.student = None
+        # The options of the last full search, the incremental updates reuse them with a fraction of its budget.
+        self.search_kwargs = None
+        self.updating = False
 
     def fit(self, data, **kwargs):
         """
@@ -66,9 +80,26 @@ class AutoML(object):
 
         task_type = kwargs['task_type']
         self.metric = kwargs['metric']
+        self.data_manager = data
+        if not self.updating:
+            self.search_kwargs = dict((key, value) for key, value in kwargs.items() if key != 'initial_configs')
+        if self.evaluator is not None:
+            self.evaluator.shared_data = kwargs['shared_data'] if 'shared_data' in kwargs else False
+            self.evaluator.racing = kwargs['racing'] if 'racing' in kwargs else False
+            if 'racing_z' in kwargs:
+                self.evaluator.racing_z = kwargs['racing_z']
 
         # TODO: Automated FE
 
+        # Warm-start the search with the best configurations of similar datasets.
+        warm_start_store, meta_features = None, None
+        if 'warm_start' in kwargs and kwargs['warm_start'] is not None:
+            warm_start_store = WarmStartStore(kwargs['warm_start'])
+            meta_features = get_meta_features(data, task_type)
+            if 'initial_configs' not in kwargs:
+                kwargs['initial_configs'] = warm_start_store.suggest(
+                    meta_features, n_configs=kwargs['warm_start_size'] if 'warm_start_size' in kwargs else 5)
+
         self.logger.debug('The optimizer type is: %s' % self.optimizer_type)
         # Conduct model selection and hyper-parameter optimization.
         if self.optimizer_type == 'smbo':
@@ -107,35 +138,103 @@ class AutoML(object):
             self.optimizer = MONO_MAB_TPE_SMBO(self.evaluator, config_space, data, self.seed, **kwargs)
         else:
             raise ValueError('UNSUPPORTED optimizer: %s' % self.optimizer)
+        start_time = time.time()
         self.optimizer.run()
+        self.search_time = time.time() - start_time
+        if warm_start_store is not None:
+            dataset_id = kwargs['task_name'] if 'task_name' in kwargs else 'default'
+            warm_start_store.record(dataset_id, meta_features, self.optimizer.configs_list,
+                                    self.optimizer.config_values)
         # Construct the ensemble model according to the ensemble method.
         model_infos = (self.optimizer.configs_list, self.optimizer.config_values)
+        # Number of workers to fit the base models of the ensemble.
+        n_jobs = kwargs['n_jobs'] if 'n_jobs' in kwargs else 1
+        # Budgets to prune the ensemble for inference.
+        latency_budget = kwargs['latency_budget'] if 'latency_budget' in kwargs else None
+        memory_budget = kwargs['memory_budget'] if 'memory_budget' in kwargs else None
         if self.ensemble_method == 'none':
             self.ensemble_model = None
         else:
             if self.ensemble_method == 'bagging':
                 self.ensemble_model = Bagging(model_infos, self.ensemble_size, task_type, self.metric, self.evaluator,
-                                              save_dir=self.save_dir, random_state=self.seed)
+                                              save_dir=self.save_dir, random_state=self.seed,
+                                              n_jobs=n_jobs, worker_memory_limit=self.memory_limit)
             elif self.ensemble_method == 'blending':
                 self.ensemble_model = Blending(model_infos, self.ensemble_size, task_type, self.metric, self.evaluator,
-                                               save_dir=self.save_dir, random_state=self.seed)
+                                               save_dir=self.save_dir, random_state=self.seed,
+                                               n_jobs=n_jobs, worker_memory_limit=self.memory_limit)
             elif self.ensemble_method == 'stacking':
                 self.ensemble_model = Stacking(model_infos, self.ensemble_size, task_type, self.metric, self.evaluator,
-                                               save_dir=self.save_dir, random_state=self.seed)
+                                               save_dir=self.save_dir, random_state=self.seed,
+                                               n_jobs=n_jobs, worker_memory_limit=self.memory_limit,
+                                               latency_budget=latency_budget, memory_budget=memory_budget,
+                                               inference_mode=kwargs['stacking_inference_mode']
+                                               if 'stacking_inference_mode' in kwargs else 'refit')
             elif self.ensemble_method == 'ensemble_selection':
                 self.ensemble_model = EnsembleSelection(model_infos, self.ensemble_size, task_type, self.metric,
                                                         self.evaluator, save_dir=self.save_dir,
-                                                        random_state=self.seed)
+                                                        random_state=self.seed, latency_budget=latency_budget,
+                                                        memory_budget=memory_budget)
             else:
                 raise ValueError('UNSUPPORTED ensemble method: %s' % self.ensemble_method)
 
+        start_time = time.time()
         if self.ensemble_model is not None:
             # Train the ensemble model.
             self.ensemble_model.fit(data)
         else:
             self.evaluator.fit(self.optimizer.incumbent)
+        self.ensemble_time = time.time() - start_time
         return self
 
+    def update(self, data, **kwargs):
+        """
+        Update the model on the new training data by reusing the previous search:
+            1) the top-k previous configurations are evaluated first on the new data,
+            2) a short search continues from them,
+            3) the ensemble is rebuilt.
+        :param data: A DataManager, the new training data
+        :return: self
+        """
+        top_k = kwargs.pop('top_k') if 'top_k' in kwargs else 5
+        history = kwargs.pop('history') if 'history' in kwargs else None
+        update_ratio = kwargs.pop('update_ratio') if 'update_ratio' in kwargs else 0.2
+        if history is not None:
+            # The results saved by the optimizer of the previous search.
+            with open(history, 'rb') as f:
+                results = pickle.load(f)
+            configs, perfs = results['configs'], results['perfs']
+        elif self.optimizer is not None:
+            configs, perfs = self.optimizer.configs_list, self.optimizer.config_values
+        else:
+            raise ValueError('No previous search to update!')
+
+        initial_configs = list()
+        for index in np.argsort(-np.array(perfs, dtype=np.float64)):
+            config = get_canonical_config(configs[index])
+            if np.isfinite(perfs[index]) and perfs[index] != FAILED and config not in initial_configs:
+                initial_configs.append(config)
+            if len(initial_configs) == top_k:
+                break
+
+        update_kwargs = dict(self.search_kwargs) if self.search_kwargs is not None else dict()
+        update_kwargs.update(kwargs)
+        # Without a budget, the update takes a fraction of the budget of the last full search.
+        if 'runtime' not in kwargs and 'runcount' not in kwargs:
+            if 'runtime' in update_kwargs and update_kwargs['runtime'] is not None and update_kwargs['runtime'] > 0:
+                update_kwargs['runtime'] = update_kwargs['runtime'] * update_ratio
+            elif 'runcount' in update_kwargs and update_kwargs['runcount'] is not None:
+                update_kwargs['runcount'] = max(int(update_kwargs['runcount'] * update_ratio),
+                                                2 * len(initial_configs))
+        update_kwargs['initial_configs'] = initial_configs
+        self.logger.info('Update with %d previous configurations' % len(initial_configs))
+        self.student = None
+        self.updating = True
+        try:
+            return self.fit(data, **update_kwargs)
+        finally:
+            self.updating = False
+
     def predict(self, X, **kwargs):
         """
         Make predictions for X.
@@ -143,6 +242,8 @@ class AutoML(object):
         :param X: array-like or sparse matrix of shape = [n_samples, n_features]
         :return: pred: array of shape = [n_samples]
         """
+        if self.student is not None:
+            return self.student.predict(X)
         if self.ensemble_model is None:
             pred = self.evaluator.predict(self.optimizer.incumbent, X)
             return pred
@@ -158,6 +259,8 @@ class AutoML(object):
         :param X: array-like or sparse matrix of shape = [n_samples, n_features]
         :return: pred: array of shape = [n_samples, n_labels]
         """
+        if self.student is not None:
+            return self.student.predict_proba(X)
         if self.ensemble_model is None:
             # For traditional ML task:
             #   fit the optimized model on the whole training data and predict the input data's labels.
@@ -169,6 +272,30 @@ class AutoML(object):
             pred = self.ensemble_model.predict_proba(X)
             return pred
 
+    def distill(self, student='xgboost', augment_ratio=1., X_val=None, deploy=False):
+        """
+        Distill the ensemble model into a single student model.
+        :param student: str, name of the student model in _classifiers or _regressors
+        :param augment_ratio: float, number of generated samples relative to the training samples
+        :param X_val: array-like of shape = [n_samples, n_features], samples to measure the fidelity and speedup,
+            None means the test data or the training data of the data manager
+        :param deploy: bool, whether to replace the ensemble with the student for inference
+        :return: report: dictionary
+        """
+        if self.ensemble_model is None:
+            raise ValueError('Distillation requires an ensemble model!')
+        if X_val is None:
+            X_val = self.data_manager.test_X if self.data_manager.test_X is not None else self.data_manager.train_X
+        self.student = None
+        distiller = EnsembleDistiller(self.ensemble_model.task_type, student=student, augment_ratio=augment_ratio,
+                                      random_state=self.seed,
+                                      categorical_cardinality=self.data_manager.categorical_cardinality)
+        distiller.fit(self.ensemble_model, self.data_manager.train_X)
+        report = distiller.evaluate(self.ensemble_model, X_val)
+        if deploy:
+            self.student = distiller.student
+        return report
+
     def score(self, X, y):
         """
         Get the performance of prediction X according to label y
@@ -198,11 +325,11 @@ class AutoMLClassifier(AutoML):
         super().__init__(time_budget, each_run_budget, memory_limit, ensemble_method, ensemble_size, include_models,
                          exclude_models, optimizer_type, save_dir, seed)
         # Define evaluator for classification
-        if optimizer_type == 'smbo':
+        if optimizer_type in ['smbo', 'mono_smbo']:
             self.evaluator = BaseClassificationEvaluator(optimizer='smac',
                                                          kfold=k_fold if cross_valid else None,
                                                          save_dir=save_dir)
-        elif optimizer_type == 'tpe':
+        elif optimizer_type in ['tpe', 'mono_tpe_smbo']:
             self.evaluator = BaseClassificationEvaluator(optimizer='tpe',
                                                          kfold=k_fold if cross_valid else None,
                                                          save_dir=save_dir)
@@ -228,11 +355,11 @@ class AutoMLRegressor(AutoML):
         super().__init__(time_budget, each_run_budget, memory_limit, ensemble_method, ensemble_size, include_models,
                          exclude_models, optimizer_type, save_dir, seed)
         # Define evaluator for regression
-        if optimizer_type == 'smbo':
+        if optimizer_type in ['smbo', 'mono_smbo']:
             self.evaluator = BaseRegressionEvaluator(optimizer='smac',
                                                      kfold=k_fold if cross_valid else None,
                                                      save_dir=save_dir)
-        elif optimizer_type == 'tpe':
+        elif optimizer_type in ['tpe', 'mono_tpe_smbo']:
             self.evaluator = BaseRegressionEvaluator(optimizer='tpe',
                                                      kfold=k_fold if cross_valid else None,
                                                      save_dir=save_dir)
@@ -45,9 +45,11 @@ class ComponentsManager(object):
         return config_dict
 
     @staticmethod
-    def build_hierarchical_configspace(config_dict):
+    def build_hierarchical_configspace(config_dict, preprocessing_space=None):
         """
         Reference: pipeline/base=325, classification/__init__=121
+        :param config_dict: dictionary, the configuration space of each model
+        :param preprocessing_space: ConfigurationSpace, the preprocessing searched jointly with the models
         """
         cs = ConfigurationSpace()
         candidates = list(config_dict.keys())
@@ -60,4 +62,8 @@ class ComponentsManager(object):
             parent_hyperparameter = {'parent': model_option,
                                      'value': model_item}
             cs.add_configuration_space(model_item, sub_configuration_space, parent_hyperparameter=parent_hyperparameter)
+
+        if preprocessing_space is not None:
+            from alphaml.engine.components.pipeline.preprocessing_space import PREPROCESSING_PREFIX
+            cs.add_configuration_space(PREPROCESSING_PREFIX, preprocessing_space)
         return cs
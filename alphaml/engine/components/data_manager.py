@@ -19,8 +19,11 @@ class DataManager(object):
     def __init__(self, X=None, y=None, na_values=default_missing_values):
         self.na_values = na_values
         self.feature_types = None
+        # The number of categories of each column holding the integer codes of a categorical feature.
+        self.categorical_cardinality = None
         self.missing_flags = None
         self.train_X, self.train_y = None, None
+        self.val_X, self.val_y = None, None
         self.test_X, self.test_y = None, None
         self.label_name = None
 
@@ -1,7 +1,9 @@
 import numpy as np
+import pandas as pd
 
 from alphaml.engine.components.data_manager import DataManager
 
+from sklearn.model_selection import KFold
 from sklearn.preprocessing import OneHotEncoder, KBinsDiscretizer, OrdinalEncoder
 
 
@@ -22,7 +24,7 @@ def categorical_indexer(dm):
     categorical_index = [i for i in range(len(feature_types)) if feature_types[i] == "Categorical"]
 
     encoder = OrdinalEncoder()
-    (train_x, _), (valid_x, _), (test_x, _) = dm.get_train(), dm.get_val(), dm.get_test()
+    train_x, valid_x, test_x = dm.train_X, dm.val_X, dm.test_X
 
     train_size = len(train_x)
     valid_size = 0
@@ -41,6 +43,8 @@ def categorical_indexer(dm):
 
     x[:, categorical_index] = encoder.fit_transform(x[:, categorical_index])
     x = x.astype(np.float)
+    dm.categorical_cardinality = dict((index, len(category)) for index, category in
+                                      zip(categorical_index, encoder.categories_)) or None
 
     train_x, valid_x, test_x = _split_data(x, train_size, valid_size, test_size)
     if valid_size == 0:
@@ -66,7 +70,7 @@ def one_hot(dm: DataManager) -> DataManager:
     other_index = [i for i in range(len(feature_types)) if feature_types[i] != "Categorical"]
 
     encoder = OneHotEncoder(handle_unknown="ignore")
-    (train_x, _), (valid_x, _), (test_x, _) = dm.get_train(), dm.get_val(), dm.get_test()
+    train_x, valid_x, test_x = dm.train_X, dm.val_X, dm.test_X
 
     train_size = len(train_x)
     valid_size = 0
@@ -107,6 +111,140 @@ def one_hot(dm: DataManager) -> DataManager:
     return dm
 
 
+def get_frequency_table(codes, category_cnt):
+    """
+    :param codes: array of int, the codes of a categorical feature
+    :param category_cnt: int, number of categories
+    :return: float32 array of shape = [category_cnt + 1, 1], the frequency of each category,
+        and the frequency 0 of the unknown categories in the last row
+    """
+    table = np.zeros((category_cnt + 1, 1), dtype=np.float32)
+    table[:-1, 0] = np.bincount(codes, minlength=category_cnt) / max(len(codes), 1)
+    return table
+
+
+def get_targets(y, task='classification'):
+    """
+    :param y: array of shape = [n_samples]
+    :param task: str, 'classification' or 'regression'
+    :return: array of shape = [n_samples, n_targets], the label for regression, the positive class
+        for binary classification, and the indicator of each class for multi-class classification
+    """
+    if task == 'regression':
+        return np.asarray(y, dtype=np.float64).reshape(-1, 1)
+    classes, labels = np.unique(y, return_inverse=True)
+    if len(classes) <= 2:
+        return (labels == 1).astype(np.float64).reshape(-1, 1)
+    return (labels[:, None] == np.arange(len(classes))).astype(np.float64)
+
+
+def get_target_table(codes, category_cnt, targets, smoothing=10.):
+    """
+    The smoothed mean of the targets in each category.
+    :param codes: array of int, the codes of a categorical feature
+    :param category_cnt: int, number of categories
+    :param targets: array of shape = [n_samples, n_targets]
+    :param smoothing: float, the weight of the prior mean
+    :return: float32 array of shape = [category_cnt + 1, n_targets],
+        and the prior mean of the unknown categories in the last row
+    """
+    cnts = np.bincount(codes, minlength=category_cnt)
+    prior = targets.mean(axis=0)
+    # Without smoothing, the categories absent from the codes have no mean and take the prior mean.
+    weights = cnts + smoothing
+    empty = weights == 0
+    table = np.empty((category_cnt + 1, targets.shape[1]), dtype=np.float32)
+    for i in range(targets.shape[1]):
+        sums = np.bincount(codes, weights=targets[:, i], minlength=category_cnt)
+        table[:-1, i] = np.where(empty, prior[i], (sums + smoothing * prior[i]) / np.where(empty, 1, weights))
+    table[-1] = prior
+    return table
+
+
+def get_oof_target_values(codes, category_cnt, targets, smoothing=10., n_folds=5, random_state=1):
+    """
+    Encode each sample with the target means of the other folds, so its own label does not leak into its encoding.
+    :return: float32 array of shape = [n_samples, n_targets]
+    """
+    values = np.empty((len(codes), targets.shape[1]), dtype=np.float32)
+    kfold = KFold(n_splits=min(n_folds, len(codes)), shuffle=True, random_state=random_state)
+    for train_index, valid_index in kfold.split(codes):
+        table = get_target_table(codes[train_index], category_cnt, targets[train_index], smoothing)
+        values[valid_index] = table[codes[valid_index]]
+    return values
+
+
+def _encode_statistics(dm, encode):
+    """
+    Replace each categorical feature with the statistics of its categories on the training data.
+    :param encode: function taking the codes and the number of categories of a feature,
+        and returning the values of the training data and the table of each category
+    :return: processed Datamanager, the encoded features first then the other features
+    """
+    feature_types = dm.feature_types
+    categorical_index = [i for i in range(len(feature_types)) if feature_types[i] == "Categorical"]
+    other_index = [i for i in range(len(feature_types)) if feature_types[i] != "Categorical"]
+
+    train_x, valid_x, test_x = dm.train_X, dm.val_X, dm.test_X
+    if train_x is None:
+        raise ValueError("train_x has no value!!!")
+
+    train_blocks, tables, indexes = list(), list(), list()
+    for index in categorical_index:
+        category, codes = np.unique(train_x[:, index], return_inverse=True)
+        values, table = encode(codes, len(category))
+        train_blocks.append(values)
+        tables.append(table)
+        indexes.append(pd.Index(category))
+
+    def transform(x, blocks=None):
+        if x is None:
+            return None
+        if blocks is None:
+            # The unknown categories are coded as -1, which is the last row of the tables.
+            blocks = [table[index.get_indexer(x[:, i])] for i, index, table in zip(categorical_index, indexes, tables)]
+        return np.hstack(blocks + [x[:, other_index].astype(np.float64)])
+
+    dm.train_X = transform(train_x, train_blocks)
+    dm.val_X = transform(valid_x)
+    dm.test_X = transform(test_x)
+    width = sum(block.shape[1] for block in train_blocks)
+    dm.feature_types = ["Float"] * width + [feature_types[i] for i in other_index]
+    return dm
+
+
+def frequency_encoder(dm):
+    """
+    Convert each categorical feature to the frequency of its categories in the training data.
+    :param dm: DataManager
+    :return: processed Datamanager
+    """
+    def encode(codes, category_cnt):
+        table = get_frequency_table(codes, category_cnt)
+        return table[codes], table
+
+    return _encode_statistics(dm, encode)
+
+
+def target_encoder(dm, task='classification', n_folds=5, smoothing=10.):
+    """
+    Convert each categorical feature to the smoothed target mean of its categories.
+    The training data is encoded out of fold, and the other data with the means of all the training data.
+    :param dm: DataManager
+    :param task: str, 'classification' or 'regression'
+    :param n_folds: int, number of folds to encode the training data
+    :param smoothing: float, the weight of the prior mean
+    :return: processed Datamanager
+    """
+    targets = get_targets(dm.train_y, task)
+
+    def encode(codes, category_cnt):
+        return get_oof_target_values(codes, category_cnt, targets, smoothing, n_folds), \
+               get_target_table(codes, category_cnt, targets, smoothing)
+
+    return _encode_statistics(dm, encode)
+
+
 def bucketizer(dm, n_bins=5):
     """
     transform continuous data to discrete data, invoke the scikit-learn api.
@@ -114,7 +252,7 @@ def bucketizer(dm, n_bins=5):
     feature_types = dm.feature_types
     continuous_index = [i for i in range(len(feature_types)) if feature_types[i] == "Float"]
 
-    (train_x, _), (valid_x, _), (test_x, _) = dm.get_train(), dm.get_val(), dm.get_test()
+    train_x, valid_x, test_x = dm.train_X, dm.val_X, dm.test_X
     encoder = KBinsDiscretizer(n_bins, encode="ordinal")
 
     train_x[:, continuous_index] = \
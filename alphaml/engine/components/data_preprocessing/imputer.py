@@ -1,13 +1,62 @@
+import warnings
 import pandas as pd
 import numpy as np
 
-from sklearn.impute import SimpleImputer
 
-
-def _split_data(x, train_size, valid_size, test_size):
-    return x[:train_size, :], \
-           x[train_size: train_size + valid_size, :], \
-           x[train_size + valid_size: train_size + valid_size + test_size, :]
+def get_mode(col):
+    """
+    :param col: array, a column without missing values
+    :return: the most frequent value, NaN if the column is empty
+    """
+    codes, uniques = pd.factorize(col)
+    if len(uniques) == 0:
+        return np.nan
+    return uniques[np.argmax(np.bincount(codes))]
+
+
+def get_fill_values(x, strategy='mean'):
+    """
+    :param x: array of shape = [n_samples, n_features], the numerical columns with NaNs
+    :param strategy: str, 'mean' or 'median'
+    :return: array of shape = [n_features], 0 for the columns without any value
+    """
+    x = np.asarray(x, dtype=np.float64)
+    with warnings.catch_warnings():
+        # The columns without any value.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if strategy == 'mean':
+            fill_values = np.nanmean(x, axis=0)
+        elif strategy == 'median':
+            fill_values = np.nanmedian(x, axis=0)
+        else:
+            raise ValueError("Required strategy to be mean or median")
+    return np.where(np.isnan(fill_values), 0., fill_values)
+
+
+def get_missing_mask(x, missing_values=None):
+    """
+    :param x: array of shape = [n_samples, n_features]
+    :param missing_values: value or None, the value counted as missing besides NaN and None
+    :return: array of bool
+    """
+    mask = pd.isnull(x) if x.dtype == object else np.isnan(x)
+    if missing_values is not None and x.dtype == object:
+        mask |= x == missing_values
+    return mask
+
+
+def fill_missing(x, fill_values, missing_values=None):
+    """
+    Fill the missing values of each column in place.
+    :param x: array of shape = [n_samples, n_features], numerical or object
+    :param fill_values: array of shape = [n_features]
+    :return: array of shape = [n_samples, n_features], the missing mask
+    """
+    mask = get_missing_mask(x, missing_values)
+    rows, columns = np.nonzero(mask)
+    if len(rows) > 0:
+        x[rows, columns] = np.asarray(fill_values, dtype=x.dtype)[columns]
+    return mask
 
 
 def impute_categorical(col):
@@ -39,11 +88,11 @@ def impute_df(df) -> pd.DataFrame:
     for col in list(df.columns):
         dtype = df[col].dtype
         # If a column has NAN, it will be considered as 'float' though it only contains integers
-        if dtype in [np.int, np.int16, np.int32, np.int64]:
+        if pd.api.types.is_integer_dtype(dtype):
             df[col] = impute_col(df[col], "discrete")
-        elif dtype in [np.float, np.float16, np.float32, np.float64, np.float128, np.double]:
+        elif pd.api.types.is_float_dtype(dtype):
             df[col] = impute_col(df[col], "float")
-        elif dtype in [np.str, np.str_, np.string_, np.object]:
+        elif pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype):
             df[col] = impute_col(df[col], "categorical")
         else:
             raise TypeError("Unknow data type:", dtype)
@@ -51,52 +100,35 @@ def impute_df(df) -> pd.DataFrame:
 
 
 def impute_dm(dm, missing_str):
+    """
+    Fill the missing values with the statistics of the training data: the most frequent value of
+    the categorical features, the median of the discrete features and the mean of the continuous features.
+    The arrays are filled in place, without converting them to objects.
+    :param dm: DataManager
+    :param missing_str: str, the missing value of the categorical features besides NaN
+    :return: processed Datamanager
+    """
     feature_types = dm.feature_types
     continuous_index = [i for i in range(len(feature_types)) if feature_types[i] == "Float"]
     categorical_index = [i for i in range(len(feature_types)) if feature_types[i] == "Categorical"]
     discrete_index = [i for i in range(len(feature_types)) if feature_types[i] == "Discrete"]
 
-    (train_x, _), (valid_x, _), (test_x, _) = dm.get_train(), dm.get_val(), dm.get_test()
-    train_size = len(train_x)
-    valid_size = 0
-    test_size = 0
-
+    train_x, valid_x, test_x = dm.train_X, dm.val_X, dm.test_X
     if train_x is None:
         raise ValueError("train_x has no value!!!")
-    if valid_x is not None and test_x is not None:
-        x = np.concatenate([train_x, valid_x, test_x])
-        valid_size = len(valid_x)
-        test_size = len(test_x)
-    elif valid_x is not None:
-        x = np.concatenate([train_x, valid_x])
-        valid_size = len(valid_x)
-    else:
-        x = train_x
-
-    x = x.astype(np.object)
-    # impute categorical values
-    print("missing str:", missing_str)
-    imputer = SimpleImputer(missing_values=missing_str, strategy="most_frequent")
-    if len(categorical_index) > 0:
-        x[:, categorical_index] = imputer.fit_transform(x[:, categorical_index])
-
-    # impute discrete values
-    imputer.strategy = "median"
-    imputer.missing_values = np.nan
-    if len(discrete_index) > 0:
-        x[:, discrete_index] = imputer.fit_transform(x[:, discrete_index])
 
-    # impute continuous values
-    imputer.strategy = "mean"
-    imputer.missing_values = np.nan
+    fill_values = np.zeros(train_x.shape[1], dtype=object)
+    for index in categorical_index:
+        col = train_x[:, index]
+        fill_values[index] = get_mode(col[~get_missing_mask(col, missing_str)])
+    if len(discrete_index) > 0:
+        fill_values[discrete_index] = get_fill_values(train_x[:, discrete_index], 'median')
     if len(continuous_index) > 0:
-        x[:, continuous_index] = imputer.fit_transform(x[:, continuous_index])
+        fill_values[continuous_index] = get_fill_values(train_x[:, continuous_index], 'mean')
 
-    train_x, valid_x, test_x = _split_data(x, train_size, valid_size, test_size)
-    if valid_size == 0:
-        valid_x = None
-    if test_size == 0:
-        test_x = None
+    for x in [train_x, valid_x, test_x]:
+        if x is not None:
+            fill_missing(x, fill_values, missing_str)
 
     dm.train_X = train_x
     dm.val_X = valid_x
@@ -3,7 +3,8 @@ from alphaml.engine.components.data_preprocessing.encoder import *
 
 
 def preprocess_xgboost(dm):
-    dm = one_hot(dm)
+    # The trees split on the integer codes, which keeps the data as narrow as the raw features.
+    dm = categorical_indexer(dm)
     return dm
 
 
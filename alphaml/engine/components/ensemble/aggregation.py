@@ -0,0 +1,65 @@
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PredictionAggregator(object):
+    """
+    Aggregate the predictions of ensemble members into a single preallocated buffer.
+    The members are accumulated one at a time, so the memory is O(n_samples * n_outputs)
+    whatever the number of members.
+    """
+
+    def __init__(self, weights=None, voting='soft', n_jobs=1, dtype=np.float32):
+        """
+        :param weights: list of float, weights of the members, None means uniform weights
+        :param voting: str, 'soft' averages the outputs of the members,
+            'hard' counts the classes predicted by the members
+        :param n_jobs: int, number of threads to compute the predictions of the members
+        :param dtype: numpy dtype of the buffer
+        """
+        if voting not in ('soft', 'hard'):
+            raise ValueError('Unknown voting: %s' % voting)
+        self.weights = weights
+        self.voting = voting
+        self.n_jobs = n_jobs
+        self.dtype = dtype
+
+    def aggregate(self, models, X, predict_func):
+        """
+        :param models: list of ensemble members
+        :param X: array-like or sparse matrix of shape = [n_samples, n_features]
+        :param predict_func: callable, predict_func(model, X) returns an array of shape = [n_samples, n_outputs]
+        :return: array of shape = [n_samples, n_outputs], the weighted average of the member outputs
+        """
+        if len(models) == 0:
+            raise ValueError('No ensemble members to aggregate!')
+        weights = np.ones(len(models)) if self.weights is None else np.asarray(self.weights, dtype=np.float64)
+        if len(weights) != len(models):
+            raise ValueError('The number of weights and ensemble members do not match!')
+
+        buffer = [None]
+        lock = threading.Lock()
+
+        def accumulate(model, weight):
+            pred = np.asarray(predict_func(model, X))
+            if pred.ndim == 1:
+                pred = pred.reshape((pred.shape[0], 1))
+            with lock:
+                if buffer[0] is None:
+                    buffer[0] = np.zeros(pred.shape, dtype=self.dtype)
+                if self.voting == 'soft':
+                    buffer[0] += weight * pred
+                else:
+                    buffer[0][np.arange(pred.shape[0]), np.argmax(pred, axis=1)] += weight
+
+        if self.n_jobs is None or self.n_jobs <= 1 or len(models) == 1:
+            for model, weight in zip(models, weights):
+                accumulate(model, weight)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.n_jobs, len(models))) as executor:
+                # Consume the results to raise the exceptions from the threads.
+                list(executor.map(accumulate, models, weights))
+
+        buffer[0] /= weights.sum()
+        return buffer[0]
@@ -1,18 +1,22 @@
 from alphaml.utils.constants import *
-from alphaml.utils.save_ease import save_ease
+from alphaml.utils.save_ease import save_ease, get_configuration_id
+from alphaml.engine.components.ensemble.parallel_builder import ParallelEnsembleBuilder
+from alphaml.engine.components.ensemble.pruning import EnsemblePruner
 
 import os
 import pickle as pkl
 import functools
 import math
 import logging
+import numpy as np
 
 
 class BaseEnsembleModel(object):
     """Base class for model ensemble"""
 
     def __init__(self, model_info, ensemble_size, task_type, metric, evaluator, model_type='ml', threshold=0.2,
-                 save_dir=None, if_show=True, random_state=None):
+                 save_dir=None, if_show=True, random_state=None, n_jobs=1, worker_memory_limit=None,
+                 latency_budget=None, memory_budget=None):
         """
 
         :param model_info: tuple of lists recording configurations and their performance
@@ -25,6 +29,10 @@ class BaseEnsembleModel(object):
         :param save_dir: str, path to load models
         :param if_show: bool, print ensemble candidates
         :param random_state: int
+        :param n_jobs: int, number of workers to fit the base models, -1 means the number of CPUs
+        :param worker_memory_limit: int, memory limit (MB) of each worker
+        :param latency_budget: float, maximal prediction time (ms) per row of the pruned ensemble
+        :param memory_budget: float, maximal size (MB) of the pruned ensemble
         """
         self.model_info = model_info
         self.model_type = model_type
@@ -35,6 +43,10 @@ class BaseEnsembleModel(object):
         self.logger = logging.getLogger()
         self.save_dir = save_dir
         self.seed = random_state
+        self.builder = ParallelEnsembleBuilder(n_jobs=n_jobs, worker_memory_limit=worker_memory_limit)
+        self.pruner = None
+        if latency_budget is not None or memory_budget is not None:
+            self.pruner = EnsemblePruner(latency_budget=latency_budget, memory_budget=memory_budget)
 
         if task_type in ['binary', 'multiclass', 'img_binary', 'img_multiclass', 'img_multilabel-indicator']:
             self.task_type = CLASSIFICATION
@@ -142,6 +154,26 @@ class BaseEnsembleModel(object):
                 self.logger.info("Estimator retrained!")
         return estimator
 
+    def fit_estimators(self, jobs, x, y):
+        """
+        Build sklearn estimators and fit them in parallel with training data
+        :param jobs: list of (config, train_index), where train_index is None for all samples
+        :param x: Array-like or sparse matrix of shape = [n_samples, n_features]
+        :param y: Array of shape = [n_samples] or [n_samples, n_classes]
+        :return: list of sklearn models in the order of jobs
+        """
+        estimator_jobs = list()
+        for config, train_index in jobs:
+            _, estimator = self.evaluator.set_config(config, self.evaluator.optimizer)
+            estimator_jobs.append((estimator, train_index))
+        estimators = self.builder.fit(estimator_jobs, x, y)
+        for (config, _), estimator in zip(jobs, estimators):
+            save_path = os.path.join(self.save_dir, '%s.pkl' % get_configuration_id(config))
+            with open(save_path, 'wb') as f:
+                pkl.dump(estimator, f)
+        self.logger.info("%d estimators retrained!" % len(estimators))
+        return estimators
+
     def get_proba_predictions(self, estimator, X):
         """
         Predict probabilities of classes for all samples X.
@@ -157,3 +189,31 @@ class BaseEnsembleModel(object):
             if len(shape) == 1:
                 pred = pred.reshape((shape[0], 1))
             return pred
+
+    def calculate_score(self, pred, y_true):
+        if self.task_type == CLASSIFICATION:
+            from sklearn.metrics import roc_auc_score
+            if self.metric == roc_auc_score:
+                pred = pred[:, 1:2]
+            else:
+                pred = np.argmax(pred, axis=1)
+            score = self.metric(y_true, pred)
+        elif self.task_type == REGRESSION:
+            score = -self.metric(y_true, pred)
+        # We want to maximize score
+        return score
+
+    def prune(self, predictions, labels, models, X, group_size=1):
+        """
+        Prune the ensemble members under the latency and memory budget.
+        :param predictions: list of validation predictions of the members
+        :param labels: array of validation labels
+        :param models: list of sklearn models, each member consists of group_size consecutive models
+        :param X: array-like or sparse matrix, samples to measure the prediction time
+        :param group_size: int, number of models in each member
+        :return: weights: array of the member weights, zero for the pruned members
+        """
+        latency, memory = self.pruner.measure(models, X, self.get_proba_predictions)
+        latency = latency.reshape((-1, group_size)).sum(axis=1)
+        memory = memory.reshape((-1, group_size)).sum(axis=1)
+        return self.pruner.prune(predictions, labels, self.calculate_score, latency, memory)
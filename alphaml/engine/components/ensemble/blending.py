@@ -7,7 +7,7 @@ from sklearn.ensemble.gradient_boosting import GradientBoostingClassifier
 
 class Blending(BaseEnsembleModel):
     def __init__(self, model_info, ensemble_size, task_type, metric, evaluator, model_type='ml',
-                 meta_learner='xgboost', save_dir=None, random_state=None):
+                 meta_learner='xgboost', save_dir=None, random_state=None, n_jobs=1, worker_memory_limit=None):
         super().__init__(model_info=model_info,
                          ensemble_size=ensemble_size,
                          task_type=task_type,
@@ -15,7 +15,9 @@ class Blending(BaseEnsembleModel):
                          evaluator=evaluator,
                          model_type=model_type,
                          save_dir=save_dir,
-                         random_state=random_state)
+                         random_state=random_state,
+                         n_jobs=n_jobs,
+                         worker_memory_limit=worker_memory_limit)
 
         # We use Xgboost as default meta-learner
         if self.task_type == CLASSIFICATION:
@@ -45,9 +47,9 @@ class Blending(BaseEnsembleModel):
         feature_p2 = None
         if self.model_type == 'ml':
             # Train basic models using a part of training data
-            for i, config in enumerate(self.config_list):
-                estimator = self.get_estimator(config, x_p1, y_p1)
-                self.ensemble_models.append(estimator)
+            jobs = [(config, None) for config in self.config_list]
+            self.ensemble_models.extend(self.fit_estimators(jobs, x_p1, y_p1))
+            for i, estimator in enumerate(self.ensemble_models):
                 pred = self.get_proba_predictions(estimator, x_p2)
                 if self.task_type == CLASSIFICATION:
                     n_dim = np.array(pred).shape[1]
@@ -0,0 +1,132 @@
+import time
+import logging
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from alphaml.engine.evaluator.base import add_preprocessing
+from alphaml.utils.constants import *
+
+
+class EnsembleDistiller(object):
+    """
+    Distill an ensemble (the teacher) into a single model (the student).
+    The student is trained on the teacher's predictions over the training data and samples generated
+    with MUNGE: each sample is mixed with its nearest neighbor, attribute by attribute.
+    For classification, the labels of the generated samples are drawn from the teacher's soft predictions.
+    """
+
+    def __init__(self, task_type, student='xgboost', augment_ratio=1., swap_prob=0.5, spread=1.,
+                 random_state=None, categorical_cardinality=None):
+        """
+        :param task_type: int, CLASSIFICATION or REGRESSION
+        :param student: str, name of the student model in _classifiers or _regressors
+        :param augment_ratio: float, number of generated samples relative to the training samples
+        :param swap_prob: float from (0,1), probability to take an attribute from the nearest neighbor
+        :param spread: float, the generated attribute is drawn with std |x - neighbor| / spread
+        :param random_state: int
+        :param categorical_cardinality: dictionary, the number of categories of each column of integer codes,
+            the codes are swapped with the nearest neighbor but never perturbed, and encoded for the student
+        """
+        self.task_type = task_type
+        self.student_name = student
+        self.augment_ratio = augment_ratio
+        self.swap_prob = swap_prob
+        self.spread = spread
+        self.random_state = np.random.RandomState(random_state)
+        self.categorical_cardinality = categorical_cardinality
+        self.student = None
+        self.logger = logging.getLogger(__name__)
+
+    def build_student(self):
+        if self.task_type == CLASSIFICATION:
+            from alphaml.engine.components.models.classification import _classifiers as models
+        else:
+            from alphaml.engine.components.models.regression import _regressors as models
+        if self.student_name not in models:
+            raise ValueError('Undefined student model: %s' % self.student_name)
+        # The student uses the default configuration of its search space.
+        config = models[self.student_name].get_hyperparameter_search_space().get_default_configuration()
+        config = config.get_dictionary()
+        student = models[self.student_name](*[None] * len(config))
+        student.set_hyperparameters(config)
+        # The categorical codes are encoded for the student as in the search.
+        task = 'classification' if self.task_type == CLASSIFICATION else 'regression'
+        return add_preprocessing(dict(), student, task, self.categorical_cardinality)
+
+    def augment(self, X):
+        """
+        Generate samples with MUNGE.
+        :param X: array of shape = [n_samples, n_features]
+        :return: array of shape = [n_samples * augment_ratio, n_features]
+        """
+        X = np.asarray(X, dtype=np.float64)
+        sample_num = int(len(X) * self.augment_ratio)
+        if sample_num == 0:
+            return np.zeros((0, X.shape[1]))
+        _, neighbors = NearestNeighbors(n_neighbors=2).fit(X).kneighbors(X)
+        index = self.random_state.randint(0, len(X), sample_num)
+        origin, neighbor = X[index], X[neighbors[index, 1]]
+        swap = self.random_state.rand(*origin.shape) < self.swap_prob
+        noise = self.random_state.normal(size=origin.shape) * np.abs(origin - neighbor) / self.spread
+        if self.categorical_cardinality:
+            # A perturbed code is not a category.
+            noise[:, sorted(self.categorical_cardinality)] = 0.
+        return np.where(swap, neighbor + noise, origin)
+
+    def fit(self, teacher, X):
+        """
+        Train the student on the teacher's predictions.
+        :param teacher: fitted ensemble with predict and predict_proba
+        :param X: array of shape = [n_samples, n_features], the training data
+        :return: self
+        """
+        generated_X = self.augment(X)
+        if self.task_type == CLASSIFICATION:
+            y = np.argmax(teacher.predict_proba(X), axis=1)
+            if len(generated_X) > 0:
+                proba = teacher.predict_proba(generated_X)
+                proba = proba / proba.sum(axis=1, keepdims=True)
+                # Sample the labels from the soft predictions to transfer the teacher's uncertainty.
+                cumulative = np.cumsum(proba, axis=1)
+                generated_y = (self.random_state.rand(len(proba), 1) > cumulative).sum(axis=1)
+                generated_y = np.minimum(generated_y, proba.shape[1] - 1)
+                y = np.concatenate([y, generated_y])
+        else:
+            y = np.reshape(teacher.predict(X), (len(X),))
+            if len(generated_X) > 0:
+                y = np.concatenate([y, np.reshape(teacher.predict(generated_X), (len(generated_X),))])
+
+        self.student = self.build_student()
+        self.student.fit(np.vstack([np.asarray(X, dtype=np.float64), generated_X]), y)
+        return self
+
+    def evaluate(self, teacher, X):
+        """
+        Compare the student with the teacher.
+        :param teacher: fitted ensemble
+        :param X: array of shape = [n_samples, n_features], the validation data
+        :return: dictionary, the fidelity to the teacher and the prediction time of both models
+        """
+        start_time = time.time()
+        teacher_pred = teacher.predict(X)
+        teacher_time = time.time() - start_time
+        start_time = time.time()
+        student_pred = self.student.predict(X)
+        student_time = time.time() - start_time
+
+        teacher_pred = np.reshape(teacher_pred, (len(X),))
+        student_pred = np.reshape(student_pred, (len(X),))
+        report = dict()
+        if self.task_type == CLASSIFICATION:
+            # The fraction of samples where the student agrees with the teacher.
+            report['fidelity'] = float(np.mean(teacher_pred == student_pred))
+        else:
+            # The R2 score of the student with respect to the teacher.
+            residual = np.sum((teacher_pred - student_pred) ** 2)
+            total = np.sum((teacher_pred - np.mean(teacher_pred)) ** 2)
+            report['fidelity'] = float(1 - residual / total) if total > 0 else float(residual == 0)
+        report['teacher_time'] = teacher_time
+        report['student_time'] = student_time
+        report['speedup'] = teacher_time / student_time if student_time > 0 else float('inf')
+        self.logger.info('Distillation ==> fidelity: %.4f, speedup: %.2f' % (report['fidelity'], report['speedup']))
+        return report
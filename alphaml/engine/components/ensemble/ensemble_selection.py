@@ -2,13 +2,15 @@ from alphaml.engine.components.ensemble.base_ensemble import *
 from alphaml.engine.components.data_manager import DataManager
 import numpy as np
 from collections import Counter
+from alphaml.engine.components.ensemble.aggregation import PredictionAggregator
 from sklearn.model_selection import train_test_split
 
 
 # EnsembleSelection cannot be used with a k-fold evaluator
 class EnsembleSelection(BaseEnsembleModel):
     def __init__(self, model_info, ensemble_size, task_type, metric, evaluator, model_type='ml', mode='fast',
-                 sorted_initialization=False, n_best=20, save_dir=None, random_state=None):
+                 sorted_initialization=False, n_best=20, save_dir=None, random_state=None, latency_budget=None,
+                 memory_budget=None):
         super().__init__(model_info=model_info,
                          ensemble_size=ensemble_size,
                          task_type=task_type,
@@ -17,7 +19,9 @@ class EnsembleSelection(BaseEnsembleModel):
                          model_type=model_type,
                          save_dir=save_dir,
                          if_show=False,
-                         random_state=random_state)
+                         random_state=random_state,
+                         latency_budget=latency_budget,
+                         memory_budget=memory_budget)
         self.sorted_initialization = sorted_initialization
         self.config_list = self.model_info[0]  # Get the original config list
         if n_best < self.ensemble_size:
@@ -47,6 +51,11 @@ class EnsembleSelection(BaseEnsembleModel):
                 except ValueError as err:
                     pass
             self._fit(predictions, val_y)
+            if self.pruner is not None:
+                # Select the members and weights under the latency and memory budget.
+                self.weights_ = self.prune(predictions, val_y, self.ensemble_models, val_X)
+                self.ensemble_models = [model for model, weight in zip(self.ensemble_models, self.weights_)
+                                        if weight > 0]
             # TODO: refit the models
         elif self.model_type == 'dl':
             pass
@@ -189,41 +198,26 @@ class EnsembleSelection(BaseEnsembleModel):
 
         self.weights_ = weights
 
-    def calculate_score(self, pred, y_true):
-        if self.task_type == CLASSIFICATION:
-            from sklearn.metrics import roc_auc_score
-            if self.metric == roc_auc_score:
-                pred = pred[:, 1:2]
-            else:
-                pred = np.argmax(pred, axis=1)
-            score = self.metric(y_true, pred)
-        elif self.task_type == REGRESSION:
-            score = -self.metric(y_true, pred)
-        # We want to maximize score
-        return score
-
     def get_predictions(self, X):
-        predictions = []
-        for estimator in self.ensemble_models:
-            pred = self.get_proba_predictions(estimator, X)
-            predictions.append(pred)
-        predictions = np.asarray(predictions)
-
-        # if predictions.shape[0] == len(self.weights_),
-        # predictions include those of zero-weight models.
-        if predictions.shape[0] == len(self.weights_):
-            pred = np.average(predictions, axis=0, weights=self.weights_)
-
-        # if prediction model.shape[0] == len(non_null_weights),
-        # predictions do not include those of zero-weight models.
-        elif predictions.shape[0] == np.count_nonzero(self.weights_):
-            non_null_weights = [w for w in self.weights_ if w > 0]
-            pred = np.average(predictions, axis=0, weights=non_null_weights)
+        # if len(self.ensemble_models) == len(self.weights_),
+        # the models include zero-weight models, which are skipped.
+        if len(self.ensemble_models) == len(self.weights_):
+            models = [model for model, weight in zip(self.ensemble_models, self.weights_) if weight > 0]
+            weights = [weight for weight in self.weights_ if weight > 0]
+
+        # if len(self.ensemble_models) == len(non_null_weights),
+        # the models do not include zero-weight models.
+        elif len(self.ensemble_models) == np.count_nonzero(self.weights_):
+            models = self.ensemble_models
+            weights = [weight for weight in self.weights_ if weight > 0]
 
         # If none of the above applies, then something must have gone wrong.
         else:
             raise ValueError("The dimensions of ensemble predictions"
                              " and ensemble weights do not match!")
+        dtype = np.float64 if self.task_type == REGRESSION else np.float32
+        aggregator = PredictionAggregator(weights=weights, dtype=dtype)
+        pred = aggregator.aggregate(models, X, self.get_proba_predictions)
         if len(pred.shape) > 1 and pred.shape[1] == 1:
             pred = np.reshape(pred, (pred.shape[0]))
         return pred
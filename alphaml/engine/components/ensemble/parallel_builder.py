@@ -0,0 +1,76 @@
+import multiprocessing
+import logging
+import psutil
+import numpy as np
+from joblib import Parallel, delayed
+
+# The memory (MB) a worker needs besides its copy of the training data.
+WORKER_BASE_MEMORY = 200
+# The copies of the training data a worker holds while fitting: the split and the estimator's own copies.
+DATA_COPY_FACTOR = 3
+
+
+def _fit_estimator(estimator, X, y, train_index):
+    if train_index is not None:
+        X, y = X[train_index], y[train_index]
+    estimator.fit(X, y)
+    return estimator
+
+
+class ParallelEnsembleBuilder(object):
+    """
+    Fit the base models of an ensemble with a pool of worker processes.
+    Each job fits one estimator on the rows given by its train index. The training data is
+    memory-mapped to the workers instead of being copied into each job, and the number of workers
+    is limited by the memory available.
+    """
+
+    def __init__(self, n_jobs=1, worker_memory_limit=None):
+        """
+        :param n_jobs: int, maximal number of workers, -1 means the number of CPUs
+        :param worker_memory_limit: int, memory limit (MB) of each worker, like the limit of each evaluation run,
+            None means the memory estimated from the size of the training data
+        """
+        self.n_jobs = n_jobs
+        self.worker_memory_limit = worker_memory_limit
+        self.logger = logging.getLogger(__name__)
+
+    def get_n_jobs(self, X, job_cnt):
+        """
+        Determine the number of workers from the CPUs, the jobs and the memory limit.
+        :param X: array-like or sparse matrix, the training data
+        :param job_cnt: int, number of jobs
+        :return: int
+        """
+        n_jobs = multiprocessing.cpu_count() if self.n_jobs is None or self.n_jobs < 0 else self.n_jobs
+        n_jobs = min(n_jobs, job_cnt)
+        if n_jobs <= 1:
+            return 1
+
+        data_size = X.data.nbytes if hasattr(X, 'tocsr') else np.asarray(X).nbytes
+        worker_memory = WORKER_BASE_MEMORY + DATA_COPY_FACTOR * data_size / 1024 / 1024
+        if self.worker_memory_limit is not None:
+            # Each worker may take up to its limit.
+            worker_memory = max(worker_memory, self.worker_memory_limit)
+        memory = psutil.virtual_memory().available / 1024 / 1024
+        return max(1, min(n_jobs, int(memory // worker_memory)))
+
+    def fit(self, jobs, X, y):
+        """
+        Fit the estimators of all jobs.
+        :param jobs: list of (estimator, train_index), where train_index is None for all rows
+        :param X: array-like or sparse matrix of shape = [n_samples, n_features]
+        :param y: array of shape = [n_samples]
+        :return: list of fitted estimators in the order of jobs
+        """
+        n_jobs = self.get_n_jobs(X, len(jobs))
+        self.logger.info('Fit %d base models with %d workers.' % (len(jobs), n_jobs))
+        if n_jobs == 1:
+            return [_fit_estimator(estimator, X, y, train_index) for estimator, train_index in jobs]
+
+        # Avoid oversubscribing the CPUs with estimators that are parallel themselves.
+        for estimator, _ in jobs:
+            if hasattr(estimator, 'n_jobs'):
+                setattr(estimator, 'n_jobs', 1)
+        return Parallel(n_jobs=n_jobs, max_nbytes='1M')(
+            delayed(_fit_estimator)(estimator, X, y, train_index) for estimator, train_index in jobs)
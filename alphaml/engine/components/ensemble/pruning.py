@@ -0,0 +1,111 @@
+import time
+import pickle as pkl
+import logging
+import numpy as np
+
+
+class EnsemblePruner(object):
+    """
+    Prune an ensemble under a latency or memory budget.
+    The members are selected greedily with replacement (as in ensemble selection), and only the members
+    which keep the ensemble within the budget are candidates. The score, latency and memory of each step
+    are recorded as the score-latency trade-off curve, and the best step gives the weights of the members.
+    """
+
+    def __init__(self, latency_budget=None, memory_budget=None, max_size=50, n_rows=1000):
+        """
+        :param latency_budget: float, maximal prediction time (ms) per row of the ensemble, None means no limit
+        :param memory_budget: float, maximal size (MB) of the ensemble members, None means no limit
+        :param max_size: int, maximal number of greedy steps
+        :param n_rows: int, number of rows used to measure the prediction time of each member
+        """
+        self.latency_budget = latency_budget
+        self.memory_budget = memory_budget
+        self.max_size = max_size
+        self.n_rows = n_rows
+        self.curve = list()
+        self.logger = logging.getLogger(__name__)
+
+    def measure(self, models, X, predict_func):
+        """
+        Measure the cost of each member.
+        :param models: list of ensemble members
+        :param X: array-like or sparse matrix of shape = [n_samples, n_features]
+        :param predict_func: callable, predict_func(model, X) makes predictions of a member
+        :return: latency: array of the prediction time (ms) per row, memory: array of the size (MB)
+        """
+        X = X[:self.n_rows]
+        latency, memory = list(), list()
+        for model in models:
+            start_time = time.time()
+            predict_func(model, X)
+            latency.append((time.time() - start_time) * 1000 / X.shape[0])
+            memory.append(len(pkl.dumps(model)) / 1024 / 1024)
+        return np.array(latency), np.array(memory)
+
+    def is_feasible(self, latency, memory):
+        if self.latency_budget is not None and latency > self.latency_budget:
+            return False
+        if self.memory_budget is not None and memory > self.memory_budget:
+            return False
+        return True
+
+    def prune(self, predictions, labels, score_func, latency, memory):
+        """
+        :param predictions: list of arrays, validation predictions of the members
+        :param labels: array, validation labels
+        :param score_func: callable, score_func(pred, y_true) returns the score to maximize
+        :param latency: array, prediction time (ms) per row of the members
+        :param memory: array, size (MB) of the members
+        :return: weights: array of the member weights, zero for the pruned members
+        """
+        member_cnt = len(predictions)
+        counts = np.zeros(member_cnt)
+        ensemble_sum = np.zeros(np.asarray(predictions[0]).shape)
+        selected = np.zeros(member_cnt, dtype=bool)
+        best_score, best_counts = -np.inf, None
+        self.curve = list()
+
+        for step in range(self.max_size):
+            used_latency, used_memory = latency[selected].sum(), memory[selected].sum()
+            step_score, step_member = -np.inf, None
+            for j in range(member_cnt):
+                # Adding a selected member again only changes its weight.
+                if not selected[j] and not self.is_feasible(used_latency + latency[j], used_memory + memory[j]):
+                    continue
+                score = score_func((ensemble_sum + predictions[j]) / (step + 1), labels)
+                if score > step_score:
+                    step_score, step_member = score, j
+            if step_member is None:
+                break
+
+            counts[step_member] += 1
+            ensemble_sum += predictions[step_member]
+            selected[step_member] = True
+            self.curve.append({'size': int(selected.sum()),
+                               'latency': float(latency[selected].sum()),
+                               'memory': float(memory[selected].sum()),
+                               'score': float(step_score)})
+            if step_score > best_score:
+                best_score, best_counts = step_score, counts.copy()
+
+        if best_counts is None:
+            raise ValueError('No ensemble member fits in the budget!')
+        self.log_curve()
+        return best_counts / best_counts.sum()
+
+    def get_tradeoff_curve(self):
+        """
+        :return: list of dictionaries, the best score for each number of members
+        """
+        tradeoff = dict()
+        for point in self.curve:
+            if point['size'] not in tradeoff or point['score'] > tradeoff[point['size']]['score']:
+                tradeoff[point['size']] = point
+        return [tradeoff[size] for size in sorted(tradeoff)]
+
+    def log_curve(self):
+        self.logger.info('Score-latency trade-off of the pruned ensemble:')
+        for point in self.get_tradeoff_curve():
+            self.logger.info('Members: %d, latency: %.4f ms/row, memory: %.2f MB, score: %.4f'
+                             % (point['size'], point['latency'], point['memory'], point['score']))
@@ -6,7 +6,13 @@ from sklearn.model_selection import StratifiedKFold, KFold
 
 class Stacking(BaseEnsembleModel):
     def __init__(self, model_info, ensemble_size, task_type, metric, evaluator, model_type='ml', meta_learner='xgboost',
-                 kfold=3, save_dir=None, random_state=None):
+                 kfold=3, save_dir=None, random_state=None, n_jobs=1, worker_memory_limit=None, latency_budget=None,
+                 memory_budget=None, inference_mode='refit'):
+        """
+        :param inference_mode: str, 'refit' refits each config on the full training data after the meta-learner
+            is trained, so that inference runs one model per config; 'fold_average' keeps the kfold models of
+            each config and averages their predictions
+        """
         super().__init__(model_info=model_info,
                          ensemble_size=ensemble_size,
                          task_type=task_type,
@@ -14,9 +20,16 @@ class Stacking(BaseEnsembleModel):
                          evaluator=evaluator,
                          model_type=model_type,
                          save_dir=save_dir,
-                         random_state=random_state)
+                         random_state=random_state,
+                         n_jobs=n_jobs,
+                         worker_memory_limit=worker_memory_limit,
+                         latency_budget=latency_budget,
+                         memory_budget=memory_budget)
 
         self.kfold = kfold
+        if inference_mode not in ('refit', 'fold_average'):
+            raise ValueError('Unknown inference mode: %s' % inference_mode)
+        self.inference_mode = inference_mode
         # We use Xgboost as default meta-learner
         if self.task_type == CLASSIFICATION:
             if meta_learner == 'logistic':
@@ -46,13 +59,21 @@ class Stacking(BaseEnsembleModel):
         feature_p2 = None
         if self.model_type == 'ml':
             # Train basic models using a part of training data
-            for i, config in enumerate(self.config_list):
-                for j, (train, test) in enumerate(kf.split(dm.train_X, dm.train_y)):
-                    x_p1, x_p2, y_p1, _ = dm.train_X[train], dm.train_X[test], dm.train_y[train], dm.train_y[test]
-                    estimator = self.get_estimator(config, x_p1, y_p1)
-                    # The final list will contain self.kfold * self.ensemble_size models
-                    self.ensemble_models.append(estimator)
+            splits = list(kf.split(dm.train_X, dm.train_y))
+            jobs = [(config, train) for config in self.config_list for train, _ in splits]
+            # The list contains self.kfold * self.ensemble_size fold models
+            self.ensemble_models.extend(self.fit_estimators(jobs, dm.train_X, dm.train_y))
+            # The out-of-fold predictions of each config.
+            oof_predictions = list()
+            for i in range(len(self.config_list)):
+                oof_pred = None
+                for j, (train, test) in enumerate(splits):
+                    estimator = self.ensemble_models[i * self.kfold + j]
+                    x_p2 = dm.train_X[test]
                     pred = self.get_proba_predictions(estimator, x_p2)
+                    if oof_pred is None:
+                        oof_pred = np.zeros((len(dm.train_y), np.array(pred).shape[1]))
+                    oof_pred[test] = pred
                     if self.task_type == CLASSIFICATION:
                         n_dim = np.array(pred).shape[1]
                         if n_dim == 2:
@@ -74,46 +95,54 @@ class Stacking(BaseEnsembleModel):
                             num_samples = len(train) + len(test)
                             feature_p2 = np.zeros((num_samples, self.ensemble_size * n_dim))
                         feature_p2[test, i * n_dim:(i + 1) * n_dim] = pred
+                oof_predictions.append(oof_pred)
+
+            if self.pruner is not None:
+                # Select the configs under the latency and memory budget, all fold models of a config are kept.
+                if self.inference_mode == 'refit':
+                    # The cost of a refit model is approximated by that of its first fold model.
+                    weights = self.prune(oof_predictions, dm.train_y, self.ensemble_models[::self.kfold], dm.train_X)
+                else:
+                    weights = self.prune(oof_predictions, dm.train_y, self.ensemble_models, dm.train_X,
+                                         group_size=self.kfold)
+                selected = [i for i in range(len(self.config_list)) if weights[i] > 0]
+                columns = np.concatenate([np.arange(i * n_dim, (i + 1) * n_dim) for i in selected])
+                feature_p2 = feature_p2[:, columns]
+                self.config_list = [self.config_list[i] for i in selected]
+                self.ensemble_models = [self.ensemble_models[i * self.kfold + j]
+                                        for i in selected for j in range(self.kfold)]
+                self.ensemble_size = len(selected)
             # Train model for stacking using the other part of training data
             self.meta_learner.fit(feature_p2, dm.train_y)
+            if self.inference_mode == 'refit':
+                # Replace the fold models with one model per config trained on the full data.
+                jobs = [(config, None) for config in self.config_list]
+                self.ensemble_models = self.fit_estimators(jobs, dm.train_X, dm.train_y)
         elif self.model_type == 'dl':
             pass
         return self
 
     def get_feature(self, X):
         # Predict the labels via stacking
+        # In fold_average mode, the kfold models of each config are averaged.
+        model_num = self.kfold if self.inference_mode == 'fold_average' else 1
         feature_p2 = None
         for i, model in enumerate(self.ensemble_models):
             pred = self.get_proba_predictions(model, X)
+            index = i // model_num
             if self.task_type == CLASSIFICATION:
                 n_dim = np.array(pred).shape[1]
                 if n_dim == 2:
                     n_dim = 1
-                if feature_p2 is None:
-                    num_samples = len(X)
-                    feature_p2 = np.zeros((num_samples, self.ensemble_size * n_dim))
-                index = i % self.kfold
-                # Get average predictions
-                if n_dim == 1:
-                    feature_p2[:, index * n_dim:(index + 1) * n_dim] = feature_p2[:,
-                                                                       index * n_dim:(index + 1) * n_dim] + \
-                                                                       pred[:, 1:2] / self.kfold
-                else:
-                    feature_p2[:, index * n_dim:(index + 1) * n_dim] = feature_p2[:,
-                                                                       index * n_dim:(index + 1) * n_dim] + \
-                                                                       pred / self.kfold
+                    pred = pred[:, 1:2]
             elif self.task_type == REGRESSION:
-                shape = np.array(pred).shape
-                n_dim = shape[1]
-                # Initialize training matrix for phase 2
-                if feature_p2 is None:
-                    num_samples = len(X)
-                    feature_p2 = np.zeros((num_samples, self.ensemble_size * n_dim))
-                index = i % self.kfold
-                # Get average predictions
-                feature_p2[:, index * n_dim:(index + 1) * n_dim] = feature_p2[:,
-                                                                   index * n_dim:(index + 1) * n_dim] + \
-                                                                   pred / self.kfold
+                n_dim = np.array(pred).shape[1]
+            # Initialize training matrix for phase 2
+            if feature_p2 is None:
+                num_samples = len(X)
+                feature_p2 = np.zeros((num_samples, self.ensemble_size * n_dim))
+            # Get average predictions
+            feature_p2[:, index * n_dim:(index + 1) * n_dim] += pred / model_num
         return feature_p2
 
     def predict(self, X):
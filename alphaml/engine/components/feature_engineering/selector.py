@@ -1,8 +1,9 @@
+import hashlib
+import threading
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-
-
-from sklearn.feature_selection import SelectKBest
 from sklearn.feature_selection import f_classif, mutual_info_classif, chi2
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
@@ -84,58 +85,141 @@ from sklearn.linear_model import LogisticRegression
 #
 #     return selected
 
+def get_fingerprint(*arrays):
+    """
+    Compute the fingerprint of arrays.
+    :return: str
+    """
+    sha = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        sha.update(('%s-%s' % (array.shape, array.dtype)).encode('utf8'))
+        sha.update(array.tobytes() if array.dtype != object else str(array.tolist()).encode('utf8'))
+    return sha.hexdigest()
+
+
+class ScoreCache(object):
+    """A LRU cache of feature scores, shared by the selectors running in threads."""
+
+    def __init__(self, limit=128):
+        self.limit = limit
+        self.scores = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        :param key: the key of the scores
+        :param compute: callable, compute the scores on a miss
+        :return: array
+        """
+        with self.lock:
+            if key in self.scores:
+                self.scores.move_to_end(key)
+                return self.scores[key]
+        # The scores are computed without the lock, so the selectors on other data are not blocked.
+        scores = compute()
+        with self.lock:
+            self.scores[key] = scores
+            self.scores.move_to_end(key)
+            if len(self.scores) > self.limit:
+                self.scores.popitem(last=False)
+        return scores
+
+    def clear(self):
+        with self.lock:
+            self.scores.clear()
+
+
+# The scores are shared by the selectors, so the same data is scored once for each score function.
+score_cache = ScoreCache()
+
+
+def _get_func_name(func):
+    return '%s.%s' % (getattr(func, '__module__', ''), getattr(func, '__qualname__', repr(func)))
+
+
+def compute_scores(score_func, X, y, n_jobs=1, block_size=None):
+    """
+    Compute the univariate scores of the features, in parallel over blocks of columns.
+    :param score_func: callable, returns the scores or (scores, pvalues)
+    :param X: array of shape = [n_samples, n_features]
+    :param y: array of shape = [n_samples]
+    :param n_jobs: int, number of threads
+    :param block_size: int, number of columns in a block, None means n_features / n_jobs
+    :return: array of shape = [n_features], NaNs are replaced by -inf
+    """
+    def score(block):
+        result = score_func(X[:, block], y)
+        return np.asarray(result[0] if isinstance(result, tuple) else result, dtype=np.float64)
+
+    n_features = X.shape[1]
+    if block_size is None:
+        block_size = max(1, -(-n_features // n_jobs))
+    blocks = [np.arange(start, min(start + block_size, n_features)) for start in range(0, n_features, block_size)]
+    if n_jobs > 1 and len(blocks) > 1:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            scores = list(executor.map(score, blocks))
+    else:
+        scores = [score(block) for block in blocks]
+    scores = np.concatenate(scores) if len(scores) > 0 else np.zeros(0)
+    return np.where(np.isnan(scores), -np.inf, scores)
+
+
+def get_scores(score_func, X, y, n_jobs=1):
+    """
+    Get the scores of the features from the cache, or compute them.
+    """
+    key = (get_fingerprint(X, y), _get_func_name(score_func))
+    return score_cache.get(key, lambda: compute_scores(score_func, X, y, n_jobs))
+
+
 class BaseSelector:
 
     def __init__(self):
         self.estimator = None
+        self.sorted_features = None
 
     def fit(self, X, y):
         raise NotImplementedError()
 
     def transform(self, X, k):
-        raise NotImplementedError()
+        return X[:, self.sorted_features[:k]]
 
 
-class FtestSelector(BaseSelector):
+class ScoreSelector(BaseSelector):
+    """Select the k best features by their univariate scores, which are computed once for any k."""
 
-    def __init__(self):
-        super(FtestSelector, self).__init__()
-        self.estimator = SelectKBest(score_func=f_classif)
+    def __init__(self, score_func, n_jobs=1):
+        super(ScoreSelector, self).__init__()
+        self.score_func = score_func
+        self.n_jobs = n_jobs
+        self.scores = None
 
     def fit(self, X, y):
-        self.estimator.fit(X, y)
+        self.scores = get_scores(self.score_func, X, y, self.n_jobs)
+        self.sorted_features = np.argsort(-self.scores, kind='mergesort')
 
     def transform(self, X, k):
-        self.estimator.k = k
-        return self.estimator.transform(X)
+        # Keep the selected features in their original order, as SelectKBest does.
+        return X[:, np.sort(self.sorted_features[:k])]
 
 
-class MutualInformationSelector(BaseSelector):
+class FtestSelector(ScoreSelector):
 
-    def __init__(self):
-        super(MutualInformationSelector, self).__init__()
-        self.estimator = SelectKBest(score_func=mutual_info_classif)
-
-    def fit(self, X, y):
-        self.estimator.fit(X, y)
+    def __init__(self, n_jobs=1):
+        super(FtestSelector, self).__init__(f_classif, n_jobs)
 
-    def transform(self, X, k):
-        self.estimator.k = k
-        return self.estimator.transform(X)
 
+class MutualInformationSelector(ScoreSelector):
 
-class ChiSqSelector(BaseSelector):
+    def __init__(self, n_jobs=1):
+        super(MutualInformationSelector, self).__init__(mutual_info_classif, n_jobs)
 
-    def __init__(self):
-        super(ChiSqSelector, self).__init__()
-        self.estimator = SelectKBest(score_func=chi2)
 
-    def fit(self, X, y):
-        self.estimator.fit(X, y)
+class ChiSqSelector(ScoreSelector):
 
-    def transform(self, X, k):
-        self.estimator.k = k
-        return self.estimator.transform(X)
+    def __init__(self, n_jobs=1):
+        super(ChiSqSelector, self).__init__(chi2, n_jobs)
 
 
 class RandomForestSelector(BaseSelector):
@@ -143,14 +227,14 @@ class RandomForestSelector(BaseSelector):
     def __init__(self):
         super(RandomForestSelector, self).__init__()
         self.estimator = RandomForestClassifier()
-        self.sorted_features = None
 
     def fit(self, X, y):
-        self.estimator.fit(X, y)
-        self.sorted_features = np.argsort(self.estimator.feature_importances_)[::-1]
+        def compute():
+            self.estimator.fit(X, y)
+            return self.estimator.feature_importances_
 
-    def transform(self, X, k):
-        return X[:, self.sorted_features[:k]]
+        importances = score_cache.get((get_fingerprint(X, y), 'random_forest'), compute)
+        self.sorted_features = np.argsort(importances)[::-1]
 
 
 class LassoSelector(BaseSelector):
@@ -158,15 +242,13 @@ class LassoSelector(BaseSelector):
     def __init__(self):
         super(LassoSelector, self).__init__()
         self.estimator = LogisticRegression(penalty="l1")
-        self.sorted_features = None
 
     def fit(self, X, y):
-        self.estimator.fit(X, y)
-        if self.estimator.coef_.ndim == 1:
-            self.sorted_features = np.argsort(self.estimator.coef_)[::-1]
-        else:
-            importances = np.linalg.norm(self.estimator.coef_, axis=0, ord=1)
-            self.sorted_features = np.argsort(importances)[::-1]
-
-    def transform(self, X, k):
-        return X[:, self.sorted_features[:k]]
+        def compute():
+            self.estimator.fit(X, y)
+            if self.estimator.coef_.ndim == 1:
+                return self.estimator.coef_
+            return np.linalg.norm(self.estimator.coef_, axis=0, ord=1)
+
+        importances = score_cache.get((get_fingerprint(X, y), 'lasso'), compute)
+        self.sorted_features = np.argsort(importances)[::-1]
@@ -1,4 +1,5 @@
 import time
+from alphaml.utils.constants import ONEHOT_ENCODING
 
 
 class BaseModel(object):
@@ -10,6 +11,14 @@ class BaseModel(object):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def get_categorical_encoding(cls):
+        """
+        Get the encoding of the categorical features that the algorithm consumes.
+        :return: str, ORDINAL_ENCODING for the integer codes, or ONEHOT_ENCODING by default
+        """
+        return cls.get_properties().get('categorical_encoding', ONEHOT_ENCODING)
+
     @staticmethod
     def get_hyperparameter_search_space():
         """
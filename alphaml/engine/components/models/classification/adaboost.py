@@ -60,6 +60,7 @@ class AdaboostClassifier(BaseClassificationModel):
                 'handles_multiclass': True,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ORDINAL_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -83,6 +83,7 @@ class DecisionTree(BaseClassificationModel):
                 'handles_multiclass': True,
                 'handles_multilabel': True,
                 'is_deterministic': True,
+                'categorical_encoding': ORDINAL_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -77,6 +77,7 @@ class ExtraTreesClassifier(IterativeComponentWithSampleWeight, BaseClassificatio
                 'handles_multiclass': True,
                 'handles_multilabel': True,
                 'is_deterministic': True,
+                'categorical_encoding': ORDINAL_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -80,6 +80,7 @@ class GaussianNB(IterativeComponent, BaseClassificationModel):
                 'handles_multiclass': True,
                 'handles_multilabel': True,
                 'is_deterministic': True,
+                'categorical_encoding': ONEHOT_ENCODING,
                 'input': (DENSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
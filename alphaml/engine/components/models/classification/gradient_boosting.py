@@ -118,6 +118,7 @@ class GradientBoostingClassifier(IterativeComponentWithSampleWeight, BaseClassif
                 'handles_multiclass': True,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ORDINAL_ENCODING,
                 'input': (DENSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -54,6 +54,7 @@ class KNearestNeighborsClassifier(BaseClassificationModel):
                 'handles_multiclass': True,
                 'handles_multilabel': True,
                 'is_deterministic': True,
+                'categorical_encoding': ONEHOT_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
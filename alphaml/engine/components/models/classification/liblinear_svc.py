@@ -93,6 +93,7 @@ class LibLinear_SVC(BaseClassificationModel):
                 'handles_multiclass': True,
                 'handles_multilabel': True,
                 'is_deterministic': False,
+                'categorical_encoding': ONEHOT_ENCODING,
                 'input': (SPARSE, DENSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
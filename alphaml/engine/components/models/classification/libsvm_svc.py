@@ -95,6 +95,7 @@ class LibSVM_SVC(BaseClassificationModel):
                 'handles_multiclass': True,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ONEHOT_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -54,6 +54,7 @@ class Logistic_Regression(BaseClassificationModel):
                 'handles_multiclass': True,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ONEHOT_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -127,6 +127,7 @@ class MLP(
                 'handles_multiclass': True,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ONEHOT_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
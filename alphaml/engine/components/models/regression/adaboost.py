@@ -53,6 +53,7 @@ class AdaboostRegressor(BaseRegressionModel):
                 'handles_multiclass': False,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ORDINAL_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -74,6 +74,7 @@ class DecisionTree(BaseRegressionModel):
                 'handles_multiclass': False,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ORDINAL_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
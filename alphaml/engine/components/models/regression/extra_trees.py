@@ -69,6 +69,7 @@ class ExtraTreesRegressor(IterativeComponentWithSampleWeight, BaseRegressionMode
                 'handles_multiclass': False,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ORDINAL_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
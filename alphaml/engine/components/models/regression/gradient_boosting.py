@@ -113,6 +113,7 @@ class GradientBoostingRegressor(IterativeComponentWithSampleWeight, BaseRegressi
                 'handles_multiclass': False,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ORDINAL_ENCODING,
                 'input': (DENSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -40,6 +40,7 @@ class KNearestNeighborsRegressor(BaseRegressionModel):
                 'handles_multiclass': False,
                 'handles_multilabel': False,
                 'is_deterministic': True,
+                'categorical_encoding': ONEHOT_ENCODING,
                 'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -67,6 +67,7 @@ class LibLinear_SVR(BaseRegressionModel):
                 'handles_multiclass': False,
                 'handles_multilabel': False,
                 'is_deterministic': False,
+                'categorical_encoding': ONEHOT_ENCODING,
                 'input': (SPARSE, DENSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
@@ -0,0 +1,249 @@
+import numpy as np
+
+from alphaml.engine.components.models.base_model import BaseModel
+
+# The arrays of a compiled model, which are stored as memory-mapped segments in a bundle.
+ARRAY_NAMES = ['feature', 'threshold', 'left', 'right', 'value', 'roots', 'tree_weight', 'tree_output']
+
+
+class CompiledTreeModel(object):
+    """
+    A fitted tree model compiled into flat arrays of nodes.
+    The nodes of all trees are stored in contiguous arrays (feature, threshold, child indices and leaf values),
+    and each leaf points to itself, so all trees are evaluated for all rows with one vectorized step per level.
+    """
+
+    def __init__(self, task, aggregation, n_features, max_depth, classes=None, loss=None, init=None):
+        """
+        :param task: str, 'classification' or 'regression'
+        :param aggregation: str, how the outputs of the trees are combined:
+            'average', 'boosting', 'samme', 'samme.r' or 'weighted_median'
+        :param n_features: int
+        :param max_depth: int, maximal depth of the trees
+        :param classes: array, labels of the classes
+        :param loss: str, loss of the gradient boosting classifier
+        :param init: array of shape = [n_outputs], initial raw prediction of the gradient boosting model
+        """
+        self.task = task
+        self.aggregation = aggregation
+        self.n_features = n_features
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.loss = loss
+        self.init = init
+        # The scale of the weighted votes in the SAMME probabilities, None to average the tree probabilities.
+        self.vote_scale = None
+        for name in ARRAY_NAMES:
+            setattr(self, name, None)
+
+    def get_arrays(self):
+        return dict((name, getattr(self, name)) for name in ARRAY_NAMES)
+
+    def set_arrays(self, arrays):
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        return self
+
+    def get_nbytes(self):
+        return sum(array.nbytes for array in self.get_arrays().values())
+
+    def apply(self, X):
+        """
+        Find the leaf of each tree for each row.
+        :param X: array-like or sparse matrix of shape = [n_samples, n_features]
+        :return: array of shape = [n_samples, n_trees], the node indices of the leaves
+        """
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        # The trees are fitted with float32 features, so the thresholds are compared the same way.
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError('Expected %d features, got %s!' % (self.n_features, str(X.shape[1:])))
+        rows = np.arange(X.shape[0]).reshape((-1, 1))
+        nodes = np.tile(self.roots, (X.shape[0], 1))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def decision(self, X):
+        """
+        :param X: array-like or sparse matrix of shape = [n_samples, n_features]
+        :return: array of shape = [n_samples, n_outputs], the combined outputs of the trees
+        """
+        leaf_value = self.value[self.apply(X)]
+        if self.aggregation == 'average':
+            return leaf_value.mean(axis=1)
+        elif self.aggregation == 'boosting':
+            # Each tree contributes to one output, scaled by the learning rate.
+            contribution = leaf_value[:, :, 0] * self.tree_weight
+            raw = np.zeros((leaf_value.shape[0], len(self.init)))
+            for k in range(len(self.init)):
+                raw[:, k] = contribution[:, self.tree_output == k].sum(axis=1)
+            return raw + self.init
+        elif self.aggregation == 'samme.r':
+            n_classes = leaf_value.shape[2]
+            log_proba = np.log(np.maximum(leaf_value, np.finfo(leaf_value.dtype).eps))
+            decision = (n_classes - 1) * (log_proba - log_proba.mean(axis=2, keepdims=True))
+            return decision.sum(axis=1) / self.tree_weight.sum()
+        elif self.aggregation == 'samme':
+            n_classes = leaf_value.shape[2]
+            votes = np.eye(n_classes)[np.argmax(leaf_value, axis=2)]
+            return (votes * self.tree_weight.reshape((1, -1, 1))).sum(axis=1) / self.tree_weight.sum()
+        elif self.aggregation == 'weighted_median':
+            pred = leaf_value[:, :, 0]
+            sorted_index = np.argsort(pred, axis=1)
+            weight_cdf = np.cumsum(self.tree_weight[sorted_index], axis=1)
+            median_index = np.argmax(weight_cdf >= 0.5 * weight_cdf[:, -1:], axis=1)
+            rows = np.arange(pred.shape[0])
+            return pred[rows, sorted_index[rows, median_index]].reshape((-1, 1))
+        raise ValueError('Unknown aggregation: %s' % self.aggregation)
+
+    def predict_proba(self, X):
+        if self.task != 'classification':
+            raise ValueError('Only classification models predict probabilities!')
+        if self.aggregation == 'average':
+            return self.decision(X)
+        elif self.aggregation == 'boosting':
+            raw = self.decision(X)
+            if raw.shape[1] == 1:
+                raw = raw[:, 0] * (2 if self.loss == 'exponential' else 1)
+                proba = 1 / (1 + np.exp(-raw))
+                return np.vstack([1 - proba, proba]).T
+            proba = np.exp(raw - raw.max(axis=1, keepdims=True))
+            return proba / proba.sum(axis=1, keepdims=True)
+        else:
+            n_classes = len(self.classes_)
+            if self.aggregation == 'samme' and self.vote_scale is not None:
+                decision = self.decision(X) * self.vote_scale
+                proba = np.exp(decision - decision.max(axis=1, keepdims=True))
+                return proba / proba.sum(axis=1, keepdims=True)
+            elif self.aggregation == 'samme':
+                # The probabilities of SAMME are the weighted average of the tree probabilities.
+                leaf_value = self.value[self.apply(X)]
+                decision = (leaf_value * self.tree_weight.reshape((1, -1, 1))).sum(axis=1) / self.tree_weight.sum()
+            else:
+                decision = self.decision(X)
+            proba = np.exp(decision / (n_classes - 1))
+            return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        if self.task == 'classification':
+            if self.aggregation in ('samme', 'samme.r'):
+                return self.classes_.take(np.argmax(self.decision(X), axis=1), axis=0)
+            return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+        return self.decision(X)[:, 0]
+
+
+def _flatten_trees(trees, normalize):
+    """
+    Concatenate the nodes of sklearn trees into flat arrays.
+    :param trees: list of sklearn.tree._tree.Tree
+    :param normalize: bool, whether to normalize the leaf values into probabilities
+    :return: dictionary of arrays, max_depth
+    """
+    features, thresholds, lefts, rights, values, roots = list(), list(), list(), list(), list(), list()
+    offset, max_depth = 0, 0
+    for tree in trees:
+        if tree.n_outputs != 1:
+            raise ValueError('Multi-output trees are not supported!')
+        index = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        # A leaf points to itself, so the traversal stays in the leaf for the remaining levels.
+        lefts.append(np.where(is_leaf, index, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, index, tree.children_right) + offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0., tree.threshold))
+        value = tree.value[:, 0, :].astype(np.float64)
+        if normalize:
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0] = 1
+            value = value / normalizer
+        values.append(value)
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {'feature': np.concatenate(features).astype(np.int32),
+              'threshold': np.concatenate(thresholds).astype(np.float64),
+              'left': np.concatenate(lefts).astype(np.int32),
+              'right': np.concatenate(rights).astype(np.int32),
+              'value': np.vstack(values),
+              'roots': np.array(roots, dtype=np.int32)}
+    return arrays, max_depth
+
+
+def compile_tree_model(model):
+    """
+    Compile a fitted decision tree, random forest, extra trees, gradient boosting or AdaBoost model.
+    :param model: fitted alpha-ml model or sklearn estimator
+    :return: CompiledTreeModel
+    """
+    from sklearn.base import is_classifier as check_classifier
+    from sklearn.tree import BaseDecisionTree
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, \
+        ExtraTreesRegressor, GradientBoostingClassifier, GradientBoostingRegressor, AdaBoostClassifier, \
+        AdaBoostRegressor
+
+    estimator = model.estimator if isinstance(model, BaseModel) else model
+    if estimator is None:
+        raise ValueError('The model is not fitted!')
+    is_classifier = check_classifier(estimator)
+    task = 'classification' if is_classifier else 'regression'
+    tree_output, loss = None, None
+
+    if isinstance(estimator, BaseDecisionTree):
+        estimators = [estimator]
+        aggregation, tree_weight = 'average', np.ones(1)
+    elif isinstance(estimator, (RandomForestClassifier, RandomForestRegressor,
+                                ExtraTreesClassifier, ExtraTreesRegressor)):
+        estimators = estimator.estimators_
+        aggregation, tree_weight = 'average', np.ones(len(estimators))
+    elif isinstance(estimator, (GradientBoostingClassifier, GradientBoostingRegressor)):
+        stages = estimator.estimators_
+        estimators = list(stages.ravel())
+        aggregation = 'boosting'
+        tree_weight = np.full(len(estimators), estimator.learning_rate)
+        tree_output = np.tile(np.arange(stages.shape[1]), stages.shape[0])
+        loss = estimator.loss
+        if is_classifier and loss not in ('deviance', 'log_loss', 'exponential'):
+            raise ValueError('Unsupported loss of gradient boosting: %s' % loss)
+    elif isinstance(estimator, (AdaBoostClassifier, AdaBoostRegressor)):
+        estimators = estimator.estimators_
+        tree_weight = np.asarray(estimator.estimator_weights_[:len(estimators)], dtype=np.float64)
+        if is_classifier:
+            aggregation = 'samme.r' if getattr(estimator, 'algorithm', 'SAMME') == 'SAMME.R' else 'samme'
+        else:
+            aggregation = 'weighted_median'
+    else:
+        raise ValueError('Unsupported model: %s' % type(estimator).__name__)
+
+    n_features = getattr(estimator, 'n_features_in_', None) or getattr(estimator, 'n_features_', None)
+    classes = np.asarray(estimator.classes_) if is_classifier else None
+    # The trees of gradient boosting are regression trees, even for classification.
+    normalize = is_classifier and aggregation != 'boosting'
+    arrays, max_depth = _flatten_trees([tree.tree_ for tree in estimators], normalize=normalize)
+    arrays['tree_weight'] = tree_weight
+    arrays['tree_output'] = np.zeros(len(estimators), dtype=np.int32) if tree_output is None \
+        else tree_output.astype(np.int32)
+    compiled = CompiledTreeModel(task, aggregation, n_features, max_depth, classes=classes, loss=loss)
+    compiled.set_arrays(arrays)
+
+    if aggregation == 'boosting':
+        # The initial prediction is a constant, recovered from the raw prediction of a single row.
+        row = np.zeros((1, n_features))
+        raw = estimator.decision_function(row) if is_classifier else estimator.predict(row)
+        raw = np.reshape(raw, (1, -1))
+        compiled.init = np.zeros(raw.shape[1])
+        compiled.init = (raw - compiled.decision(row))[0]
+    elif aggregation == 'samme' and hasattr(estimator, '_compute_proba_from_decision'):
+        # Since scikit-learn 0.22, the SAMME probabilities are computed from the weighted votes,
+        # and since 1.3 a tree votes -1 / (n_classes - 1) for the other classes, which is recovered from a single row.
+        row = np.zeros((1, n_features))
+        votes = compiled.decision(row)
+        raw = np.reshape(estimator.decision_function(row), (1, -1))
+        # The binary decision is the difference of the votes.
+        plain = votes[:, 1:] - votes[:, :1] if raw.shape[1] == 1 else votes
+        n_classes = len(classes)
+        compiled.vote_scale = (1. if np.allclose(raw[0], plain[0]) else n_classes / (n_classes - 1)) / (n_classes - 1)
+    return compiled
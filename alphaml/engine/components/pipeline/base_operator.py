@@ -20,11 +20,66 @@ class Operator(object, metaclass=abc.ABCMeta):
         # After this operator, gc the result of operator.
         raise NotImplementedError()
 
+    def compile(self):
+        """
+        Compile the fitted operator into the steps of a transform plan for the test phase.
+        :return: list of TransformStep
+        """
+        raise NotImplementedError('Operator %s can not be compiled!' % self.operator_name)
+
     def check_phase(self, phase):
         if phase not in ['train', 'test']:
             raise ValueError("Invalid phase. Expected 'train' or 'test'!")
 
 
+def assign_origins(operators):
+    """
+    Assign the ids and connect the operators by their types:
+    the dp operators form a chain, each fg operator takes the output of the last dp operator,
+    and the fs operators take the outputs of all fg operators and of the last dp operator.
+    :param operators: list of Operator
+    """
+    last_dp_operator_id = 0
+    fg_operator_list = []
+    for node_id, node in enumerate(operators):
+        node.id = node_id
+        if 'dp' in node.operator_name:
+            last_dp_operator_id = node_id
+        if 'fg' in node.operator_name:
+            fg_operator_list.append(node_id)
+        if node_id != 0:
+            node.origins = [node_id - 1]
+        if 'fg' in node.operator_name:
+            node.origins = [last_dp_operator_id]
+        if 'fs' in node.operator_name:
+            node.origins = fg_operator_list + [last_dp_operator_id]
+
+
+def concat_cardinality(dm_list):
+    """
+    :param dm_list: list of DataManager with the training data
+    :return: dictionary, the categorical cardinality of the horizontal concatenation, or None
+    """
+    cardinality, offset = dict(), 0
+    for dm in dm_list:
+        for column, category_cnt in (dm.categorical_cardinality or {}).items():
+            cardinality[offset + column] = category_cnt
+        offset += dm.train_X.shape[1]
+    return cardinality or None
+
+
+def select_cardinality(cardinality, index):
+    """
+    :param cardinality: dictionary, the number of categories of each categorical column, or None
+    :param index: array of int, the selected columns
+    :return: dictionary, the categorical cardinality of the selected columns, or None
+    """
+    if not cardinality:
+        return None
+    selected = dict((i, cardinality[column]) for i, column in enumerate(index) if column in cardinality)
+    return selected or None
+
+
 class EmptyOperator(Operator):
     def __init__(self):
         super().__init__('Empty', 'empty_operatpr')
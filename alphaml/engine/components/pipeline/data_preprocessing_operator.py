@@ -1,18 +1,47 @@
 import typing
+import hashlib
 import numpy as np
 import pandas as pd
 import warnings
 from sklearn.preprocessing import LabelEncoder, OneHotEncoder, OrdinalEncoder, \
     MinMaxScaler, StandardScaler, MaxAbsScaler, Normalizer
 from alphaml.engine.components.data_manager import DataManager
-from alphaml.engine.components.pipeline.base_operator import Operator, DATA_PERPROCESSING
+from alphaml.engine.components.pipeline.base_operator import Operator, DATA_PERPROCESSING, select_cardinality
+from alphaml.engine.components.pipeline.transform_plan import ImputeStep, EncodeStep, SelectStep, AffineStep, \
+    ColumnTransformStep, CategoryMapStep
+from alphaml.engine.components.data_preprocessing.imputer import get_mode, get_fill_values, fill_missing
+from alphaml.engine.components.data_preprocessing.encoder import get_frequency_table, get_targets, get_target_table, \
+    get_oof_target_values
+
+
+def get_feature_type(dtype):
+    """
+    :param dtype: the dtype of a column without missing values
+    :return: str, 'Discrete', 'Float' or 'Categorical'
+    """
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return 'Discrete'
+    elif pd.api.types.is_float_dtype(dtype):
+        return 'Float'
+    return 'Categorical'
 
 
 class ImputerOperator(Operator):
-    # TODO: Different inpute strategy
-    def __init__(self, label_col=-1, params=None):
+    def __init__(self, label_col=-1, params=None, strategy='mean', add_indicator=False):
+        '''
+        :param strategy: str, 'mean' or 'median', the fill value of the numerical features.
+                        The categorical features are filled with the most frequent value
+        :param add_indicator: bool, whether to add the missing indicator of the features with missing values
+        '''
         super().__init__(DATA_PERPROCESSING, 'dp_imputer', params)
         self.label_col = label_col
+        self.strategy = strategy
+        self.add_indicator = add_indicator
+        # The fill value of each column in the training data.
+        self.fill_values = dict()
+        self.feature_columns = None
+        self.numerical_columns = []
+        self.indicator_columns = []
 
     def operate(self, dm_list: typing.List, phase='train'):
         # The input of a ImputeOperator is a pd.Dataframe
@@ -20,59 +49,66 @@ class ImputerOperator(Operator):
         self.check_phase(phase)
 
         input_df = dm_list[0]
-        df = self.impute_df(input_df)
+        label_col = input_df.columns[self.label_col] if phase == 'train' else None
+        if phase == 'train':
+            self.feature_columns = [col for col in input_df.columns if col != label_col]
+        df = self.impute_df(input_df[self.feature_columns], phase)
         dm = DataManager()
 
-        label_col = df.columns[self.label_col] if phase == 'train' else None
-        dm.set_col_type(df, label_col)
-        data = df.values
+        dm.feature_types = [get_feature_type(df[col].dtype) for col in df.columns]
         if phase == 'train':
-            # Swap label index to -1
-            swap_list=list(range(data.shape[1]))
-            del(swap_list[self.label_col])
-            swap_list.append(self.label_col)
-            data=data[:,swap_list]
-            dm.train_X = data[:, :-1]
-            dm.train_y = data[:, -1]
+            dm.train_X = df.values
+            dm.train_y = input_df[label_col].values
         else:
-            dm.test_X = data
+            dm.test_X = df.values
         return dm
 
-    def impute_categorical(self, col):
-        return col.fillna(col.mode().iloc[0])
-
-    def impute_float(self, col) -> pd.Series:
-        mean_val = col.mean()
-        return col.fillna(mean_val)
-
-    def impute_discrete(self, col) -> pd.Series:
-        mean_val = int(col.mean())
-        return col.fillna(mean_val)
-
-    def impute_col(self, col, datatype) -> pd.Series:
-        if datatype == "categorical":
-            return self.impute_categorical(col)
-        elif datatype == "float":
-            return self.impute_float(col)
-        elif datatype == "discrete":
-            return self.impute_discrete(col)
-        else:
-            raise TypeError("Required datatype to be categorical, float or discrete")
-
-    def impute_df(self, df) -> pd.DataFrame:
-        for col in list(df.columns):
-            dtype = df[col].dtype
-            if dtype in [np.int, np.int16, np.int32, np.int64]:
-                df[col] = self.impute_col(df[col], "discrete")
-            elif dtype in [np.float, np.float16, np.float32, np.float64, np.float128, np.double]:
-                df[col] = self.impute_col(df[col], "float")
-            elif dtype in [np.str, np.str_, np.string_, np.object]:
-                df[col] = self.impute_col(df[col], "categorical")
-            else:
-                raise TypeError("Unknown data type:", dtype)
-            # print("Coltype:", dtype)
+    def fit(self, df):
+        """
+        Learn the fill value of each column once from the training data.
+        :param df: DataFrame, the features of the training data
+        """
+        self.numerical_columns = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col].dtype)]
+        numerical_set = set(self.numerical_columns)
+        fill_values = get_fill_values(df[self.numerical_columns].values, self.strategy) \
+            if len(self.numerical_columns) > 0 else []
+        self.fill_values = dict(zip(self.numerical_columns, fill_values))
+        for col in df.columns:
+            if col not in numerical_set:
+                values = df[col].values
+                self.fill_values[col] = get_mode(values[~pd.isnull(values)])
+        is_missing = df.isnull().any()
+        self.indicator_columns = [col for col in df.columns if is_missing[col]] if self.add_indicator else []
+
+    def impute_df(self, df, phase='train') -> pd.DataFrame:
+        """
+        Fill the missing values with the fill values learned in the train phase.
+        :return: DataFrame, with the missing indicators appended
+        """
+        if phase == 'train':
+            self.fit(df)
+        missing = df[self.indicator_columns].isnull().values.astype(np.int64)
+        # Only the filled columns are replaced, the input is left untouched.
+        df = df.copy(deep=False)
+        numerical_set = set(self.numerical_columns)
+        if len(self.numerical_columns) > 0:
+            values = df[self.numerical_columns].values.astype(np.float64)
+            mask = fill_missing(values, [self.fill_values[col] for col in self.numerical_columns])
+            for i in np.nonzero(mask.any(axis=0))[0]:
+                df[self.numerical_columns[i]] = values[:, i]
+        for col in df.columns:
+            if col in numerical_set or col not in self.fill_values:
+                continue
+            if df[col].isnull().any():
+                df[col] = df[col].fillna(self.fill_values[col])
+        for i, col in enumerate(self.indicator_columns):
+            df['%s_missing' % col] = missing[:, i]
         return df
 
+    def compile(self):
+        # The test data is filled with the statistics of the training data.
+        return [ImputeStep(self.feature_columns, self.fill_values, self.indicator_columns)]
+
 
 class LabelEncoderOperator(Operator):
     def __init__(self, label_col=-1, params=None):
@@ -91,11 +127,15 @@ class LabelEncoderOperator(Operator):
             dm.train_y = self.label_encoder.fit_transform(dm.train_y)
         return dm
 
+    def compile(self):
+        return []
+
 
 class FeatureEncoderOperator(Operator):
     def __init__(self, params=0):
         '''
-        :param params: 0 for OneHotEncoder, 1 for OrdinalEncoder
+        :param params: 0 for OneHotEncoder, 1 for OrdinalEncoder,
+                        2 for the native integer codes, which are left to the models to encode
         '''
         if params == 0:
             super().__init__(DATA_PERPROCESSING, 'dp_onehotencoder', params)
@@ -103,8 +143,32 @@ class FeatureEncoderOperator(Operator):
         elif params == 1:
             super().__init__(DATA_PERPROCESSING, 'dp_ordinalencoder', params)
             self.encoder = OrdinalEncoder()
+        elif params == 2:
+            super().__init__(DATA_PERPROCESSING, 'dp_categoricalcoder', params)
+            self.encoder = None
         else:
-            raise ValueError("Invalid params in FeatureEncoderOperator. Expected {0,1}")
+            raise ValueError("Invalid params in FeatureEncoderOperator. Expected {0,1,2}")
+        self.categorical_index = []
+        self.other_index = []
+        # The categories of each categorical feature for the native codes.
+        self.categories = []
+
+    def get_codes(self, x, phase):
+        """
+        Encode the categorical columns as compact integer codes, the unknown categories are coded as -1.
+        :param x: array of shape = [n_samples, n_categorical_features]
+        :return: array of shape = [n_samples, n_categorical_features]
+        """
+        codes = np.empty(x.shape, dtype=np.int64)
+        if phase == 'train':
+            self.categories = list()
+            for i in range(x.shape[1]):
+                category, codes[:, i] = np.unique(x[:, i], return_inverse=True)
+                self.categories.append(category)
+        else:
+            for i in range(x.shape[1]):
+                codes[:, i] = pd.Index(self.categories[i]).get_indexer(x[:, i])
+        return codes
 
     def operate(self, dm_list: typing.List, phase='train'):
         # The input of a FeatureEncoderOperator is a DataManager
@@ -117,6 +181,8 @@ class FeatureEncoderOperator(Operator):
         # Encode categorical features
         categorical_index = [i for i in range(len(feature_types)) if feature_types[i] == "Categorical"]
         other_index = [i for i in range(len(feature_types)) if feature_types[i] != "Categorical"]
+        if phase == 'train':
+            self.categorical_index, self.other_index = categorical_index, other_index
 
         # Check if there are no categorical features in train_x
         if len(categorical_index) == 0:
@@ -150,6 +216,19 @@ class FeatureEncoderOperator(Operator):
 
             for index in categorical_index:
                 dm.feature_types[index] = 'Discrete'
+        elif self.params == 2:  # Native codes
+            output = np.empty(x.shape)
+            output[:, other_index] = x[:, other_index]
+            output[:, categorical_index] = self.get_codes(x[:, categorical_index], phase)
+            x = output
+
+            # The codes are not numerical, so the scalers and the feature generators skip them.
+            dm.feature_types = list(feature_types)
+            for index in categorical_index:
+                dm.feature_types[index] = 'Categorical-Code'
+            if phase == 'train':
+                dm.categorical_cardinality = dict((index, len(category)) for index, category in
+                                                  zip(categorical_index, self.categories))
 
         if phase == 'train':
             dm.train_X = x
@@ -158,6 +237,108 @@ class FeatureEncoderOperator(Operator):
 
         return dm
 
+    def compile(self):
+        if len(self.categorical_index) == 0:
+            return []
+        if self.params == 2:
+            return [EncodeStep(self.categorical_index, self.other_index, self.categories, onehot=False,
+                               handle_unknown='ignore')]
+        # The categories are looked up in hash tables instead of the encoder.
+        return [EncodeStep(self.categorical_index, self.other_index, self.encoder.categories_,
+                           onehot=self.params == 0)]
+
+
+class StatisticEncoderOperator(Operator):
+    """
+    The base class of the operators replacing each categorical feature with the statistics of its categories.
+    The raw categories and the integer codes are both encoded, the encoded features come first.
+    """
+
+    def __init__(self, operator_name, params=None):
+        super().__init__(DATA_PERPROCESSING, operator_name, params)
+        self.categorical_index = []
+        self.other_index = []
+        self.categories = []
+        self.tables = []
+
+    def encode(self, codes, category_cnt, y):
+        """
+        :param codes: array of int, the codes of a categorical feature in the training data
+        :param category_cnt: int, number of categories
+        :param y: array, the labels of the training data
+        :return: the values of the training data, and the table of shape = [category_cnt + 1, width],
+            whose last row is for the unknown categories
+        """
+        raise NotImplementedError()
+
+    def operate(self, dm_list: typing.List, phase='train'):
+        assert len(dm_list) == 1 and isinstance(dm_list[0], DataManager)
+        self.check_phase(phase)
+
+        dm = dm_list[0]
+        feature_types = dm.feature_types
+        is_categorical = [feature_type in ["Categorical", "Categorical-Code"] for feature_type in feature_types]
+        categorical_index = [i for i in range(len(feature_types)) if is_categorical[i]]
+        other_index = [i for i in range(len(feature_types)) if not is_categorical[i]]
+        if phase == 'train':
+            self.categorical_index, self.other_index = categorical_index, other_index
+        if len(categorical_index) == 0:
+            return dm
+
+        if phase == 'train':
+            x = dm.train_X
+            self.categories, self.tables, blocks = list(), list(), list()
+            for index in categorical_index:
+                category, codes = np.unique(x[:, index], return_inverse=True)
+                values, table = self.encode(codes, len(category), dm.train_y)
+                self.categories.append(category)
+                self.tables.append(table)
+                blocks.append(values)
+            x = np.hstack(blocks + [x[:, other_index].astype(np.float64)])
+            dm.train_X = x
+            dm.categorical_cardinality = None
+        else:
+            x = dm.test_X
+            dm.test_X = CategoryMapStep(categorical_index, other_index, self.categories, self.tables).transform(x)
+
+        width = sum(table.shape[1] for table in self.tables)
+        dm.feature_types = ['Float'] * width + [feature_types[i] for i in other_index]
+        return dm
+
+    def compile(self):
+        if len(self.categorical_index) == 0:
+            return []
+        return [CategoryMapStep(self.categorical_index, self.other_index, self.categories, self.tables)]
+
+
+class FrequencyEncoderOperator(StatisticEncoderOperator):
+    def __init__(self, params=None):
+        super().__init__('dp_frequencyencoder', params)
+
+    def encode(self, codes, category_cnt, y):
+        table = get_frequency_table(codes, category_cnt)
+        return table[codes], table
+
+
+class TargetEncoderOperator(StatisticEncoderOperator):
+    def __init__(self, params=5, task='classification', smoothing=10., random_state=1):
+        '''
+        :param params: int, number of folds to encode the training data out of fold
+        :param task: str, 'classification' or 'regression'. The label is encoded for regression and
+                        binary classification, and the indicator of each class for multi-class classification
+        :param smoothing: float, the weight of the prior mean
+        '''
+        super().__init__('dp_targetencoder', params)
+        self.task = task
+        self.smoothing = smoothing
+        self.random_state = random_state
+
+    def encode(self, codes, category_cnt, y):
+        targets = get_targets(y, self.task)
+        # The labels of the training data are not used to encode themselves.
+        values = get_oof_target_values(codes, category_cnt, targets, self.smoothing, self.params, self.random_state)
+        return values, get_target_table(codes, category_cnt, targets, self.smoothing)
+
 
 class ScalerOperator(Operator):
     def __init__(self, params=0):
@@ -175,6 +356,7 @@ class ScalerOperator(Operator):
             self.scaler = MaxAbsScaler()
         else:
             raise ValueError("Invalid params for ScalerOperator. Expected {0,1,2}")
+        self.numerical_index = []
 
     def operate(self, dm_list: typing.List, phase='train'):
         # The input of a ScalerOperator is a DataManager
@@ -185,6 +367,8 @@ class ScalerOperator(Operator):
         feature_types = dm.feature_types
         numercial_index = [i for i in range(len(feature_types))
                            if feature_types[i] == "Float" or feature_types[i] == "Discrete"]
+        if phase == 'train':
+            self.numerical_index = numercial_index
 
         # Check if there are no numerical features in train_x
         if len(numercial_index) == 0:
@@ -200,6 +384,19 @@ class ScalerOperator(Operator):
             dm.test_X = x
         return dm
 
+    def compile(self):
+        if len(self.numerical_index) == 0:
+            return []
+        # All scalers are affine maps of the columns.
+        n_features = len(self.numerical_index)
+        if self.params == 0:
+            mean = self.scaler.mean_ if self.scaler.mean_ is not None else np.zeros(n_features)
+            scale = self.scaler.scale_ if self.scaler.scale_ is not None else np.ones(n_features)
+            return [AffineStep(self.numerical_index, 1 / scale, -mean / scale)]
+        elif self.params == 1:
+            return [AffineStep(self.numerical_index, self.scaler.scale_, self.scaler.min_)]
+        return [AffineStep(self.numerical_index, 1 / self.scaler.scale_, np.zeros(n_features))]
+
 
 class NormalizerOperator(Operator):
     def __init__(self, params=0):
@@ -214,6 +411,7 @@ class NormalizerOperator(Operator):
             self.normalizer = Normalizer(norm='l1')
         else:
             raise ValueError("Invalid params for NormalizerOperator. Expected {0,1}")
+        self.numerical_index = []
 
     def operate(self, dm_list: typing.List, phase='train'):
         # The input of a NormalizerOperator is a DataManager
@@ -224,6 +422,8 @@ class NormalizerOperator(Operator):
         feature_types = dm.feature_types
         numericial_index = [i for i in range(len(feature_types))
                             if feature_types[i] == "Float" or feature_types[i] == "Discrete"]
+        if phase == 'train':
+            self.numerical_index = numericial_index
 
         # Check if there are no numerical features in train_x
         if len(numericial_index) == 0:
@@ -239,13 +439,27 @@ class NormalizerOperator(Operator):
             dm.test_X = x
         return dm
 
+    def compile(self):
+        if len(self.numerical_index) == 0:
+            return []
+        return [ColumnTransformStep(self.normalizer, self.numerical_index, replace=True)]
+
 
 # TODO: Bucketizer
 
-class ConstantRemoverOperator(Operator):
-    def __init__(self, params=None):
-        super().__init__(DATA_PERPROCESSING, 'dp_constant_remover', params)
-        self.constant_indices = []
+class RemoverOperator(Operator):
+    """Remove the numerical columns found on the training data with a single column selection."""
+
+    def __init__(self, operator_name, params=None):
+        super().__init__(DATA_PERPROCESSING, operator_name, params)
+        self.keep_mask = None
+
+    def get_removed_mask(self, x):
+        """
+        :param x: array of shape = [n_samples, n_numerical_features]
+        :return: array of bool, whether each column is removed
+        """
+        raise NotImplementedError()
 
     def operate(self, dm_list: typing.List, phase='train'):
         assert len(dm_list) == 1 and isinstance(dm_list[0], DataManager)
@@ -253,98 +467,68 @@ class ConstantRemoverOperator(Operator):
 
         dm = dm_list[0]
         feature_types = dm.feature_types
-        numericial_index = [i for i in range(len(feature_types))
-                            if feature_types[i] == "Float" or feature_types[i] == "Discrete"]
+        numericial_index = np.array([i for i in range(len(feature_types))
+                                     if feature_types[i] == "Float" or feature_types[i] == "Discrete"], dtype=np.int64)
 
         if phase == 'train':
             x = dm.train_X
-            for index in numericial_index:
-                feature = x[:, index]
-                if len(set(feature)) == 1:  # Constant feature
-                    self.constant_indices.append(index)
-            self.constant_indices.reverse()
-            for index in self.constant_indices:
-                del (dm.feature_types[index])
-                x = np.delete(x, [index], axis=1)
-            dm.train_X = x
+            self.keep_mask = np.ones(x.shape[1], dtype=bool)
+            if len(numericial_index) > 0:
+                removed_mask = self.get_removed_mask(x[:, numericial_index].astype(np.float64))
+                self.keep_mask[numericial_index[removed_mask]] = False
         else:
             x = dm.test_X
-            for index in self.constant_indices:
-                del (dm.feature_types[index])
-                x = np.delete(x, [index], axis=1)
-            dm.test_X = x
-        return dm
-
-
-class VarianceRemoverOperator(Operator):
-    def __init__(self, params=5e-5):
-        '''
-        :param params: variance threshold
-        '''
-        super().__init__(DATA_PERPROCESSING, 'dp_variance_remover', params)
-        self.low_variance_indices = []
-
-    def operate(self, dm_list: typing.List, phase='train'):
-        assert len(dm_list) == 1 and isinstance(dm_list[0], DataManager)
-        self.check_phase(phase)
-
-        dm = dm_list[0]
-        feature_types = dm.feature_types
-        numericial_index = [i for i in range(len(feature_types))
-                            if feature_types[i] == "Float" or feature_types[i] == "Discrete"]
 
+        if not self.keep_mask.all():
+            x = x[:, self.keep_mask]
+            dm.feature_types = [feature_types[i] for i in np.nonzero(self.keep_mask)[0]]
+            if phase == 'train':
+                dm.categorical_cardinality = select_cardinality(dm.categorical_cardinality,
+                                                                np.nonzero(self.keep_mask)[0])
         if phase == 'train':
-            x = dm.train_X
-            for index in numericial_index:
-                feature = x[:, index]
-                if feature.var() < self.params:  # Low-variance feature
-                    self.low_variance_indices.append(index)
-            self.low_variance_indices.reverse()
-            for index in self.low_variance_indices:
-                del (dm.feature_types[index])
-                x = np.delete(x, [index], axis=1)
             dm.train_X = x
         else:
-            x = dm.test_X
-            for index in self.low_variance_indices:
-                del (dm.feature_types[index])
-                x = np.delete(x, [index], axis=1)
             dm.test_X = x
         return dm
 
+    def compile(self):
+        return [SelectStep(np.nonzero(self.keep_mask)[0])]
+
 
-class IdenticalRemoverOperator(Operator):
+class ConstantRemoverOperator(RemoverOperator):
     def __init__(self, params=None):
-        super().__init__(DATA_PERPROCESSING, 'dp_constant_remover', params)
-        self.identical_indices = []
+        super().__init__('dp_constant_remover', params)
 
-    def operate(self, dm_list: typing.List, phase='train'):
-        assert len(dm_list) == 1 and isinstance(dm_list[0], DataManager)
-        self.check_phase(phase)
+    def get_removed_mask(self, x):
+        return np.ptp(x, axis=0) == 0
 
-        dm = dm_list[0]
-        feature_types = dm.feature_types
-        numericial_index = [i for i in range(len(feature_types))
-                            if feature_types[i] == "Float" or feature_types[i] == "Discrete"]
 
-        if phase == 'train':
-            x = dm.train_X
-            for i, index in enumerate(numericial_index):
-                feature = x[:, index]
-                for ano_index in numericial_index[:i]:
-                    ano_feature = x[:, ano_index]
-                    if (feature == ano_feature).all():
-                        self.identical_indices.append(i)
-                        break
-            self.identical_indices.reverse()
-            for index in self.identical_indices:
-                del (dm.feature_types[index])
-                x = np.delete(x, [index], axis=1)
-            dm.train_X = x
-        else:
-            x = dm.test_X
-            for index in self.identical_indices:
-                del (dm.feature_types[index])
-                x = np.delete(x, [index], axis=1)
-            dm.test_X = x
-        return dm
+class VarianceRemoverOperator(RemoverOperator):
+    def __init__(self, params=5e-5):
+        '''
+        :param params: variance threshold
+        '''
+        super().__init__('dp_variance_remover', params)
+
+    def get_removed_mask(self, x):
+        return x.var(axis=0) < self.params
+
+
+class IdenticalRemoverOperator(RemoverOperator):
+    def __init__(self, params=None):
+        super().__init__('dp_identical_remover', params)
+
+    def get_removed_mask(self, x):
+        # Hash each column once, and compare the columns with the same hash only.
+        # Adding zero turns -0. into 0., so the equal columns have the same bytes.
+        x = np.asfortranarray(x + 0.)
+        removed_mask = np.zeros(x.shape[1], dtype=bool)
+        columns = dict()
+        for index in range(x.shape[1]):
+            key = hashlib.sha1(x[:, index].tobytes()).hexdigest()
+            candidates = columns.setdefault(key, list())
+            if any(np.array_equal(x[:, index], x[:, candidate]) for candidate in candidates):
+                removed_mask[index] = True
+            else:
+                candidates.append(index)
+        return removed_mask
@@ -1,10 +1,21 @@
 import abc
+import copy
 import typing
+import hashlib
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pandas import DataFrame
 from alphaml.engine.components.data_manager import DataManager
 from alphaml.engine.components.pipeline.data_preprocessing_operator import *
 from alphaml.engine.components.pipeline.feature_generation_operator import *
 from alphaml.engine.components.pipeline.feature_selection_operator import *
+from alphaml.engine.components.pipeline.base_operator import assign_origins
+from alphaml.engine.components.pipeline.preprocessing_space import get_operators, get_encoder
+from alphaml.engine.components.pipeline.transform_plan import TransformPlan
 
 """
 Pipeline Framework:
@@ -13,15 +24,109 @@ Pipeline Framework:
 """
 
 
+def get_fingerprint(data):
+    """
+    Compute the fingerprint of the input of a pipeline.
+    :param data: DataFrame or DataManager
+    :return: str
+    """
+    sha = hashlib.sha1()
+    if isinstance(data, pd.DataFrame):
+        sha.update(str(list(data.columns)).encode('utf8'))
+        sha.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    else:
+        for array in [data.train_X, data.train_y, data.test_X, data.test_y]:
+            if isinstance(array, np.ndarray) and array.dtype != object:
+                sha.update(np.ascontiguousarray(array).tobytes())
+            else:
+                sha.update(pickle.dumps(array))
+        sha.update(str(data.feature_types).encode('utf8'))
+    return sha.hexdigest()
+
+
+def _get_nbytes(dm):
+    if not isinstance(dm, DataManager):
+        return 0
+    return sum(array.nbytes for array in [dm.train_X, dm.train_y, dm.test_X, dm.test_y]
+               if isinstance(array, np.ndarray))
+
+
+class ResultCache(object):
+    """
+    A LRU cache of operator outputs, limited by the size (MB) of the cached data.
+    The operators of a level run in threads, so the cache is guarded by a lock.
+    """
+
+    def __init__(self, limit=256):
+        self.limit = limit * 1024 * 1024
+        self.nbytes = 0
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.results
+
+    def get(self, key):
+        """
+        :return: the cached output, or None if the key is not cached
+        """
+        with self.lock:
+            if key not in self.results:
+                return None
+            self.results.move_to_end(key)
+            return self.results[key][0]
+
+    def put(self, key, result):
+        nbytes = _get_nbytes(result)
+        if nbytes > self.limit:
+            return
+        # Keep a snapshot, since the operators may modify their inputs in place.
+        result = copy.deepcopy(result)
+        with self.lock:
+            if key in self.results:
+                self.nbytes -= self.results.pop(key)[1]
+            self.results[key] = (result, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.limit:
+                _, (_, evicted_nbytes) = self.results.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.nbytes = 0
+
+    def __getstate__(self):
+        # The cached outputs are not shipped, and the lock can not be pickled.
+        state = self.__dict__.copy()
+        state['results'] = OrderedDict()
+        state['nbytes'] = 0
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
 class DP_Pipeline(object):
-    def __init__(self, pipeline_config):
-        """Reconstruct the data preprocessing pipeline according to the config."""
+    def __init__(self, pipeline_config, n_jobs=1, cache_limit=256, task='classification'):
+        """
+        Reconstruct the data preprocessing pipeline according to the config.
+        :param pipeline_config: the config of the pipeline, None means the default pipeline.
+            A dictionary from the space of preprocessing_space.get_hyperparameter_search_space(include_encoder=True)
+        :param n_jobs: int, number of threads to run the independent operators of the DAG
+        :param cache_limit: int, size (MB) of the cached operator outputs, 0 means no cache
+        :param task: str, 'classification' or 'regression', the task of the feature selection
+        """
         # Create the default DP graph.
         # 1. Create the basic nodes.
         self.pipeline_operators = list()
         node1 = ImputerOperator()
         node2 = LabelEncoderOperator()
-        node3 = FeatureEncoderOperator()
+        # The categorical features are carried as integer codes, and encoded for each model by the evaluator.
+        node3 = FeatureEncoderOperator(2)
         # node4 = NormalizerOperator()
         # node5 = ScalerOperator()
         node6 = ConstantRemoverOperator()
@@ -31,40 +136,158 @@ class DP_Pipeline(object):
         node10 = IdenticalOperator()
 
         self.pipeline_operators.extend([node1, node2, node3, node6, node7, node10])
+        if pipeline_config is not None:
+            node3 = get_encoder(pipeline_config, task)
+            self.pipeline_operators = [node1, node2, node3, node6, node7] + get_operators(pipeline_config, task)
         self.cached_dm = dict()
+        self.n_jobs = n_jobs
+        self.result_cache = ResultCache(cache_limit) if cache_limit > 0 else None
+        # The key of the input each operator was last fitted on.
+        self.fit_keys = dict()
+        # The fitted pipeline compiled for the test phase.
+        self.plan = None
+        # The number of categories of each categorical column in the output.
+        self.categorical_cardinality = None
 
         # Assign the node id.
-        last_dp_operator_id = 0
-        fg_operator_list = []
-        for node_id, node in enumerate(self.pipeline_operators):
-            node.id = node_id
-            if 'dp' in node.operator_name:
-                last_dp_operator_id = node_id
-            if 'fg' in node.operator_name:
-                fg_operator_list.append(node_id)
-            if node_id != 0:
-                node.origins = [node_id - 1]
-            if 'fg' in node.operator_name:
-                node.origins = [last_dp_operator_id]
-            if 'fs' in node.operator_name:
-                node.origins = fg_operator_list + [last_dp_operator_id]
+        assign_origins(self.pipeline_operators)
+
+    def __getstate__(self):
+        # The intermediate and cached outputs hold the training data, which the fitted pipeline does not need.
+        state = self.__dict__.copy()
+        state['cached_dm'] = dict()
+        return state
+
+    def get_levels(self):
+        """
+        Group the operators into the levels of the DAG, the operators in a level only depend on the previous levels.
+        :return: list of lists of operators
+        """
+        depth = dict()
+        for operator in self.pipeline_operators:
+            origins = operator.origins if operator.origins is not None else []
+            if any(origin not in depth for origin in origins):
+                raise ValueError('The origins of operator %d must come before it!' % operator.id)
+            depth[operator.id] = max([depth[origin] + 1 for origin in origins] or [0])
+        levels = [list() for _ in range(max(depth.values()) + 1)]
+        for operator in self.pipeline_operators:
+            levels[depth[operator.id]].append(operator)
+        return levels
+
+    def get_key(self, operator, phase, input_keys):
+        sha = hashlib.sha1()
+        sha.update(('%d-%s-%s-%s' % (operator.id, operator.operator_name, repr(operator.params), phase)).encode('utf8'))
+        if phase == 'test':
+            # The output on the test data depends on the data the operator was fitted on.
+            sha.update(str(self.fit_keys.get(operator.id)).encode('utf8'))
+        for key in input_keys:
+            sha.update(key.encode('utf8'))
+        return sha.hexdigest()
+
+    def run_operator(self, operator, input_dm, input_keys, phase, cached_inputs):
+        """
+        Run an operator, or reuse its cached output on the same input.
+        :param cached_inputs: list of bool, whether each input is an entry of the cache
+        :return: output_dm, key, whether the output comes from the cache
+        """
+        key = self.get_key(operator, phase, input_keys)
+        # A single lookup, since another thread may evict the entry between a check and a read.
+        output_dm = self.result_cache.get(key) if self.result_cache is not None else None
+        cache_hit = output_dm is not None
+        if phase == 'train':
+            # The fitted state of the operator must come from the same input.
+            cache_hit = cache_hit and self.fit_keys.get(operator.id) == key
+        if cache_hit:
+            return output_dm, key, True
+
+        # The cache entries are copied before the operator modifies them.
+        input_dm = [copy.deepcopy(dm) if cached else dm for dm, cached in zip(input_dm, cached_inputs)]
+        output_dm = operator.operate(input_dm, phase=phase)
+        if phase == 'train':
+            self.fit_keys[operator.id] = key
+        if self.result_cache is not None:
+            self.result_cache.put(key, output_dm)
+        return output_dm, key, False
+
+    def compile(self):
+        """
+        Compile the fitted operators into a transform plan for the test phase.
+        :return: TransformPlan
+        """
+        nodes = [(operator.id, operator.origins or [], operator.compile()) for operator in self.pipeline_operators]
+        return TransformPlan(nodes)
+
+    def transform(self, X):
+        """
+        Transform the test data with the compiled plan.
+        :param X: DataFrame or array
+        :return: array
+        """
+        if self.plan is None:
+            return self.execute(X, phase='test').test_X
+        return self.plan.transform(X)
 
     def execute(self, input: DataFrame, phase='train', stratify=True) -> DataManager:
-        # DM caches.
-        for node_id in range(len(self.pipeline_operators)):
-            self.cached_dm[node_id] = None
+        """
+        Run the operators level by level. The operators of a level are independent and run concurrently,
+        so they must not modify their inputs. The output of an operator is released once all its consumers have run.
+        In the test phase, the compiled plan is used if all operators could be compiled.
+        The training data is not split here, the evaluator splits it into the folds of the search.
+        :param stratify: bool, kept for compatibility, the evaluator stratifies the splits of classification tasks
+        """
+        if phase == 'test' and self.plan is not None:
+            dm = DataManager()
+            dm.test_X = self.plan.transform(input)
+            return dm
 
+        final_id = len(self.pipeline_operators) - 1
+        consumer_cnt = dict((operator.id, 0) for operator in self.pipeline_operators)
         for operator in self.pipeline_operators:
-            # Prepare the input dm for the operator.
+            for origin in operator.origins or []:
+                consumer_cnt[origin] += 1
+
+        self.cached_dm = dict()
+        keys, from_cache = dict(), dict()
+        input_key = get_fingerprint(input) if self.result_cache is not None else ''
+
+        def run(operator):
             if operator.id == 0:
-                input_dm = [input]
+                input_dm, input_keys, cached_inputs = [input], [input_key], [False]
             else:
                 input_dm = [self.cached_dm[id] for id in operator.origins]
-            output_dm = operator.operate(input_dm, phase=phase)
-            self.cached_dm[operator.id] = output_dm
+                input_keys = [keys[id] for id in operator.origins]
+                cached_inputs = [from_cache[id] for id in operator.origins]
+            return self.run_operator(operator, input_dm, input_keys, phase, cached_inputs)
+
+        executor = ThreadPoolExecutor(max_workers=self.n_jobs) if self.n_jobs > 1 else None
+        try:
+            for level in self.get_levels():
+                if executor is not None and len(level) > 1:
+                    results = list(executor.map(run, level))
+                else:
+                    results = [run(operator) for operator in level]
+                for operator, (output_dm, key, cache_hit) in zip(level, results):
+                    self.cached_dm[operator.id] = output_dm
+                    keys[operator.id] = key
+                    from_cache[operator.id] = cache_hit
+                # Release the outputs whose consumers have all run.
+                for operator in level:
+                    for origin in operator.origins or []:
+                        consumer_cnt[origin] -= 1
+                        if consumer_cnt[origin] == 0 and origin != final_id:
+                            self.cached_dm.pop(origin)
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
-        final_dm = self.cached_dm[len(self.pipeline_operators) - 1]
+        final_dm = self.cached_dm[final_id]
+        if from_cache[final_id]:
+            final_dm = copy.deepcopy(final_dm)
         assert isinstance(final_dm, DataManager)
         if phase == 'train':
-            final_dm.split(stratify=stratify)
+            self.categorical_cardinality = final_dm.categorical_cardinality
+            try:
+                self.plan = self.compile()
+            except NotImplementedError:
+                self.plan = None
         return final_dm
@@ -1,20 +1,64 @@
 import typing
+import itertools
 import numpy as np
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
 
 from alphaml.engine.components.data_manager import DataManager
 from alphaml.engine.components.pipeline.base_operator import Operator, FEATURE_GENERATION
+from alphaml.engine.components.pipeline.transform_plan import ColumnTransformStep, RowStatisticsStep, \
+    InteractionStep, get_row_statistics, get_interactions
 from alphaml.engine.components.feature_engineering.auto_cross import AutoCross
 
 
 class PolynomialFeaturesOperator(Operator):
-    def __init__(self, params=2):
+    def __init__(self, params=2, top_k=None, block_size=256, sample_size=10000):
         '''
         :param params: Stand for degrees. Default 2
+        :param top_k: number of interactions to keep, ranked by their absolute correlation with the label.
+                        None means all interactions
+        :param block_size: number of interaction columns computed at a time
+        :param sample_size: number of rows used to score the interactions
         '''
         super().__init__(FEATURE_GENERATION, 'fg_polynomial', params)
-        self.polynomialfeatures = PolynomialFeatures(degree=params, interaction_only=True)
+        self.top_k = top_k
+        self.block_size = block_size
+        self.sample_size = sample_size
+        self.numerical_index = []
+        self.combinations = []
+
+    def get_combinations(self, n_features):
+        # The same order as the interaction-only polynomial features of sklearn.
+        return [np.array(list(itertools.combinations(range(n_features), degree)), dtype=np.int64).reshape((-1, degree))
+                for degree in range(2, self.params + 1)]
+
+    def select_combinations(self, x, y, combinations):
+        """
+        Keep the top-k combinations by the absolute correlation of their products with the label on a row sample.
+        """
+        rng = np.random.RandomState(1)
+        if len(x) > self.sample_size:
+            sample_index = rng.choice(len(x), self.sample_size, replace=False)
+            x, y = x[sample_index], y[sample_index]
+        y = np.asarray(y, dtype=np.float64)
+        y = y - y.mean()
+        y_norm = np.linalg.norm(y)
+        scores = list()
+        for combination in combinations:
+            for start in range(0, len(combination), self.block_size):
+                product = get_interactions(x, [combination[start: start + self.block_size]]).astype(np.float64)
+                product -= product.mean(axis=0)
+                norm = np.linalg.norm(product, axis=0) * y_norm
+                norm[norm == 0] = 1
+                scores.append(np.abs(y.dot(product)) / norm)
+        scores = np.concatenate(scores)
+        # Keep the selected combinations in their original order.
+        selected = np.zeros(len(scores), dtype=bool)
+        selected[np.argsort(-scores, kind='mergesort')[:self.top_k]] = True
+        selected_combinations, offset = list(), 0
+        for combination in combinations:
+            selected_combinations.append(combination[selected[offset: offset + len(combination)]])
+            offset += len(combination)
+        return selected_combinations
 
     def operate(self, dm_list: typing.List, phase='train') -> DataManager:
         # The input of a PolynomialFeatureOperator is a DataManager
@@ -25,20 +69,23 @@ class PolynomialFeaturesOperator(Operator):
         feature_types = dm.feature_types
         numericial_index = [i for i in range(len(feature_types))
                             if feature_types[i] == "Float" or feature_types[i] == "Discrete"]
-        init_length = len(numericial_index) + 1
+        result_dm = DataManager()
         if phase == 'train':
-            x = dm.train_X
-            newfeatures = self.polynomialfeatures.fit_transform(x[:, numericial_index])
-            result_dm = DataManager()
-            result_dm.train_X = newfeatures[:, init_length:]
+            self.numerical_index = numericial_index
+            x = np.asarray(dm.train_X[:, numericial_index], dtype=np.float64)
+            self.combinations = self.get_combinations(len(numericial_index))
+            if self.top_k is not None:
+                self.combinations = self.select_combinations(x, dm.train_y, self.combinations)
+            result_dm.train_X = get_interactions(x, self.combinations, self.block_size)
             result_dm.train_y = dm.train_y
         else:
             x = dm.test_X
-            newfeatures = self.polynomialfeatures.transform(x[:, numericial_index])
-            result_dm = DataManager()
-            result_dm.test_X = newfeatures[:, init_length:]
+            result_dm.test_X = get_interactions(x[:, self.numerical_index], self.combinations, self.block_size)
         return result_dm
 
+    def compile(self):
+        return [InteractionStep(self.numerical_index, self.combinations, self.block_size)]
+
 
 class AutoCrossOperator(Operator):
     def __init__(self, stratify, metric=None, params=50):
@@ -79,14 +126,46 @@ class AutoCrossOperator(Operator):
             result_dm.test_X = self.autocross.transform(x)
         return result_dm
 
+    def compile(self):
+        return [ColumnTransformStep(self.autocross)]
+
+
+def transform_in_chunks(transformer, x, chunk_size):
+    """
+    Transform the rows a chunk at a time, into a preallocated output.
+    """
+    output = None
+    for start in range(0, len(x), chunk_size):
+        chunk_output = transformer.transform(x[start: start + chunk_size])
+        if output is None:
+            output = np.empty((len(x), chunk_output.shape[1]), dtype=chunk_output.dtype)
+        output[start: start + chunk_size] = chunk_output
+    return output
+
 
 class PCAOperator(Operator):
-    def __init__(self, params=10):
+    def __init__(self, params=10, chunk_size=10000):
         '''
         :param params: Stand for n_components. Default 10
+        :param chunk_size: number of rows processed at a time. The PCA is fitted incrementally
+                            on the chunks if there are more rows
         '''
         super().__init__(FEATURE_GENERATION, 'fg_pca', params)
-        self.pca = PCA(whiten=True, n_components=params)
+        self.chunk_size = chunk_size
+        self.pca = None
+        self.numerical_index = []
+
+    def fit(self, x):
+        n_components = min(self.params, x.shape[1])
+        if len(x) <= self.chunk_size:
+            self.pca = PCA(whiten=True, n_components=min(n_components, len(x)))
+            self.pca.fit(x)
+            return
+        self.pca = IncrementalPCA(n_components=n_components, whiten=True, batch_size=self.chunk_size)
+        # Each chunk must have at least n_components rows, so the last chunk is merged into the previous one.
+        n_chunks = len(x) // self.chunk_size
+        for chunk_index in np.array_split(np.arange(len(x)), n_chunks):
+            self.pca.partial_fit(x[chunk_index[0]: chunk_index[-1] + 1])
 
     def operate(self, dm_list: typing.List, phase='train'):
         # The input of a PCAOperator is a DataManager
@@ -97,48 +176,46 @@ class PCAOperator(Operator):
         feature_types = dm.feature_types
         numerical_index = [i for i in range(len(feature_types))
                            if feature_types[i] == "Float" or feature_types[i] == "Discrete"]
+        result_dm = DataManager()
         if phase == 'train':
-            x = dm.train_X
-            result_dm = DataManager()
-            result_dm.train_X = self.pca.fit_transform(x[:, numerical_index])
+            self.numerical_index = numerical_index
+            x = np.asarray(dm.train_X[:, numerical_index], dtype=np.float64)
+            self.fit(x)
+            result_dm.train_X = transform_in_chunks(self.pca, x, self.chunk_size)
             result_dm.train_y = dm.train_y
         else:
-            x = dm.test_X
-            result_dm = DataManager()
-            result_dm.test_X = self.pca.fit_transform(x[:, numerical_index])
+            # The test data is projected with the components fitted on the training data.
+            x = np.asarray(dm.test_X[:, self.numerical_index], dtype=np.float64)
+            result_dm.test_X = transform_in_chunks(self.pca, x, self.chunk_size)
         return result_dm
 
+    def compile(self):
+        return [ColumnTransformStep(self.pca, self.numerical_index)]
+
 
 class ZeroOperator(Operator):
-    def __init__(self, params=None):
+    def __init__(self, params=None, chunk_size=10000):
+        '''
+        :param params: list of row statistics in ['zero', 'nan', 'negative', 'mean', 'std']. Default ['zero'],
+                        the number of zeros in each row
+        :param chunk_size: number of rows computed at a time
+        '''
         super().__init__(FEATURE_GENERATION, 'fg_zero', params)
+        self.statistics = params if params is not None else ['zero']
+        self.chunk_size = chunk_size
 
     def operate(self, dm_list: typing.List, phase='train'):
         assert len(dm_list) == 1 and isinstance(dm_list[0], DataManager)
         self.check_phase(phase)
 
         dm = dm_list[0]
+        result_dm = DataManager()
         if phase == 'train':
-            x = dm.train_X
-            newfeature = np.zeros((len(x), 1))
-            for i, sample in enumerate(x):
-                cnt = 0
-                for column in sample:
-                    if column == 0:
-                        cnt += 1
-                newfeature[i] = cnt
-            result_dm = DataManager()
-            result_dm.train_X = newfeature
+            result_dm.train_X = get_row_statistics(dm.train_X, self.statistics, self.chunk_size)
             result_dm.train_y = dm.train_y
         else:
-            x = dm.test_X
-            newfeature = np.zeros((len(x), 1))
-            for i, sample in enumerate(x):
-                cnt = 0
-                for column in sample:
-                    if column == 0:
-                        cnt += 1
-                newfeature[i] = cnt
-            result_dm = DataManager()
-            result_dm.test_X = newfeature
+            result_dm.test_X = get_row_statistics(dm.test_X, self.statistics, self.chunk_size)
         return result_dm
+
+    def compile(self):
+        return [RowStatisticsStep(self.statistics, self.chunk_size)]
@@ -1,9 +1,29 @@
 import typing
 import numpy as np
-from sklearn.feature_selection import SelectKBest
 from sklearn.feature_selection import chi2, f_classif, mutual_info_classif, f_regression, mutual_info_regression
 from alphaml.engine.components.data_manager import DataManager
-from alphaml.engine.components.pipeline.base_operator import Operator, FEATURE_SELECTION
+from alphaml.engine.components.pipeline.base_operator import Operator, FEATURE_SELECTION, concat_cardinality, \
+    select_cardinality
+from alphaml.engine.components.pipeline.transform_plan import SelectStep
+from alphaml.engine.components.feature_engineering.selector import get_scores, get_fingerprint, score_cache
+
+
+def select_columns(blocks, index):
+    """
+    Select the columns of the horizontal concatenation of blocks, without concatenating them.
+    :param blocks: list of arrays with the same number of rows
+    :param index: array of int, the columns of the concatenation
+    :return: array of shape = [n_samples, len(index)]
+    """
+    index = np.asarray(index, dtype=np.int64)
+    offsets = np.cumsum([0] + [block.shape[1] for block in blocks])
+    block_ids = np.searchsorted(offsets, index, side='right') - 1
+    output = np.empty((blocks[0].shape[0], len(index)), dtype=np.result_type(*blocks))
+    for block_id, block in enumerate(blocks):
+        mask = block_ids == block_id
+        if mask.any():
+            output[:, mask] = block[:, index[mask] - offsets[block_id]]
+    return output
 
 
 class IdenticalOperator(Operator):
@@ -13,35 +33,30 @@ class IdenticalOperator(Operator):
     def operate(self, dm_list: typing.List, phase='train'):
         self.check_phase(phase)
 
-        x = None
-        y = None
         if phase == 'train':
-            for dm in dm_list:
-                if x is None:
-                    x = dm.train_X
-                    y = dm.train_y
-                else:
-                    x = np.hstack((x, dm.train_X))
-            dm = DataManager(x, y, spilt=False)
+            dm = DataManager()
+            dm.train_X = np.hstack([dm.train_X for dm in dm_list]) if len(dm_list) > 1 else dm_list[0].train_X
+            dm.train_y = dm_list[0].train_y
+            dm.categorical_cardinality = concat_cardinality(dm_list)
         else:
-            for dm in dm_list:
-                if x is None:
-                    x = dm.test_X
-                else:
-                    x = np.hstack((x, dm.test_X))
             dm = DataManager()
-            dm.test_X = x
+            dm.test_X = np.hstack([dm.test_X for dm in dm_list]) if len(dm_list) > 1 else dm_list[0].test_X
         return dm
 
+    def compile(self):
+        # The plan concatenates the origins.
+        return []
+
 
 class NaiveSelectorOperator(Operator):
-    def __init__(self, params=[50, 0]):
+    def __init__(self, params=[50, 0], n_jobs=1):
         '''
         :param params: A list. The first element stands for k in 'k-best', the second stands for metric function
                         0 for chi2, 1 for f_classif, 2 for mutual_info_classif, 3 for f_regression, 4 for mutual_info_regression
                         0,1,2 are for classification and 0,3,4 are for regression
                         Warnings: function chi2 can be used only if the features are non-negative
         :param metric: Function taking two arrays X and y, and returning a pair of arrays (scores, pvalues) or a single array with scores.
+        :param n_jobs: Number of threads to compute the scores of the column blocks.
         '''
         super().__init__(FEATURE_SELECTION, 'fs_kbestselector', params)
         k_best, metric = params
@@ -61,34 +76,30 @@ class NaiveSelectorOperator(Operator):
             self.metric = metric
 
         self.k_best = k_best
-        self.selector = SelectKBest(self.metric, k_best)
+        self.n_jobs = n_jobs
+        self.selected_index = None
 
     def operate(self, dm_list: typing.List, phase='train'):
         # The input of a NaiveSelectorOperator is a list of DataManager
         self.check_phase(phase)
 
-        x = None
-        y = None
         if phase == 'train':
-            for dm in dm_list:
-                if x is None:
-                    x = dm.train_X
-                    y = dm.train_y
-                else:
-                    x = np.hstack((x, dm.train_X))
-            x = self.selector.fit_transform(x, y)
-            dm = DataManager(x, y, spilt=False)
+            blocks, y = [dm.train_X for dm in dm_list], dm_list[0].train_y
+            # The scores are univariate, so each input is scored on its own and the scores are cached.
+            scores = np.concatenate([get_scores(self.metric, x, y, self.n_jobs) for x in blocks])
+            self.selected_index = np.sort(np.argsort(-scores, kind='mergesort')[:self.k_best])
+            dm = DataManager()
+            dm.train_X = select_columns(blocks, self.selected_index)
+            dm.train_y = y
+            dm.categorical_cardinality = select_cardinality(concat_cardinality(dm_list), self.selected_index)
         else:
-            for dm in dm_list:
-                if x is None:
-                    x = dm.test_X
-                else:
-                    x = np.hstack((x, dm.test_X))
-            x = self.selector.transform(x)
             dm = DataManager()
-            dm.test_X = x
+            dm.test_X = select_columns([dm.test_X for dm in dm_list], self.selected_index)
         return dm
 
+    def compile(self):
+        return [SelectStep(self.selected_index)]
+
 
 class MLSelectorOperator(Operator):
     RANDOM_FOREST = 0
@@ -122,40 +133,34 @@ class MLSelectorOperator(Operator):
                 self.selector = Lasso()
         self.sorted_features = None
 
+    def get_importances(self, x, y):
+        self.selector.fit(x, y)
+        if self.model == self.RANDOM_FOREST:
+            return self.selector.feature_importances_
+        if self.selector.coef_.ndim == 1:
+            return self.selector.coef_
+        return np.linalg.norm(self.selector.coef_, axis=0, ord=1)
+
     def operate(self, dm_list: typing.List, phase='train'):
         '''
         :return: self.result_dm is a new Datamanager with data splited for training and validation
         '''
-        x = None
-        y = None
-        if phase == 'train':
-            for dm in dm_list:
-                if x is None:
-                    x = dm.train_X
-                    y = dm.train_y
-                else:
-                    x = np.hstack((x, dm.train_X))
-            self.selector.fit(x, y)
-        else:
-            for dm in dm_list:
-                if x is None:
-                    x = dm.test_X
-                else:
-                    x = np.hstack((x, dm.test_X))
+        self.check_phase(phase)
 
-        if self.model == self.RANDOM_FOREST:
-            self.sorted_features = np.argsort(self.selector.feature_importances_)[::-1]
-        elif self.model == self.LASSO_REGRESSION:
-            if self.selector.coef_.ndim == 1:
-                self.sorted_features = np.argsort(self.selector.coef_)[::-1]
-            else:
-                importances = np.linalg.norm(self.selector.coef_, axis=0, ord=1)
-                self.sorted_features = np.argsort(importances)[::-1]
-        x = x[:, self.sorted_features[:self.kbest]]
         dm = DataManager()
         if phase == 'train':
-            dm.train_X = x
+            blocks, y = [dm.train_X for dm in dm_list], dm_list[0].train_y
+            # The importances do not depend on k, so they are cached for the same inputs.
+            key = (get_fingerprint(y, *blocks), 'mlselector', self.task, self.model)
+            importances = score_cache.get(key, lambda: self.get_importances(np.hstack(blocks), y))
+            self.sorted_features = np.argsort(importances)[::-1]
+            dm.train_X = select_columns(blocks, self.sorted_features[:self.kbest])
             dm.train_y = y
+            dm.categorical_cardinality = select_cardinality(concat_cardinality(dm_list),
+                                                            self.sorted_features[:self.kbest])
         else:
-            dm.test_X = x
+            dm.test_X = select_columns([dm.test_X for dm in dm_list], self.sorted_features[:self.kbest])
         return dm
+
+    def compile(self):
+        return [SelectStep(self.sorted_features[:self.kbest])]
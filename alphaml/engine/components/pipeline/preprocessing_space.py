@@ -0,0 +1,286 @@
+import os
+import shutil
+import pickle
+import hashlib
+import numpy as np
+from ConfigSpace import ConfigurationSpace
+from ConfigSpace.hyperparameters import CategoricalHyperparameter, UniformIntegerHyperparameter
+from ConfigSpace.conditions import EqualsCondition, InCondition
+
+from alphaml.engine.components.data_manager import DataManager
+from alphaml.engine.components.pipeline.base_operator import assign_origins
+from alphaml.engine.components.pipeline.data_preprocessing_operator import FeatureEncoderOperator, \
+    FrequencyEncoderOperator, TargetEncoderOperator, ScalerOperator, ConstantRemoverOperator
+from alphaml.engine.components.pipeline.feature_generation_operator import PolynomialFeaturesOperator, PCAOperator, \
+    ZeroOperator
+from alphaml.engine.components.pipeline.feature_selection_operator import IdenticalOperator, NaiveSelectorOperator, \
+    MLSelectorOperator
+from alphaml.engine.components.pipeline.transform_plan import TransformPlan, OneHotCodeStep
+from alphaml.utils.constants import ORDINAL_ENCODING, ONEHOT_ENCODING, TARGET_ENCODING, FREQUENCY_ENCODING
+
+"""
+The preprocessing choices searched jointly with the models.
+In the SMAC space, the preprocessing hyper-parameters are prefixed with PREPROCESSING_PREFIX.
+"""
+
+PREPROCESSING_PREFIX = 'preprocessor'
+
+_scalers = {'standard': 0, 'minmax': 1, 'maxabs': 2}
+_encoders = {'onehot': 0, 'ordinal': 1, 'native': 2}
+
+
+def get_hyperparameter_search_space(include_encoder=False):
+    """
+    :param include_encoder: bool, whether to search the encoder of the categorical features
+    :return: ConfigurationSpace
+    """
+    cs = ConfigurationSpace()
+    scaler = CategoricalHyperparameter('scaler', ['none', 'standard', 'minmax', 'maxabs'], default_value='none')
+    generator = CategoricalHyperparameter('generator', ['none', 'polynomial', 'pca', 'zero'], default_value='none')
+    polynomial_top_k = UniformIntegerHyperparameter('polynomial_top_k', 10, 200, default_value=50, log=True)
+    pca_components = UniformIntegerHyperparameter('pca_components', 2, 50, default_value=10, log=True)
+    selector = CategoricalHyperparameter('selector', ['none', 'kbest', 'random_forest'], default_value='none')
+    selector_k = UniformIntegerHyperparameter('selector_k', 5, 200, default_value=50, log=True)
+    cs.add_hyperparameters([scaler, generator, polynomial_top_k, pca_components, selector, selector_k])
+    cs.add_condition(EqualsCondition(polynomial_top_k, generator, 'polynomial'))
+    cs.add_condition(EqualsCondition(pca_components, generator, 'pca'))
+    cs.add_condition(InCondition(selector_k, selector, ['kbest', 'random_forest']))
+    if include_encoder:
+        encoders = ['native', 'onehot', 'ordinal', FREQUENCY_ENCODING, TARGET_ENCODING]
+        cs.add_hyperparameter(CategoricalHyperparameter('encoder', encoders, default_value='native'))
+    return cs
+
+
+def get_preprocessing_config(config):
+    """
+    Extract the preprocessing hyper-parameters from a SMAC configuration.
+    :param config: Configuration or dictionary
+    :return: dictionary, empty if the configuration has no preprocessing
+    """
+    config_dict = config.get_dictionary() if hasattr(config, 'get_dictionary') else config
+    prefix = PREPROCESSING_PREFIX + ':'
+    return dict((key[len(prefix):], value) for key, value in config_dict.items() if key.startswith(prefix))
+
+
+def get_config_id(config):
+    config_list = ['%s-%s' % (key, str(value)) for key, value in sorted(config.items())]
+    return hashlib.sha1('_'.join(config_list).encode('utf8')).hexdigest()
+
+
+def get_encoder(config, task='classification'):
+    """
+    :param config: dictionary
+    :param task: str, 'classification' or 'regression'
+    :return: Operator, the FeatureEncoderOperator of the native integer codes by default
+    """
+    encoder = config.get('encoder', 'native')
+    if encoder == FREQUENCY_ENCODING:
+        return FrequencyEncoderOperator()
+    elif encoder == TARGET_ENCODING:
+        return TargetEncoderOperator(task=task)
+    return FeatureEncoderOperator(_encoders[encoder])
+
+
+def get_operators(config, task='classification'):
+    """
+    Build the scaler, feature generation and feature selection operators of a preprocessing configuration.
+    :param config: dictionary
+    :param task: str, 'classification' or 'regression'
+    :return: list of Operator, ending with a feature selection operator
+    """
+    operators = list()
+    if config.get('scaler', 'none') != 'none':
+        operators.append(ScalerOperator(_scalers[config['scaler']]))
+
+    generator = config.get('generator', 'none')
+    if generator == 'polynomial':
+        operators.append(PolynomialFeaturesOperator(2, top_k=config['polynomial_top_k']))
+    elif generator == 'pca':
+        operators.append(PCAOperator(config['pca_components']))
+    elif generator == 'zero':
+        operators.append(ZeroOperator())
+
+    selector = config.get('selector', 'none')
+    if selector == 'kbest':
+        # f_classif or f_regression.
+        operators.append(NaiveSelectorOperator([config['selector_k'], 1 if task == 'classification' else 3]))
+    elif selector == 'random_forest':
+        operators.append(MLSelectorOperator([config['selector_k'], 0 if task == 'classification' else 1, 0]))
+    else:
+        operators.append(IdenticalOperator())
+    return operators
+
+
+class Preprocessor(object):
+    """The preprocessing of a configuration on numerical arrays."""
+
+    def __init__(self, config, task='classification', categorical_cardinality=None, encoding=ORDINAL_ENCODING):
+        """
+        :param config: dictionary, the preprocessing hyper-parameters
+        :param task: str, 'classification' or 'regression'
+        :param categorical_cardinality: dictionary, the number of categories of each column of integer codes
+        :param encoding: str, the encoding of the integer codes that the model consumes,
+            ORDINAL_ENCODING keeps the codes, the other encodings replace them
+        """
+        self.config = config
+        self.task = task
+        self.categorical_cardinality = categorical_cardinality or None
+        self.encoding = encoding if self.categorical_cardinality else ORDINAL_ENCODING
+        self.encode_step = OneHotCodeStep(self.categorical_cardinality) \
+            if self.encoding == ONEHOT_ENCODING else None
+        self.operators = None
+        self.plan = None
+
+    def get_id(self):
+        config = dict(self.config)
+        if self.categorical_cardinality:
+            config['categorical_cardinality'] = sorted(self.categorical_cardinality.items())
+            config['encoding'] = self.encoding
+        return get_config_id(config)
+
+    def get_feature_types(self, n_features):
+        if self.encoding == ONEHOT_ENCODING:
+            width = self.encode_step.offsets[-1]
+            return ['One-Hot'] * width + ['Float'] * (n_features - width)
+        feature_types = ['Float'] * n_features
+        for column in self.categorical_cardinality or {}:
+            feature_types[column] = 'Categorical-Code'
+        return feature_types
+
+    def encode(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return X if self.encode_step is None else self.encode_step.transform(X)
+
+    def fit_transform(self, X, y):
+        """
+        Fit the operators on the training data, and compile them for the transform.
+        :return: array, the transformed training data
+        """
+        X = self.encode(X)
+        self.operators = list()
+        if self.encoding in [FREQUENCY_ENCODING, TARGET_ENCODING]:
+            # The statistics of the codes are computed on the training data only.
+            self.operators.append(get_encoder({'encoder': self.encoding}, self.task))
+        if len(self.config) > 0:
+            # The constant remover is the root of the preprocessing.
+            self.operators += [ConstantRemoverOperator()] + get_operators(self.config, self.task)
+        if len(self.operators) == 0:
+            return X
+        assign_origins(self.operators)
+        outputs = dict()
+        for operator in self.operators:
+            if operator.origins is None:
+                dm = DataManager()
+                dm.train_X, dm.train_y = X, y
+                dm.feature_types = self.get_feature_types(X.shape[1])
+                input_dm = [dm]
+            else:
+                input_dm = [outputs[origin] for origin in operator.origins]
+            for dm in input_dm:
+                if dm.feature_types is None:
+                    dm.feature_types = ['Float'] * dm.train_X.shape[1]
+            outputs[operator.id] = operator.operate(input_dm, phase='train')
+        self.plan = TransformPlan([(operator.id, operator.origins or [], operator.compile())
+                                   for operator in self.operators])
+        return outputs[self.operators[-1].id].train_X
+
+    def fit(self, X, y):
+        self.fit_transform(X, y)
+        return self
+
+    def transform(self, X):
+        X = self.encode(X)
+        return X if self.plan is None else self.plan.transform(X)
+
+    def __getstate__(self):
+        # The compiled plan is all the transform needs.
+        state = self.__dict__.copy()
+        state['operators'] = None
+        return state
+
+
+class PreprocessedModel(object):
+    """A model fitted on the output of a preprocessor."""
+
+    def __init__(self, preprocessor, estimator):
+        self.preprocessor = preprocessor
+        self.estimator = estimator
+
+    def fit(self, X, y):
+        self.estimator.fit(self.preprocessor.fit_transform(X, y), y)
+        return self
+
+    def predict(self, X):
+        return self.estimator.predict(self.preprocessor.transform(X))
+
+    def predict_proba(self, X):
+        return self.estimator.predict_proba(self.preprocessor.transform(X))
+
+
+class PreprocessingCache(object):
+    """
+    A cache of the preprocessed data splits in files under root_dir, limited by the size (MB) of the files.
+    SMAC evaluates each configuration in a child process, so the splits are shared through files,
+    and the configurations with the same preprocessing fit it once on each split.
+    """
+
+    def __init__(self, root_dir, limit=512):
+        self.root_dir = root_dir
+        self.limit = limit * 1024 * 1024
+        # The number of hits in this process.
+        self.hit_cnt = 0
+
+    def get_path(self, key):
+        return os.path.join(self.root_dir, '%s_%d.pkl' % key)
+
+    def get(self, key):
+        """
+        :param key: (preprocessor id, fold)
+        :return: (preprocessor, train_X, val_X) or None
+        """
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            # Mark the file as recently used.
+            os.utime(path, None)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        self.hit_cnt += 1
+        return result
+
+    def put(self, key, preprocessor, train_X, val_X):
+        if train_X.nbytes + val_X.nbytes > self.limit:
+            return
+        if not os.path.exists(self.root_dir):
+            os.makedirs(self.root_dir, exist_ok=True)
+        path = self.get_path(key)
+        # Write to a temporary file first, so that another process never loads a half-written file.
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((preprocessor, train_X, val_X), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used files until their size is within the limit."""
+        files = list()
+        for name in os.listdir(self.root_dir):
+            if name.endswith('.pkl'):
+                try:
+                    stat = os.stat(os.path.join(self.root_dir, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, name))
+        nbytes = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if nbytes <= self.limit:
+                break
+            try:
+                os.remove(os.path.join(self.root_dir, name))
+            except OSError:
+                pass
+            nbytes -= size
+
+    def clear(self):
+        shutil.rmtree(self.root_dir, ignore_errors=True)
@@ -0,0 +1,356 @@
+import numpy as np
+import pandas as pd
+from alphaml.engine.components.data_preprocessing.imputer import fill_missing
+
+"""
+A fitted DP_Pipeline compiled into a lean plan of array transforms for the test phase.
+Each node of the plan applies its steps to the horizontal concatenation of its origins. The column indices,
+the keep-masks of the removers and the lookup tables of the encoders are computed once at compile time,
+consecutive column selections are fused, and chains of operators are merged into a single node.
+"""
+
+
+class TransformStep(object):
+    # Whether the step writes into its input.
+    inplace = False
+
+    def transform(self, X):
+        raise NotImplementedError()
+
+
+class ImputeStep(TransformStep):
+    def __init__(self, columns, fill_values, indicator_columns=()):
+        """
+        :param columns: list, the feature columns of the training DataFrame
+        :param fill_values: dictionary, the fill value of each column
+        :param indicator_columns: list, the columns whose missing indicators are appended
+        """
+        self.inplace = True
+        self.columns = columns
+        self.fill_values = fill_values
+        self.fill_array = np.array([fill_values.get(col, np.nan) for col in columns], dtype=object)
+        self.indicator_index = np.array([columns.index(col) for col in indicator_columns], dtype=np.int64)
+
+    def transform(self, X):
+        if isinstance(X, pd.DataFrame):
+            if list(X.columns) != self.columns:
+                # Drop the label column if the data has one.
+                X = X[self.columns]
+            # The numerical data stays numerical, only the categorical data needs objects.
+            X = np.array(X.values)
+        mask = fill_missing(X, self.fill_array)
+        if len(self.indicator_index) > 0:
+            X = np.hstack([X, mask[:, self.indicator_index].astype(np.int64)])
+        return X
+
+
+class SelectStep(TransformStep):
+    def __init__(self, index):
+        """
+        :param index: array of int, the columns to keep
+        """
+        self.index = np.asarray(index, dtype=np.int64)
+
+    def transform(self, X):
+        return X[:, self.index]
+
+
+class EncodeStep(TransformStep):
+    def __init__(self, categorical_index, other_index, categories, onehot=True, handle_unknown='error'):
+        """
+        :param categorical_index: list of int, the categorical columns
+        :param other_index: list of int, the other columns
+        :param categories: list of arrays, the categories of each categorical column
+        :param onehot: bool, one-hot codes first then the other columns, or the ordinal codes in place
+        :param handle_unknown: str, 'error' or 'ignore', whether the unknown categories raise an error
+            or are coded as -1 by the ordinal codes
+        """
+        self.categorical_index = categorical_index
+        self.other_index = other_index
+        self.categories = [pd.Index(category) for category in categories]
+        self.onehot = onehot
+        self.handle_unknown = handle_unknown
+        self.offsets = np.cumsum([0] + [len(category) for category in categories])
+
+    def get_codes(self, X, i):
+        # The unknown categories are coded as -1.
+        return self.categories[i].get_indexer(X[:, self.categorical_index[i]])
+
+    def transform(self, X):
+        if self.onehot:
+            width = self.offsets[-1]
+            output = np.zeros((X.shape[0], width + len(self.other_index)))
+            for i in range(len(self.categorical_index)):
+                codes = self.get_codes(X, i)
+                rows = np.nonzero(codes >= 0)[0]
+                output[rows, self.offsets[i] + codes[rows]] = 1
+            output[:, width:] = X[:, self.other_index]
+            return output
+        output = np.empty(X.shape)
+        output[:, self.other_index] = X[:, self.other_index]
+        for i in range(len(self.categorical_index)):
+            codes = self.get_codes(X, i)
+            if self.handle_unknown == 'error' and (codes < 0).any():
+                raise ValueError('Found unknown categories in column %d!' % self.categorical_index[i])
+            output[:, self.categorical_index[i]] = codes
+        return output
+
+
+class CategoryMapStep(TransformStep):
+    def __init__(self, categorical_index, other_index, categories, tables):
+        """
+        Replace each categorical column with the rows of its table, the encoded columns first then the other columns.
+        :param categorical_index: list of int, the categorical columns
+        :param other_index: list of int, the other columns
+        :param categories: list of arrays, the categories of each categorical column
+        :param tables: list of arrays of shape = [n_categories + 1, width], the last row for the unknown categories
+        """
+        self.categorical_index = categorical_index
+        self.other_index = other_index
+        self.categories = [pd.Index(category) for category in categories]
+        self.tables = tables
+
+    def transform(self, X):
+        # The unknown categories are coded as -1, which is the last row of the tables.
+        blocks = [table[category.get_indexer(X[:, index])]
+                  for index, category, table in zip(self.categorical_index, self.categories, self.tables)]
+        return np.hstack(blocks + [X[:, self.other_index].astype(np.float64)])
+
+
+class OneHotCodeStep(TransformStep):
+    def __init__(self, cardinality):
+        """
+        One-hot encode the integer codes of the categorical columns, the negative codes are encoded as zeros.
+        :param cardinality: dictionary, the number of categories of each categorical column
+        """
+        self.categorical_index = np.array(sorted(cardinality), dtype=np.int64)
+        self.category_cnts = np.array([cardinality[column] for column in self.categorical_index], dtype=np.int64)
+        self.offsets = np.cumsum(np.concatenate([[0], self.category_cnts]))
+
+    def transform(self, X):
+        """
+        :return: array, the one-hot codes first then the other columns
+        """
+        other_mask = np.ones(X.shape[1], dtype=bool)
+        other_mask[self.categorical_index] = False
+        width = self.offsets[-1]
+        output = np.zeros((X.shape[0], width + other_mask.sum()))
+        codes = X[:, self.categorical_index]
+        valid = (codes >= 0) & (codes < self.category_cnts)
+        rows, columns = np.nonzero(valid)
+        output[rows, self.offsets[columns] + codes[rows, columns].astype(np.int64)] = 1
+        output[:, width:] = X[:, other_mask]
+        return output
+
+
+class AffineStep(TransformStep):
+    def __init__(self, index, scale, offset):
+        """
+        Compute X[:, index] * scale + offset in place.
+        """
+        self.inplace = True
+        self.index = np.asarray(index, dtype=np.int64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+
+    def transform(self, X):
+        X = X.astype(np.float64, copy=False)
+        X[:, self.index] = X[:, self.index] * self.scale + self.offset
+        return X
+
+
+class ColumnTransformStep(TransformStep):
+    def __init__(self, transformer, index=None, start=0, replace=False):
+        """
+        :param transformer: fitted object with transform
+        :param index: array of int, the input columns, None means all columns
+        :param start: int, the first output column to keep
+        :param replace: bool, write the output back into the input columns, or return the output only
+        """
+        self.transformer = transformer
+        self.index = None if index is None else np.asarray(index, dtype=np.int64)
+        self.start = start
+        self.replace = replace
+        self.inplace = replace
+
+    def transform(self, X):
+        output = self.transformer.transform(X if self.index is None else X[:, self.index])
+        if hasattr(output, 'toarray'):
+            output = output.toarray()
+        output = output[:, self.start:]
+        if not self.replace:
+            return output
+        X = X.astype(np.float64, copy=False)
+        X[:, self.index] = output
+        return X
+
+
+ROW_STATISTICS = ['zero', 'nan', 'negative', 'mean', 'std']
+
+
+def get_row_statistics(X, statistics=('zero',), chunk_size=10000):
+    """
+    Compute cheap aggregates of each row, a chunk of rows at a time.
+    :param X: array or sparse matrix of shape = [n_samples, n_features]
+    :param statistics: list of str from ROW_STATISTICS, the counts of zeros, NaNs and negatives,
+        and the mean and std of the non-NaN values
+    :param chunk_size: int, number of rows in a chunk
+    :return: array of shape = [n_samples, len(statistics)]
+    """
+    for statistic in statistics:
+        if statistic not in ROW_STATISTICS:
+            raise ValueError('Unknown row statistic: %s' % statistic)
+    output = np.zeros((X.shape[0], len(statistics)))
+    for start in range(0, X.shape[0], chunk_size):
+        chunk = X[start: start + chunk_size]
+        if hasattr(chunk, 'tocsr'):
+            # Only the stored values of a sparse matrix are visited, the others are zeros.
+            chunk = chunk.tocsr()
+            rows = np.repeat(np.arange(chunk.shape[0]), np.diff(chunk.indptr))
+            data = np.asarray(chunk.data, dtype=np.float64)
+            nan_cnt = np.bincount(rows[np.isnan(data)], minlength=chunk.shape[0])
+            data = np.where(np.isnan(data), 0., data)
+            stored_zero_cnt = np.bincount(rows[data == 0], minlength=chunk.shape[0])
+            negative_cnt = np.bincount(rows[data < 0], minlength=chunk.shape[0])
+            zero_cnt = chunk.shape[1] - np.diff(chunk.indptr) + stored_zero_cnt - nan_cnt
+            value_sum = np.bincount(rows, weights=data, minlength=chunk.shape[0])
+            square_sum = np.bincount(rows, weights=data ** 2, minlength=chunk.shape[0])
+        else:
+            chunk = np.asarray(chunk, dtype=np.float64)
+            is_nan = np.isnan(chunk)
+            nan_cnt = is_nan.sum(axis=1)
+            zero_cnt = (chunk == 0).sum(axis=1)
+            negative_cnt = (chunk < 0).sum(axis=1)
+            chunk = np.where(is_nan, 0., chunk)
+            value_sum = chunk.sum(axis=1)
+            square_sum = (chunk ** 2).sum(axis=1)
+        value_cnt = np.maximum(chunk.shape[1] - nan_cnt, 1)
+        mean = value_sum / value_cnt
+        values = {'zero': zero_cnt,
+                  'nan': nan_cnt,
+                  'negative': negative_cnt,
+                  'mean': mean,
+                  'std': np.sqrt(np.maximum(square_sum / value_cnt - mean ** 2, 0))}
+        for i, statistic in enumerate(statistics):
+            output[start: start + chunk.shape[0], i] = values[statistic]
+    return output
+
+
+class RowStatisticsStep(TransformStep):
+    def __init__(self, statistics=('zero',), chunk_size=10000):
+        self.statistics = statistics
+        self.chunk_size = chunk_size
+
+    def transform(self, X):
+        return get_row_statistics(X, self.statistics, self.chunk_size)
+
+
+def get_interactions(X, combinations, block_size=256):
+    """
+    Compute the products of the column combinations, a block of output columns at a time.
+    :param X: array of shape = [n_samples, n_features]
+    :param combinations: list of int arrays of shape = [n_combinations, degree], one for each degree
+    :param block_size: int, number of output columns computed at a time
+    :return: float32 array of shape = [n_samples, total number of combinations]
+    """
+    X = np.asarray(X, dtype=np.float64)
+    output = np.empty((X.shape[0], sum(len(combination) for combination in combinations)), dtype=np.float32)
+    offset = 0
+    for combination in combinations:
+        for start in range(0, len(combination), block_size):
+            block = combination[start: start + block_size]
+            product = X[:, block[:, 0]]
+            for i in range(1, block.shape[1]):
+                product = product * X[:, block[:, i]]
+            output[:, offset: offset + len(block)] = product
+            offset += len(block)
+    return output
+
+
+class InteractionStep(TransformStep):
+    def __init__(self, index, combinations, block_size=256):
+        """
+        :param index: array of int, the input columns
+        :param combinations: list of int arrays, the combinations of the input columns
+        """
+        self.index = np.asarray(index, dtype=np.int64)
+        self.combinations = combinations
+        self.block_size = block_size
+
+    def transform(self, X):
+        return get_interactions(X[:, self.index], self.combinations, self.block_size)
+
+
+class TransformPlan(object):
+    def __init__(self, nodes):
+        """
+        :param nodes: list of (id, origins, steps) in topological order, the last node is the output
+        """
+        self.nodes = list()
+        for node_id, origins, steps in nodes:
+            self.nodes.append((node_id, list(origins), list(steps)))
+        self.merge_chains()
+        for _, _, steps in self.nodes:
+            steps[:] = self.fuse_steps(steps)
+
+    @staticmethod
+    def fuse_steps(steps):
+        fused = list()
+        for step in steps:
+            if isinstance(step, SelectStep) and len(fused) > 0 and isinstance(fused[-1], SelectStep):
+                fused[-1] = SelectStep(fused[-1].index[step.index])
+            else:
+                fused.append(step)
+        return fused
+
+    def merge_chains(self):
+        """Merge each node into its origin, if it is the only consumer of its only origin."""
+        consumer_cnt = self.get_consumer_cnt()
+        # The position of the node which produces the output of each operator.
+        position = dict()
+        nodes = list()
+        for node_id, origins, steps in self.nodes:
+            if len(origins) == 1 and consumer_cnt[origins[0]] == 1:
+                index = position[origins[0]]
+                _, merged_origins, merged_steps = nodes[index]
+                nodes[index] = (node_id, merged_origins, merged_steps + steps)
+            else:
+                nodes.append((node_id, [nodes[position[origin]][0] for origin in origins], steps))
+                index = len(nodes) - 1
+            position[node_id] = index
+        self.nodes = nodes
+
+    def get_consumer_cnt(self):
+        consumer_cnt = dict((node[0], 0) for node in self.nodes)
+        for _, origins, _ in self.nodes:
+            for origin in origins:
+                consumer_cnt[origin] += 1
+        return consumer_cnt
+
+    def transform(self, X):
+        """
+        :param X: DataFrame or array of shape = [n_samples, n_features]
+        :return: array, the transformed features
+        """
+        consumer_cnt = self.get_consumer_cnt()
+        outputs = dict()
+        for node_id, origins, steps in self.nodes:
+            if len(origins) == 0:
+                output = X
+                # The caller's array is left untouched.
+                if isinstance(X, np.ndarray) and any(step.inplace for step in steps):
+                    output = X.copy()
+            elif len(origins) == 1:
+                output = outputs[origins[0]]
+                if consumer_cnt[origins[0]] > 1 and any(step.inplace for step in steps):
+                    output = output.copy()
+            else:
+                output = np.hstack([outputs[origin] for origin in origins])
+            for step in steps:
+                output = step.transform(output)
+            outputs[node_id] = output
+            for origin in origins:
+                consumer_cnt[origin] -= 1
+                if consumer_cnt[origin] == 0:
+                    outputs.pop(origin)
+        return outputs[self.nodes[-1][0]]
@@ -3,6 +3,7 @@ import logging
 import multiprocessing
 import pickle as pkl
 import os
+import json
 import numpy as np
 from sklearn.metrics import roc_auc_score
 from sklearn.model_selection import train_test_split
@@ -11,8 +12,11 @@ from sklearn.preprocessing import OneHotEncoder
 
 from alphaml.engine.components.models.classification import _classifiers
 from alphaml.engine.components.models.regression import _regressors
+from alphaml.engine.components.pipeline.preprocessing_space import PREPROCESSING_PREFIX, Preprocessor, \
+    PreprocessedModel, PreprocessingCache, get_preprocessing_config
+from alphaml.engine.evaluator.data_plane import DataPlane
 from alphaml.utils.save_ease import save_ease
-from alphaml.utils.constants import FAILED
+from alphaml.utils.constants import FAILED, ORDINAL_ENCODING, ONEHOT_ENCODING
 
 
 def get_smac_config(config):
@@ -23,7 +27,7 @@ def get_smac_config(config):
     """
     config_dict = {}
     for param in config:
-        if param == 'estimator':
+        if param == 'estimator' or param.startswith(PREPROCESSING_PREFIX + ':'):
             continue
         if param.find(":") != -1:
             value = config[param]
@@ -34,6 +38,24 @@ def get_smac_config(config):
     return config_dict
 
 
+def add_preprocessing(config, estimator, task, categorical_cardinality=None):
+    """
+    Wrap the estimator with the preprocessing of a SMAC configuration,
+    and with the encoding of the categorical codes that the estimator consumes.
+    :param config: A configuration in hyper-parameter space for SMAC, or an empty dictionary
+    :param estimator: the estimator built from the configuration
+    :param task: str, 'classification' or 'regression'
+    :param categorical_cardinality: dictionary, the number of categories of each column of integer codes
+    :return: PreprocessedModel, or the estimator if it consumes the data as it is
+    """
+    preprocessing_config = get_preprocessing_config(config)
+    encoding = estimator.get_categorical_encoding() if hasattr(estimator, 'get_categorical_encoding') \
+        else ONEHOT_ENCODING
+    if len(preprocessing_config) == 0 and (not categorical_cardinality or encoding == ORDINAL_ENCODING):
+        return estimator
+    return PreprocessedModel(Preprocessor(preprocessing_config, task, categorical_cardinality, encoding), estimator)
+
+
 def get_tpe_config(config):
     """
     Convert a configuration for TPE into dictionary.
@@ -46,14 +68,21 @@ def get_tpe_config(config):
     return classifier_type, space
 
 
-class BaseClassificationEvaluator(object):
-    """ A class to evaluate configurations for classification"""
+class BaseEvaluator(object):
+    """ The base class of the evaluators for traditional ML tasks"""
 
-    def __init__(self, optimizer='smac', val_size=0.33, kfold=None, save_dir='./data/save_models'):
+    def __init__(self, optimizer='smac', val_size=0.33, kfold=None, save_dir='./data/save_models',
+                 shared_data=False, racing=False, racing_z=1.96):
         """
-        :param optimizer: Algorithm for hyper-parameter tuning
+        :param optimizer: algorithm for hyper-parameter tuning
         :param val_size: float from (0,1), used if kfold is None
         :param kfold: int larger than 2
+        :param save_dir: str, path to save models
+        :param shared_data: bool, whether to place the training data in memory-mapped files under save_dir,
+            so that evaluators pickled to worker processes attach to it instead of carrying a copy
+        :param racing: bool, whether to abort the k-fold evaluation of a configuration once
+            it can not beat the incumbent
+        :param racing_z: float, the z-score of the confidence bound used in racing
         """
         self.optimizer = optimizer
         self.val_size = val_size
@@ -61,8 +90,219 @@ class BaseClassificationEvaluator(object):
         self.data_manager = None
         self.metric_func = None
         self.save_dir = save_dir
+        self.shared_data = shared_data
+        self.racing = racing
+        self.racing_z = racing_z
+        self.random_state = None
+        self.folds = None
+        self.encoded_y = None
+        self.data_plane = None
+        # The preprocessed splits are kept in files, shared by the evaluations in separate processes.
+        self.preprocessing_cache = PreprocessingCache(os.path.join(save_dir, 'preprocessing_cache'))
+        self.categorical_cardinality = None
         self.logger = logging.getLogger(__name__)
 
+    def prepare(self, random_state=None):
+        """
+        Prepare the evaluator once its data manager is set, before evaluating any configuration.
+        The data splits and the label encoding are computed once and reused by all configurations,
+        so that the configurations are compared on the same splits.
+        :param random_state: int, seed of the data splits
+        """
+        if self.kfold:
+            if not isinstance(self.kfold, int) or self.kfold < 2:
+                raise ValueError("Kfold must be an integer larger than 2!")
+        self.random_state = 42 if random_state is None else random_state
+        train_X, train_y = self.data_manager.train_X, self.data_manager.train_y
+        self.folds = self.split(train_X, train_y)
+        self.encoded_y = self.encode_label(train_y)
+        self.data_plane = None
+        self.preprocessing_cache.clear()
+        # The categorical codes are encoded for each estimator as it requires.
+        self.categorical_cardinality = getattr(self.data_manager, 'categorical_cardinality', None)
+        if self.shared_data:
+            self.share_data()
+        if os.path.exists(self.get_racing_path()):
+            os.remove(self.get_racing_path())
+
+    def split(self, X, y):
+        """
+        Split the training data into the holdout split or the k folds.
+        :return: list of (train_index, valid_index)
+        """
+        raise NotImplementedError
+
+    def encode_label(self, y):
+        """
+        Encode the labels once for the metric function if required.
+        :return: array or None
+        """
+        return None
+
+    def share_data(self):
+        """
+        Publish the training data, the data splits and the encoded labels into the data plane.
+        :return: DataPlane or None if the training data can not be memory-mapped
+        """
+        train_X, train_y = self.data_manager.train_X, self.data_manager.train_y
+        if not DataPlane.is_shareable(train_X) or not DataPlane.is_shareable(train_y):
+            self.logger.info('The training data can not be memory-mapped, shared data is disabled.')
+            self.data_plane = None
+            return None
+        self.data_plane = DataPlane(os.path.join(self.save_dir, 'data_plane'))
+        self.data_plane.clear()
+        self.data_plane.publish('train_X', train_X)
+        self.data_plane.publish('train_y', train_y)
+        self.data_plane.publish_folds(self.folds)
+        if self.encoded_y is not None:
+            self.data_plane.publish('encoded_y', self.encoded_y)
+        return self.data_plane
+
+    def get_train_data(self):
+        """
+        :return: train_X, train_y
+        """
+        if self.data_plane is not None:
+            return self.data_plane.attach('train_X'), self.data_plane.attach('train_y')
+        return self.data_manager.train_X, self.data_manager.train_y
+
+    def get_folds(self):
+        """
+        :return: list of (train_index, valid_index)
+        """
+        if self.data_plane is not None:
+            return self.data_plane.attach_folds()
+        return self.folds
+
+    def get_encoded_label(self):
+        """
+        :return: array or None
+        """
+        if self.data_plane is not None and self.encoded_y is not None:
+            return self.data_plane.attach('encoded_y')
+        return self.encoded_y
+
+    def validate(self, estimator, save_path):
+        """
+        Fit and validate an estimator on the data splits.
+        In racing mode, the folds are evaluated in order and the evaluation is aborted once the lower
+        confidence bound of the loss exceeds the loss of the incumbent. The running mean is then
+        returned as a censored loss, which is never better than the loss of the incumbent.
+        :param estimator: the estimator to validate
+        :param save_path: str, path to save the fitted estimator
+        :return: loss: float, the loss to minimize
+        """
+        data_X, data_y = self.get_train_data()
+        folds = self.get_folds()
+        racing = self.racing and len(folds) > 1
+        if racing:
+            state = self.load_racing_state()
+        fold_losses = list()
+        for i, (train_index, valid_index) in enumerate(folds):
+            train_X = data_X[train_index]
+            val_X = data_X[valid_index]
+            train_y = data_y[train_index]
+            val_y = data_y[valid_index]
+
+            if isinstance(estimator, PreprocessedModel):
+                # The configurations with the same preprocessing share the preprocessed splits.
+                key = (estimator.preprocessor.get_id(), i)
+                result = self.preprocessing_cache.get(key)
+                if result is None:
+                    train_X = estimator.preprocessor.fit_transform(train_X, train_y)
+                    val_X = estimator.preprocessor.transform(val_X)
+                    self.preprocessing_cache.put(key, estimator.preprocessor, train_X, val_X)
+                else:
+                    estimator.preprocessor, train_X, val_X = result
+                model = estimator.estimator
+            else:
+                model = estimator
+
+            # Fit the estimator on the training data.
+            model.fit(train_X, train_y)
+            self.logger.info('<FIT MODEL> %d/%d finished!' % (i + 1, len(folds)))
+            with open(save_path, 'wb') as f:
+                pkl.dump(estimator, f)
+                self.logger.info('<MODEL SAVED IN %s>' % save_path)
+
+            # In case of failed estimator
+            try:
+                # Validate it on val data.
+                fold_losses.append(self.get_loss(model, val_X, val_y, valid_index))
+            except ValueError:
+                self.logger.info("<Fit Model> failed!")
+                return -FAILED
+
+            if racing and i + 1 < len(folds) and self.can_not_win(fold_losses, state):
+                state['fold_fit_cnt'] += i + 1
+                state['saved_fit_cnt'] += len(folds) - i - 1
+                self.save_racing_state(state)
+                self.logger.info('<RACING> aborted after %d/%d folds' % (i + 1, len(folds)))
+                return float(np.mean(fold_losses))
+
+        loss = float(np.mean(fold_losses))
+        if racing:
+            state['fold_fit_cnt'] += len(folds)
+            if state['incumbent_loss'] is None or loss < state['incumbent_loss']:
+                state['incumbent_loss'] = loss
+                state['incumbent_fold_losses'] = fold_losses
+            self.save_racing_state(state)
+        return loss
+
+    def get_loss(self, estimator, val_X, val_y, valid_index):
+        """
+        :return: loss of the fitted estimator on one split
+        """
+        raise NotImplementedError
+
+    def can_not_win(self, fold_losses, state):
+        """
+        Check whether the lower confidence bound of the loss exceeds the loss of the incumbent.
+        With a single fold, the deviation of the incumbent's fold losses is used instead.
+        :param fold_losses: list, the losses on the evaluated folds
+        :param state: dictionary, the racing state
+        :return: bool
+        """
+        if state['incumbent_loss'] is None:
+            return False
+        fold_cnt = len(fold_losses)
+        std = np.std(state['incumbent_fold_losses'], ddof=1)
+        if fold_cnt > 1:
+            std = max(std, np.std(fold_losses, ddof=1))
+        lower_bound = np.mean(fold_losses) - self.racing_z * std / np.sqrt(fold_cnt)
+        return lower_bound > state['incumbent_loss']
+
+    def get_racing_path(self):
+        # The evaluations may run in separate processes, so the state is kept in a file.
+        return os.path.join(self.save_dir, 'racing.json')
+
+    def load_racing_state(self):
+        """
+        :return: dictionary, the incumbent loss and fold losses, and the number of fitted and saved folds
+        """
+        state = {'incumbent_loss': None, 'incumbent_fold_losses': None, 'fold_fit_cnt': 0, 'saved_fit_cnt': 0}
+        if os.path.exists(self.get_racing_path()):
+            with open(self.get_racing_path(), 'r') as f:
+                state.update(json.load(f))
+        return state
+
+    def save_racing_state(self, state):
+        with open(self.get_racing_path(), 'w') as f:
+            json.dump(state, f)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The workers attach to the data plane, so the data is not shipped.
+        if self.data_plane is not None:
+            state['data_manager'] = None
+            state['folds'] = None
+            state['encoded_y'] = None
+        return state
+
+
+class BaseClassificationEvaluator(BaseEvaluator):
+    """ A class to evaluate configurations for classification"""
+
     @save_ease(None)
     def __call__(self, config, **kwargs):
         """
@@ -75,91 +315,54 @@ class BaseClassificationEvaluator(object):
 
         save_path = os.path.join(self.save_dir, kwargs['save_path'])
         # TODO: how to parallelize.
-        if hasattr(estimator, 'n_jobs'):
-            setattr(estimator, 'n_jobs', multiprocessing.cpu_count() - 1)
+        model = estimator.estimator if isinstance(estimator, PreprocessedModel) else estimator
+        if hasattr(model, 'n_jobs'):
+            setattr(model, 'n_jobs', multiprocessing.cpu_count() - 1)
         start_time = time.time()
         self.logger.info('<START TO FIT> %s' % classifier_type)
         if self.optimizer == 'smac':
             self.logger.info('<CONFIG> %s' % config.get_dictionary())
         elif self.optimizer == 'tpe':
             self.logger.info('<CONFIG> %s' % config)
-        if self.kfold:
-            if not isinstance(self.kfold, int) or self.kfold < 2:
-                raise ValueError("Kfold must be an integer larger than 2!")
-        data_X, data_y = self.data_manager.train_X, self.data_manager.train_y
-        encoder = OneHotEncoder()
-        if len(data_y.shape) == 1:
-            reshape_y = np.reshape(data_y, (len(data_y), 1))
-            encoder.fit(reshape_y)
-        if not self.kfold:
-            # Split data
-            # TODO: Specify random_state
-            train_X, val_X, train_y, val_y = train_test_split(data_X, data_y,
-                                                              test_size=self.val_size,
-                                                              stratify=data_y,
-                                                              random_state=42)
-
-            # Fit the estimator on the training data.
-            estimator.fit(train_X, train_y)
-            self.logger.info('<FIT MODEL> finished!')
-            with open(save_path, 'wb') as f:
-                pkl.dump(estimator, f)
-                self.logger.info('<MODEL SAVED IN %s>' % save_path)
-
-            # In case of failed estimator
-            try:
-                # Validate it on val data.
-
-                if self.metric_func == roc_auc_score:
-                    y_pred = estimator.predict_proba(val_X)
-                    if len(val_y.shape) == 1:
-                        val_y = encoder.transform(np.reshape(val_y, (len(val_y), 1))).toarray()
-                else:
-                    y_pred = estimator.predict(val_X)
-                metric = self.metric_func(val_y, y_pred)
-            except ValueError:
-                return -FAILED
-            self.logger.info(
-                '<EVALUATE %s-%.2f TAKES %.2f SECONDS>' % (classifier_type, 1 - metric, time.time() - start_time))
-            # Turn it to a minimization problem.
-            return 1 - metric
-
+        loss = self.validate(estimator, save_path)
+        self.logger.info(
+            '<EVALUATE %s-%.2f TAKES %.2f SECONDS>' % (classifier_type, loss, time.time() - start_time))
+        # Turn it to a minimization problem.
+        return loss
+
+    def get_loss(self, estimator, val_X, val_y, valid_index):
+        if self.metric_func == roc_auc_score:
+            y_pred = estimator.predict_proba(val_X)
+            if len(val_y.shape) == 1:
+                val_y = self.get_encoded_label()[valid_index]
         else:
-            kfold = StratifiedKFold(n_splits=self.kfold, shuffle=True)
-            metric = 0
-            for i, (train_index, valid_index) in enumerate(kfold.split(data_X, data_y)):
-                train_X = self.data_manager.train_X[train_index]
-                val_X = self.data_manager.train_X[valid_index]
-                train_y = self.data_manager.train_y[train_index]
-                val_y = self.data_manager.train_y[valid_index]
-
-                # Fit the estimator on the training data.
-                estimator.fit(train_X, train_y)
-                self.logger.info('<FIT MODEL> %d/%d finished!' % (i + 1, self.kfold))
-                with open(save_path, 'wb') as f:
-                    pkl.dump(estimator, f)
-                    self.logger.info('<MODEL SAVED IN %s>' % save_path)
-
-                # In case of failed estimator
-                try:
-                    # Validate it on val data.
-                    if self.metric_func == roc_auc_score:
-                        y_pred = estimator.predict_proba(val_X)
-                        if len(val_y.shape) == 1:
-                            val_y = encoder.transform(np.reshape(val_y, (len(val_y), 1))).toarray()
-                        metric += self.metric_func(val_y, y_pred) / self.kfold
-                    else:
-                        y_pred = estimator.predict(val_X)
-                        metric += self.metric_func(val_y, y_pred) / self.kfold
-                except ValueError:
-                    self.logger.info("<Fit Model> failed!")
-                    return -FAILED
-
-            self.logger.info('<FIT MODEL> finished!')
-            self.logger.info(
-                '<EVALUATE %s-%.2f TAKES %.2f SECONDS>' % (classifier_type, 1 - metric, time.time() - start_time))
-            # Turn it to a minimization problem.
-            return 1 - metric
+            y_pred = estimator.predict(val_X)
+        return 1 - self.metric_func(val_y, y_pred)
+
+    def split(self, X, y):
+        """
+        Split the training data into the stratified holdout split or the stratified k folds.
+        :return: list of (train_index, valid_index)
+        """
+        if not self.kfold:
+            train_index, valid_index = train_test_split(np.arange(len(y)),
+                                                        test_size=self.val_size,
+                                                        stratify=y,
+                                                        random_state=self.random_state)
+            # Sorted indices keep the rows in their memory order when gathering a split.
+            return [(np.sort(train_index), np.sort(valid_index))]
+        kfold = StratifiedKFold(n_splits=self.kfold, shuffle=True, random_state=self.random_state)
+        return list(kfold.split(X, y))
+
+    def encode_label(self, y):
+        """
+        One-hot encode the labels once if the metric function is roc_auc_score.
+        :return: array of shape = [n_samples, n_classes] or None
+        """
+        if self.metric_func != roc_auc_score or len(y.shape) != 1:
+            return None
+        encoder = OneHotEncoder()
+        return encoder.fit_transform(np.reshape(y, (len(y), 1))).toarray()
 
     def set_config(self, config, optimizer):
         """
@@ -171,15 +374,15 @@ class BaseClassificationEvaluator(object):
         if optimizer == 'smac':
             if not hasattr(self, 'estimator'):
                 # Build the corresponding estimator.
-                params_num = len(config.get_dictionary().keys()) - 1
+                params_num = len(get_smac_config(config))
                 classifier_type = config['estimator']
                 estimator = _classifiers[classifier_type](*[None] * params_num)
             else:
                 estimator = self.estimator
                 classifier_type = None
-            config = get_smac_config(config)
-            estimator.set_hyperparameters(config)
-            return classifier_type, estimator
+            estimator.set_hyperparameters(get_smac_config(config))
+            return classifier_type, add_preprocessing(config, estimator, 'classification',
+                                                      self.categorical_cardinality)
         elif optimizer == 'tpe':
             assert isinstance(config, dict)
             classifier_type, config = get_tpe_config(config)
@@ -190,7 +393,7 @@ class BaseClassificationEvaluator(object):
             else:
                 estimator = self.estimator
             estimator.set_hyperparameters(config)
-            return classifier_type, estimator
+            return classifier_type, add_preprocessing({}, estimator, 'classification', self.categorical_cardinality)
 
     @save_ease()
     def fit(self, config, **kwargs):
@@ -203,7 +406,7 @@ class BaseClassificationEvaluator(object):
         save_path = os.path.join(self.save_dir, kwargs['save_path'])
         _, estimator = self.set_config(config, self.optimizer)
         # Fit the estimator on the training data.
-        estimator.fit(self.data_manager.train_X, self.data_manager.train_y)
+        estimator.fit(*self.get_train_data())
         with open(save_path, 'wb') as f:
             pkl.dump(estimator, f)
             self.logger.info("Estimator retrained!")
@@ -253,23 +456,8 @@ class BaseClassificationEvaluator(object):
         return y_pred
 
 
-class BaseRegressionEvaluator(object):
-    """ A class to evaluate configurations for classification"""
-
-    def __init__(self, optimizer='smac', val_size=0.33, kfold=None, save_dir='./data/save_models'):
-        """
-        :param optimizer: algorithm for hyper-parameter tuning
-        :param val_size: float from (0,1), used if kfold is None
-        :param kfold: int larger than 2
-        :param save_dir: str, path to save models
-        """
-        self.optimizer = optimizer
-        self.val_size = val_size
-        self.kfold = kfold
-        self.data_manager = None
-        self.metric_func = None
-        self.save_dir = save_dir
-        self.logger = logging.getLogger(__name__)
+class BaseRegressionEvaluator(BaseEvaluator):
+    """ A class to evaluate configurations for regression"""
 
     @save_ease(None)
     def __call__(self, config, **kwargs):
@@ -282,71 +470,37 @@ class BaseRegressionEvaluator(object):
         regressor_type, estimator = self.set_config(config, self.optimizer)
         save_path = os.path.join(self.save_dir, kwargs['save_path'])
         # TODO: how to parallelize.
-        if hasattr(estimator, 'n_jobs'):
-            setattr(estimator, 'n_jobs', multiprocessing.cpu_count() - 1)
+        model = estimator.estimator if isinstance(estimator, PreprocessedModel) else estimator
+        if hasattr(model, 'n_jobs'):
+            setattr(model, 'n_jobs', multiprocessing.cpu_count() - 1)
         start_time = time.time()
         self.logger.info('<START TO FIT> %s' % regressor_type)
         if self.optimizer == 'smac':
             self.logger.info('<CONFIG> %s' % config.get_dictionary())
         elif self.optimizer == 'tpe':
             self.logger.info('<CONFIG> %s' % config)
-        if self.kfold:
-            if not isinstance(self.kfold, int) or self.kfold < 2:
-                raise ValueError("Kfold must be an integer larger than 2!")
+        loss = self.validate(estimator, save_path)
+        self.logger.info(
+            '<EVALUATE %s-%.2f TAKES %.2f SECONDS>' % (regressor_type, loss, time.time() - start_time))
+        return loss
 
-        data_X, data_y = self.data_manager.train_X, self.data_manager.train_y
-        if not self.kfold:
-            # Split data
-            # TODO: Specify random_state
-            train_X, val_X, train_y, val_y = train_test_split(data_X, data_y, test_size=self.val_size, random_state=42)
+    def get_loss(self, estimator, val_X, val_y, valid_index):
+        y_pred = estimator.predict(val_X)
+        return self.metric_func(val_y, y_pred)
 
-            # Fit the estimator on the training data.
-            estimator.fit(train_X, train_y)
-            self.logger.info('<FIT MODEL> finished!')
-            with open(save_path, 'wb') as f:
-                pkl.dump(estimator, f)
-                self.logger.info('<MODEL SAVED IN %s>' % save_path)
-
-            # In case of failed estimator
-            try:
-                # Validate it on val data.
-                y_pred = estimator.predict(val_X)
-                metric = self.metric_func(val_y, y_pred)
-            except ValueError:
-                self.logger.info("<Fit Model> failed!")
-                return -FAILED
-
-            self.logger.info(
-                '<EVALUATE %s-%.2f TAKES %.2f SECONDS>' % (regressor_type, metric, time.time() - start_time))
-            return metric
-        else:
-            kfold = KFold(n_splits=self.kfold, shuffle=True)
-            metric = 0
-            for i, (train_index, valid_index) in enumerate(kfold.split(data_X, data_y)):
-                train_X = self.data_manager.train_X[train_index]
-                val_X = self.data_manager.train_X[valid_index]
-                train_y = self.data_manager.train_y[train_index]
-                val_y = self.data_manager.train_y[valid_index]
-
-                # Fit the estimator on the training data.
-                estimator.fit(train_X, train_y)
-                self.logger.info('<FIT MODEL> %d/%d finished!' % (i + 1, self.kfold))
-                with open(save_path, 'wb') as f:
-                    pkl.dump(estimator, f)
-                    self.logger.info('<MODEL SAVED IN %s>' % save_path)
-
-                # In case of failed estimator
-                try:
-                    # Validate it on val data.
-                    y_pred = estimator.predict(val_X)
-                    metric += self.metric_func(val_y, y_pred) / self.kfold
-                except ValueError:
-                    return -FAILED
-
-            self.logger.info('<FIT MODEL> finished!')
-            self.logger.info(
-                '<EVALUATE %s-%.2f TAKES %.2f SECONDS>' % (regressor_type, metric, time.time() - start_time))
-            return metric
+    def split(self, X, y):
+        """
+        Split the training data into the holdout split or the k folds.
+        :return: list of (train_index, valid_index)
+        """
+        if not self.kfold:
+            train_index, valid_index = train_test_split(np.arange(len(y)),
+                                                        test_size=self.val_size,
+                                                        random_state=self.random_state)
+            # Sorted indices keep the rows in their memory order when gathering a split.
+            return [(np.sort(train_index), np.sort(valid_index))]
+        kfold = KFold(n_splits=self.kfold, shuffle=True, random_state=self.random_state)
+        return list(kfold.split(X, y))
 
     def set_config(self, config, optimizer):
         """
@@ -358,15 +512,14 @@ class BaseRegressionEvaluator(object):
         if optimizer == 'smac':
             if not hasattr(self, 'estimator'):
                 # Build the corresponding estimator.
-                params_num = len(config.get_dictionary().keys()) - 1
+                params_num = len(get_smac_config(config))
                 regressor_type = config['estimator']
                 estimator = _regressors[regressor_type](*[None] * params_num)
             else:
                 estimator = self.estimator
                 regressor_type = None
-            config = get_smac_config(config)
-            estimator.set_hyperparameters(config)
-            return regressor_type, estimator
+            estimator.set_hyperparameters(get_smac_config(config))
+            return regressor_type, add_preprocessing(config, estimator, 'regression', self.categorical_cardinality)
         elif optimizer == 'tpe':
             assert isinstance(config, dict)
             print(config)
@@ -378,7 +531,7 @@ class BaseRegressionEvaluator(object):
             else:
                 estimator = self.estimator
             estimator.set_hyperparameters(config)
-            return regressor_type, estimator
+            return regressor_type, add_preprocessing({}, estimator, 'regression', self.categorical_cardinality)
 
     @save_ease(None)
     def fit(self, config, **kwargs):
@@ -391,7 +544,7 @@ class BaseRegressionEvaluator(object):
         save_path = os.path.join(self.save_dir, kwargs['save_path'])
         _, estimator = self.set_config(config, self.optimizer)
         # Fit the estimator on the training data.
-        estimator.fit(self.data_manager.train_X, self.data_manager.train_y)
+        estimator.fit(*self.get_train_data())
         with open(save_path, 'wb') as f:
             pkl.dump(estimator, f)
             self.logger.info("Estimator retrained!")
@@ -0,0 +1,94 @@
+import os
+import shutil
+import numpy as np
+
+
+class DataPlane(object):
+    """
+    Place arrays once in memory-mapped files, so that evaluators in worker processes
+    attach zero-copy read-only views by name instead of receiving pickled copies.
+    Pickling a data plane only ships its directory, whatever the size of the arrays.
+    """
+
+    def __init__(self, root_dir):
+        """
+        :param root_dir: str, directory holding the memory-mapped arrays, e.g. under save_dir
+        """
+        self.root_dir = root_dir
+        if not os.path.exists(self.root_dir):
+            os.makedirs(self.root_dir)
+        self._views = dict()
+
+    def get_path(self, name):
+        return os.path.join(self.root_dir, '%s.npy' % name)
+
+    @staticmethod
+    def is_shareable(array):
+        return isinstance(array, np.ndarray) and array.dtype != object
+
+    def publish(self, name, array):
+        """
+        Write an array into the data plane.
+        :param name: str, name used by the workers to attach the array
+        :param array: numpy array with a non-object dtype
+        :return: the read-only memory-mapped view of the array
+        """
+        if not self.is_shareable(array):
+            raise ValueError('Only numpy arrays with a non-object dtype can be shared: %s!' % name)
+        path = self.get_path(name)
+        # Write to a temporary file first, so that a worker never attaches a half-written array.
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp_path, path)
+        self._views.pop(name, None)
+        return self.attach(name)
+
+    def attach(self, name):
+        """
+        :param name: str
+        :return: the read-only memory-mapped view of the array
+        """
+        if name not in self._views:
+            path = self.get_path(name)
+            if not os.path.exists(path):
+                raise KeyError('Array %s is not published in %s!' % (name, self.root_dir))
+            self._views[name] = np.load(path, mmap_mode='r')
+        return self._views[name]
+
+    def publish_folds(self, folds, prefix='fold'):
+        """
+        Write the index arrays of data splits into the data plane.
+        :param folds: list of (train_index, valid_index)
+        :param prefix: str
+        """
+        self.publish('%s_num' % prefix, np.array([len(folds)]))
+        for i, (train_index, valid_index) in enumerate(folds):
+            self.publish('%s_%d_train' % (prefix, i), train_index)
+            self.publish('%s_%d_valid' % (prefix, i), valid_index)
+
+    def attach_folds(self, prefix='fold'):
+        """
+        :param prefix: str
+        :return: list of (train_index, valid_index)
+        """
+        fold_num = int(self.attach('%s_num' % prefix)[0])
+        return [(self.attach('%s_%d_train' % (prefix, i)), self.attach('%s_%d_valid' % (prefix, i)))
+                for i in range(fold_num)]
+
+    def __contains__(self, name):
+        return os.path.exists(self.get_path(name))
+
+    def clear(self):
+        """Release the views and delete all arrays in the data plane."""
+        self._views = dict()
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+        os.makedirs(self.root_dir)
+
+    def __getstate__(self):
+        # The views are re-attached lazily in the worker process.
+        return {'root_dir': self.root_dir}
+
+    def __setstate__(self, state):
+        self.root_dir = state['root_dir']
+        self._views = dict()
@@ -12,6 +12,10 @@ class BaseImgEvaluator(BaseClassificationEvaluator):
         self.inputshape = inputshape
         self.classnum = classnum
 
+    def prepare(self, random_state=None):
+        # The image models validate on the given validation data, no splits are required.
+        self.random_state = random_state
+
     @save_ease(save_dir='./data/save_models')
     def __call__(self, config, **kwargs):
         _, estimator = self.set_config(config)
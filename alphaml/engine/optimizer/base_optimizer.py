@@ -2,6 +2,7 @@ import time
 import logging
 import numpy as np
 from alphaml.engine.evaluator.base import BaseClassificationEvaluator, BaseRegressionEvaluator
+from alphaml.engine.optimizer.profiler import OptimizerProfiler
 from alphaml.utils.constants import MAX_INT
 
 
@@ -24,11 +25,31 @@ class BaseOptimizer(object):
         if seed is None:
             seed = np.random.random_integers(MAX_INT)
         self.seed = seed
+        # Compute the data splits once for all the configurations.
+        self.evaluator.prepare(random_state=self.seed)
         self.start_time = time.time()
         self.timing_list = list()
         self.incumbent = None
+        self.profiler = OptimizerProfiler()
         self.logger = logging.getLogger(__name__)
         self.logger.info('The random seed is: %d' % self.seed)
 
     def run(self):
         raise NotImplementedError
+
+    def log_profile(self, name):
+        """Log where the time of the optimizer goes."""
+        summary = self.profiler.get_summary()
+        self.logger.info('%s ==> Suggest time: %.2f, evaluation time: %.2f, bookkeeping time: %.2f'
+                         % (name, summary['suggest_time'], summary['eval_time'], summary['bookkeeping_time']))
+        self.logger.info('%s ==> The optimizer overhead ratio: %.4f' % (name, summary['overhead_ratio']))
+        if summary['skipped_refit_cnt'] > 0:
+            self.logger.info('%s ==> Surrogate refits: %d, skipped: %d'
+                             % (name, summary['refit_cnt'], summary['skipped_refit_cnt']))
+        if self.evaluator.racing:
+            racing_state = self.evaluator.load_racing_state()
+            summary['fold_fit_cnt'] = racing_state['fold_fit_cnt']
+            summary['saved_fit_cnt'] = racing_state['saved_fit_cnt']
+            self.logger.info('%s ==> Fold fits: %d, saved by racing: %d'
+                             % (name, summary['fold_fit_cnt'], summary['saved_fit_cnt']))
+        return summary
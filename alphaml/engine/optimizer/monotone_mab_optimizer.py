@@ -6,6 +6,8 @@ from ConfigSpace.hyperparameters import CategoricalHyperparameter
 from litesmac.scenario.scenario import Scenario
 from litesmac.facade.smac_facade import SMAC
 from alphaml.engine.optimizer.base_optimizer import BaseOptimizer
+from alphaml.engine.optimizer.profiler import OptimizerProfiler
+from alphaml.engine.optimizer.warm_start import get_smac_configurations
 from alphaml.utils.constants import MAX_INT
 from tqdm import tqdm
 
@@ -36,6 +38,9 @@ class MONO_MAB_SMBO(BaseOptimizer):
         self.config_values = list()
         # Runtime estimate for each arm.
         self.runtime_est = dict()
+        self.profiler = OptimizerProfiler(
+            max_overhead_ratio=kwargs['max_overhead_ratio'] if 'max_overhead_ratio' in kwargs else None,
+            refit_interval=kwargs['refit_interval'] if 'refit_interval' in kwargs else 5)
         self.bar = tqdm(range(self.iter_num),
                         bar_format='{desc} |{bar}| {percentage:3.0f}% [{elapsed}<{remaining}, {rate_fmt}{postfix}]')
         # self.bar = tqdm(range(self.iter_num))
@@ -51,8 +56,17 @@ class MONO_MAB_SMBO(BaseOptimizer):
                 "deterministic": "true"
             }
 
+            # Start each arm from its configurations of similar datasets.
+            initial_configurations = None
+            if 'initial_configs' in kwargs and kwargs['initial_configs']:
+                initial_configurations = get_smac_configurations(
+                    config_space, [config for config in kwargs['initial_configs'] if config[0] == estimator],
+                    hierarchical=False)
             smac = SMAC(scenario=Scenario(scenario_dict),
-                        rng=np.random.RandomState(self.seed), tae_runner=self.evaluator)
+                        rng=np.random.RandomState(self.seed), tae_runner=self.evaluator,
+                        initial_configurations=initial_configurations or None)
+            # Each arm pull is an iteration, so the suggestions do not start new iterations.
+            self.profiler.attach_smac(smac.solver, new_iteration=False)
             self.smac_containers[estimator] = smac
             self.cnts[estimator] = 0
             self.rewards[estimator] = list()
@@ -68,6 +82,7 @@ class MONO_MAB_SMBO(BaseOptimizer):
         iter_num = 0
         tmp_iter = 0
         duration = self.C
+        self.profiler.start()
 
         while True:
             # Pull each arm exactly once.
@@ -77,6 +92,7 @@ class MONO_MAB_SMBO(BaseOptimizer):
 
             for arm in arm_set:
                 self.logger.info('Choosing to optimize %s arm' % arm)
+                self.profiler.next_iteration()
                 iter_start_time = time.time()
                 self.smac_containers[arm].iterate()
                 self.runtime_est[arm] += (time.time() - iter_start_time)
@@ -179,6 +195,7 @@ class MONO_MAB_SMBO(BaseOptimizer):
             # Check the budget.
             if self.B is not None and (time.time() - self.start_time >= self.B):
                 break
+        self.profiler.stop()
 
         # Print the parameters in Thompson sampling.
         self.logger.info('ARM counts: %s' % self.cnts)
@@ -192,6 +209,7 @@ class MONO_MAB_SMBO(BaseOptimizer):
             self.logger.info('MONO_BAI smbo ==> The best performance found: %f' % self.config_values[id])
             self.logger.info('MONO_BAI smbo ==> The best HP found: %s' % self.configs_list[id])
             self.incumbent = self.configs_list[id]
+            profile = self.log_profile('MONO_BAI smbo')
 
             # Save the experimental results.
             data = dict()
@@ -200,6 +218,7 @@ class MONO_MAB_SMBO(BaseOptimizer):
             data['configs'] = self.configs_list
             data['perfs'] = self.config_values
             data['time_cost'] = self.timing_list
+            data['profile'] = profile
             dataset_id = self.result_file.split('_')[0]
             save_dir = 'data/%s/' % dataset_id
             if not os.path.exists(save_dir):
@@ -3,9 +3,11 @@ import pickle
 import numpy as np
 import os
 from datetime import timezone
-from hyperopt import hp, tpe, base, FMinIter, Trials, STATUS_OK
+from hyperopt import hp, tpe, rand, base, FMinIter, Trials, STATUS_OK
 from hyperopt.fmin import generate_trials_to_calculate
 from alphaml.engine.optimizer.base_optimizer import BaseOptimizer
+from alphaml.engine.optimizer.profiler import OptimizerProfiler
+from alphaml.engine.optimizer.warm_start import get_hyperopt_points
 from alphaml.utils.constants import MAX_INT
 
 
@@ -69,23 +71,39 @@ class MONO_MAB_TPE_SMBO(BaseOptimizer):
         self.config_values = list()
         # Runtime estimate for each arm.
         self.runtime_est = dict()
+        self.profiler = OptimizerProfiler(
+            max_overhead_ratio=kwargs['max_overhead_ratio'] if 'max_overhead_ratio' in kwargs else None,
+            refit_interval=kwargs['refit_interval'] if 'refit_interval' in kwargs else 5)
+        evaluate = self.profiler.timed_evaluate(self.evaluator)
+        # Each arm pull is an iteration, so the suggestions do not start new iterations.
+        algo = self.profiler.timed_suggest(self.profiler.throttled_suggest(tpe.suggest, rand.suggest),
+                                           new_iteration=False)
 
         def objective(x):
             return {
-                'loss': self.evaluator(x),
+                'loss': evaluate(x),
                 'status': STATUS_OK,
                 'config': x
             }
 
         self.objective = objective
+        # Start each arm from its configurations of similar datasets.
+        initial_points = dict()
+        if 'initial_configs' in kwargs and kwargs['initial_configs']:
+            initial_points = get_hyperopt_points(self.config_space, kwargs['initial_configs'])
         for estimator in self.estimator_arms:
             # Scenario object
             config_space = self.config_space[estimator]
             config_space = {
                 'estimator': hp.choice('estimator',
                                        [(estimator, config_space)])}
-            trials = Trials()
-            fmin_iter = get_iter(self.objective, config_space, tpe.suggest, MAX_INT, trials=trials)
+            if estimator in initial_points:
+                for point in initial_points[estimator]:
+                    point['estimator'] = 0
+                trials = generate_trials_to_calculate(initial_points[estimator])
+            else:
+                trials = Trials()
+            fmin_iter = get_iter(self.objective, config_space, algo, MAX_INT, trials=trials)
             self.tpe_containers[estimator] = fmin_iter
             self.cnts[estimator] = 0
             self.rewards[estimator] = list()
@@ -101,6 +119,7 @@ class MONO_MAB_TPE_SMBO(BaseOptimizer):
         iter_num = 0
         tmp_iter = 0
         duration = self.C
+        self.profiler.start()
         while True:
             # Pull each arm exactly once.
             tmp_iter += 1
@@ -109,6 +128,7 @@ class MONO_MAB_TPE_SMBO(BaseOptimizer):
 
             for arm in arm_set:
                 self.logger.info('Choosing to optimize %s arm' % arm)
+                self.profiler.next_iteration()
                 iter_start_time = time.time()
                 # iterate
                 next(self.tpe_containers[arm])
@@ -192,6 +212,7 @@ class MONO_MAB_TPE_SMBO(BaseOptimizer):
             # Check the budget.
             if self.B is not None and (time.time() - self.start_time >= self.B):
                 break
+        self.profiler.stop()
 
         # Print the parameters in Thompson sampling.
         self.logger.info('ARM counts: %s' % self.cnts)
@@ -205,6 +226,7 @@ class MONO_MAB_TPE_SMBO(BaseOptimizer):
             self.logger.info('MONO_BAI smbo ==> The best performance found: %f' % self.config_values[id])
             self.logger.info('MONO_BAI smbo ==> The best HP found: %s' % self.configs_list[id])
             self.incumbent = self.configs_list[id]
+            profile = self.log_profile('MONO_BAI smbo')
 
             # Save the experimental results.
             data = dict()
@@ -213,6 +235,7 @@ class MONO_MAB_TPE_SMBO(BaseOptimizer):
             data['configs'] = self.configs_list
             data['perfs'] = self.config_values
             data['time_cost'] = self.timing_list
+            data['profile'] = profile
             dataset_id = self.result_file.split('_')[0]
             save_dir = 'data/%s/' % dataset_id
             if not os.path.exists(save_dir):
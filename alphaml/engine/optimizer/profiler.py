@@ -0,0 +1,186 @@
+import time
+
+
+class OptimizerProfiler(object):
+    """
+    Record where the wall-clock time of an optimizer goes.
+    Each iteration is split into:
+        1) suggest: the optimizer proposes configurations (surrogate fit + acquisition optimization),
+        2) evaluate: the evaluator fits and validates the proposed configurations,
+        3) bookkeeping: everything else (intensification, run history updates, logging, ...).
+    """
+
+    def __init__(self, max_overhead_ratio=None, refit_interval=5):
+        """
+        :param max_overhead_ratio: float from (0,1), if the optimizer overhead ratio exceeds this value,
+            the surrogate is refit only every refit_interval suggestions. None means always refit.
+        :param refit_interval: int, number of suggestions between two surrogate refits when the overhead dominates
+        """
+        if max_overhead_ratio is not None and not 0 < max_overhead_ratio < 1:
+            raise ValueError('max_overhead_ratio must be in (0, 1)!')
+        if not isinstance(refit_interval, int) or refit_interval < 1:
+            raise ValueError('refit_interval must be a positive integer!')
+        self.max_overhead_ratio = max_overhead_ratio
+        self.refit_interval = refit_interval
+
+        self.suggest_time_list = list()
+        self.eval_time_list = list()
+        self.bookkeeping_time_list = list()
+        # The end time points of all evaluations.
+        self.eval_end_list = list()
+        self.refit_cnt = 0
+        self.skipped_refit_cnt = 0
+
+        self.start_time = None
+        self._iter_start = None
+        self._iter_suggest = 0.
+        self._iter_eval = 0.
+        self._refit_skipped = 0
+
+    def start(self):
+        self.start_time = time.time()
+        self._iter_start = self.start_time
+        return self
+
+    def next_iteration(self):
+        """Close the current iteration and open a new one."""
+        now = time.time()
+        if self._iter_start is None:
+            self.start_time = now
+        elif self._iter_suggest > 0 or self._iter_eval > 0:
+            iter_time = now - self._iter_start
+            self.suggest_time_list.append(self._iter_suggest)
+            self.eval_time_list.append(self._iter_eval)
+            self.bookkeeping_time_list.append(max(0., iter_time - self._iter_suggest - self._iter_eval))
+        self._iter_start = now
+        self._iter_suggest = 0.
+        self._iter_eval = 0.
+
+    def stop(self):
+        """Close the last iteration."""
+        if self._iter_start is not None:
+            self.next_iteration()
+        self._iter_start = None
+
+    def timed_suggest(self, func, new_iteration=True):
+        """
+        Wrap the suggest function of an optimizer.
+        :param func: callable, proposes the next configurations
+        :param new_iteration: bool, whether each call starts a new iteration
+        :return: callable
+        """
+
+        def suggest(*args, **kwargs):
+            if new_iteration:
+                self.next_iteration()
+            start_time = time.time()
+            result = func(*args, **kwargs)
+            self._iter_suggest += time.time() - start_time
+            return result
+
+        return suggest
+
+    def timed_evaluate(self, func):
+        """
+        Wrap the evaluation function of an optimizer.
+        :param func: callable, evaluates one configuration
+        :return: callable
+        """
+
+        def evaluate(*args, **kwargs):
+            start_time = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end_time = time.time()
+                self._iter_eval += end_time - start_time
+                self.eval_end_list.append(end_time)
+
+        return evaluate
+
+    def throttled_refit(self, func):
+        """
+        Wrap the train function of a surrogate model, skipping refits when the overhead dominates.
+        The skipped calls keep the previously trained surrogate.
+        :param func: callable, trains the surrogate
+        :return: callable
+        """
+        last_result = [None]
+
+        def train(*args, **kwargs):
+            if self.should_refit():
+                last_result[0] = func(*args, **kwargs)
+            return last_result[0]
+
+        return train
+
+    def throttled_suggest(self, func, fallback):
+        """
+        Wrap a hyperopt suggest algorithm, using a cheap fallback algorithm when the overhead dominates.
+        :param func: callable, model-based suggest algorithm like tpe.suggest
+        :param fallback: callable, cheap suggest algorithm like rand.suggest
+        :return: callable
+        """
+
+        def suggest(*args, **kwargs):
+            if self.should_refit():
+                return func(*args, **kwargs)
+            return fallback(*args, **kwargs)
+
+        return suggest
+
+    def attach_smac(self, solver, new_iteration=True):
+        """
+        Hook the profiler into the SMBO loop of SMAC.
+        The evaluations are timed in this process, so the cost of running the target algorithm
+        in a separate process is accounted as evaluation time.
+        :param solver: SMBO instance, the solver of a SMAC facade
+        :param new_iteration: bool, whether each suggestion starts a new iteration
+        """
+        solver.choose_next = self.timed_suggest(solver.choose_next, new_iteration=new_iteration)
+        tae_runner = solver.intensifier.tae_runner
+        tae_runner.start = self.timed_evaluate(tae_runner.start)
+        solver.model.train = self.throttled_refit(solver.model.train)
+
+    def should_refit(self):
+        if self.refit_cnt == 0 or self.max_overhead_ratio is None or \
+                self.get_overhead_ratio() <= self.max_overhead_ratio:
+            self._refit_skipped = 0
+        elif self._refit_skipped + 1 >= self.refit_interval:
+            self._refit_skipped = 0
+        else:
+            self._refit_skipped += 1
+            self.skipped_refit_cnt += 1
+            return False
+        self.refit_cnt += 1
+        return True
+
+    def get_overhead_ratio(self):
+        """
+        The fraction of the optimizer's wall-clock time not spent in evaluating configurations.
+        :return: float
+        """
+        suggest_time = sum(self.suggest_time_list) + self._iter_suggest
+        eval_time = sum(self.eval_time_list) + self._iter_eval
+        total_time = suggest_time + eval_time + sum(self.bookkeeping_time_list)
+        if total_time == 0:
+            return 0.
+        return 1 - eval_time / total_time
+
+    def get_summary(self):
+        """
+        :return: dictionary
+        """
+        summary = dict()
+        summary['iterations'] = len(self.suggest_time_list)
+        summary['evaluations'] = len(self.eval_end_list)
+        summary['suggest_time'] = sum(self.suggest_time_list)
+        summary['eval_time'] = sum(self.eval_time_list)
+        summary['bookkeeping_time'] = sum(self.bookkeeping_time_list)
+        summary['overhead_ratio'] = self.get_overhead_ratio()
+        summary['refit_cnt'] = self.refit_cnt
+        summary['skipped_refit_cnt'] = self.skipped_refit_cnt
+        summary['suggest_time_list'] = list(self.suggest_time_list)
+        summary['eval_time_list'] = list(self.eval_time_list)
+        summary['bookkeeping_time_list'] = list(self.bookkeeping_time_list)
+        return summary
@@ -5,7 +5,9 @@ import numpy as np
 from smac.scenario.scenario import Scenario
 from smac.facade.smac_facade import SMAC
 from alphaml.engine.optimizer.base_optimizer import BaseOptimizer
+from alphaml.engine.optimizer.profiler import OptimizerProfiler
 from alphaml.engine.components.components_manager import ComponentsManager
+from alphaml.engine.optimizer.warm_start import get_smac_configurations
 
 
 class SMAC_SMBO(BaseOptimizer):
@@ -15,7 +17,13 @@ class SMAC_SMBO(BaseOptimizer):
         self.result_file = self.task_name + '_smac.data'
 
         # Scenario object
-        config_space = ComponentsManager.build_hierarchical_configspace(self.config_space)
+        preprocessing_space = None
+        if 'search_preprocessing' in kwargs and kwargs['search_preprocessing']:
+            # Search the preprocessing jointly with the models.
+            from alphaml.engine.components.pipeline.preprocessing_space import get_hyperparameter_search_space
+            preprocessing_space = get_hyperparameter_search_space()
+        config_space = ComponentsManager.build_hierarchical_configspace(self.config_space,
+                                                                        preprocessing_space=preprocessing_space)
         scenario_dict = {
             'abort_on_first_run_crash': False,
             "run_obj": "quality",
@@ -33,13 +41,25 @@ class SMAC_SMBO(BaseOptimizer):
                 raise ValueError('Limit value error!')
 
         self.scenario = Scenario(scenario_dict)
-        self.smac = SMAC(scenario=self.scenario, rng=np.random.RandomState(self.seed), tae_runner=self.evaluator)
+        # Start the search from the configurations of similar datasets.
+        initial_configurations = None
+        if 'initial_configs' in kwargs and kwargs['initial_configs']:
+            initial_configurations = get_smac_configurations(config_space, kwargs['initial_configs'])
+            self.logger.info('SMAC smbo ==> Warm start with %d configurations' % len(initial_configurations))
+        self.smac = SMAC(scenario=self.scenario, rng=np.random.RandomState(self.seed), tae_runner=self.evaluator,
+                         initial_configurations=initial_configurations or None)
+        self.profiler = OptimizerProfiler(
+            max_overhead_ratio=kwargs['max_overhead_ratio'] if 'max_overhead_ratio' in kwargs else None,
+            refit_interval=kwargs['refit_interval'] if 'refit_interval' in kwargs else 5)
+        self.profiler.attach_smac(self.smac.solver)
         self.configs_list = list()
         self.config_values = list()
 
     def run(self):
         self.logger.info('Start task: %s' % self.task_name)
+        self.profiler.start()
         self.smac.optimize()
+        self.profiler.stop()
         runhistory = self.smac.solver.runhistory
         trajectory = self.smac.solver.intensifier.traj_logger.trajectory
         self.incumbent = self.smac.solver.incumbent
@@ -52,25 +72,30 @@ class SMAC_SMBO(BaseOptimizer):
             self.config_values.append(reward)
 
         # Record the time cost.
-        time_point = time.time() - self.start_time
-        tmp_list = list()
-        tmp_list.append(time_point)
-        for key in reversed(runkeys[1:]):
-            time_point -= runhistory.data[key][1]
+        if len(self.profiler.eval_end_list) == len(runkeys):
+            self.timing_list.extend([time_point - self.start_time for time_point in self.profiler.eval_end_list])
+        else:
+            time_point = time.time() - self.start_time
+            tmp_list = list()
             tmp_list.append(time_point)
-        self.timing_list.extend(reversed(tmp_list))
+            for key in reversed(runkeys[1:]):
+                time_point -= runhistory.data[key][1]
+                tmp_list.append(time_point)
+            self.timing_list.extend(reversed(tmp_list))
 
         self.logger.info('SMAC smbo ==> the size of evaluations: %d' % len(self.configs_list))
         if len(self.configs_list) > 0:
             self.logger.info('SMAC smbo ==> The time points: %s' % self.timing_list)
             self.logger.info('SMAC smbo ==> The best performance found: %f' % max(self.config_values))
             self.logger.info('SMAC smbo ==> The best HP found: %s' % self.incumbent)
+            profile = self.log_profile('SMAC smbo')
 
             # Save the experimental results.
             data = dict()
             data['configs'] = self.configs_list
             data['perfs'] = self.config_values
             data['time_cost'] = self.timing_list
+            data['profile'] = profile
             dataset_id = self.result_file.split('_')[0]
             save_dir = 'data/%s/' % dataset_id
             if not os.path.exists(save_dir):
@@ -4,8 +4,11 @@ import os
 import datetime
 from datetime import timezone
 import numpy as np
-from hyperopt import hp, tpe, fmin, Trials, STATUS_OK, space_eval
+from hyperopt import hp, tpe, rand, fmin, Trials, STATUS_OK, space_eval
+from hyperopt.fmin import generate_trials_to_calculate
 from alphaml.engine.optimizer.base_optimizer import BaseOptimizer
+from alphaml.engine.optimizer.profiler import OptimizerProfiler
+from alphaml.engine.optimizer.warm_start import get_hyperopt_points
 
 
 class TPE_SMBO(BaseOptimizer):
@@ -14,27 +17,43 @@ class TPE_SMBO(BaseOptimizer):
         self.task_name = kwargs['task_name'] if 'task_name' in kwargs else 'default'
         self.result_file = self.task_name + '_hyperopt.data'
         self.estimators = list(self.config_space.keys())
+        # Start the search from the configurations of similar datasets.
+        points = list()
+        if 'initial_configs' in kwargs and kwargs['initial_configs']:
+            initial_points = get_hyperopt_points(self.config_space, kwargs['initial_configs'])
+            for estimator, estimator_points in initial_points.items():
+                for point in estimator_points:
+                    point['estimator'] = self.estimators.index(estimator)
+                    points.append(point)
+            self.logger.info('TPE ==> Warm start with %d configurations' % len(points))
         self.config_space = {
             'estimator': hp.choice('estimator',
                                    [(estimator, self.config_space[estimator]) for estimator in self.estimators])}
-        self.trials = Trials()
+        self.trials = generate_trials_to_calculate(points) if len(points) > 0 else Trials()
         self.runcount = int(1e10) if 'runcount' not in kwargs or kwargs['runcount'] is None else kwargs['runcount']
+        self.profiler = OptimizerProfiler(
+            max_overhead_ratio=kwargs['max_overhead_ratio'] if 'max_overhead_ratio' in kwargs else None,
+            refit_interval=kwargs['refit_interval'] if 'refit_interval' in kwargs else 5)
+        evaluate = self.profiler.timed_evaluate(self.evaluator)
 
         def objective(x):
             return {
-                'loss': self.evaluator(x),
+                'loss': evaluate(x),
                 'status': STATUS_OK,
                 'config': x
             }
 
         self.objective = objective
+        self.algo = self.profiler.timed_suggest(self.profiler.throttled_suggest(tpe.suggest, rand.suggest))
         self.configs_list = []
         self.config_values = []
 
     def run(self):
         self.logger.info('Start task: %s' % self.task_name)
 
-        fmin(self.objective, self.config_space, tpe.suggest, self.runcount, trials=self.trials)
+        self.profiler.start()
+        fmin(self.objective, self.config_space, self.algo, self.runcount, trials=self.trials)
+        self.profiler.stop()
 
         for trial in self.trials.trials:
             config = trial['result']['config']
@@ -53,12 +72,14 @@ class TPE_SMBO(BaseOptimizer):
             self.logger.info('TPE ==> The time points: %s' % self.timing_list)
             self.logger.info('TPE ==> The best performance found: %f' % max(self.config_values))
             self.logger.info('TPE ==> The best HP found: %s' % self.incumbent)
+            profile = self.log_profile('TPE')
 
             # Save the experimental results.
             data = dict()
             data['configs'] = self.configs_list
             data['perfs'] = self.config_values
             data['time_cost'] = self.timing_list
+            data['profile'] = profile
             dataset_id = self.result_file.split('_')[0]
             save_dir = 'data/%s/' % dataset_id
             if not os.path.exists(save_dir):
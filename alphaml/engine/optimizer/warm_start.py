@@ -0,0 +1,222 @@
+import os
+import json
+import logging
+import numpy as np
+
+from alphaml.engine.evaluator.base import get_smac_config
+from alphaml.engine.components.pipeline.preprocessing_space import PREPROCESSING_PREFIX
+from alphaml.utils.constants import CATEGORICAL, NUMERICAL, FAILED
+
+
+def get_meta_features(data, task_type):
+    """
+    Compute the cheap meta-features of a dataset.
+    :param data: DataManager
+    :param task_type: str
+    :return: dictionary
+    """
+    n_rows, n_features = data.train_X.shape[0], data.train_X.shape[1]
+    meta_features = {'task': 'regression' if task_type == 'continuous' else 'classification',
+                     'n_rows': int(n_rows),
+                     'n_features': int(n_features),
+                     'n_classes': 1,
+                     'class_balance': 1.,
+                     'categorical_ratio': 0.,
+                     'numerical_ratio': 1.}
+    if meta_features['task'] == 'classification':
+        _, counts = np.unique(data.train_y, return_counts=True)
+        meta_features['n_classes'] = int(len(counts))
+        meta_features['class_balance'] = float(counts.min() / counts.max())
+    if data.feature_types:
+        meta_features['categorical_ratio'] = data.feature_types.count(CATEGORICAL) / len(data.feature_types)
+        meta_features['numerical_ratio'] = data.feature_types.count(NUMERICAL) / len(data.feature_types)
+    return meta_features
+
+
+def _get_meta_vector(meta_features):
+    # The sizes are compared on the log scale, the ratios are already in [0, 1].
+    return np.array([np.log10(meta_features['n_rows']),
+                     np.log10(meta_features['n_features']),
+                     np.log2(meta_features['n_classes']),
+                     meta_features['class_balance'],
+                     meta_features['categorical_ratio'],
+                     meta_features['numerical_ratio']])
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def get_canonical_config(config):
+    """
+    Convert a configuration of SMAC or TPE into the estimator name and its hyper-parameters.
+    The preprocessing hyper-parameters searched jointly with the models keep their prefixed names.
+    :param config: Configuration for SMAC or dictionary for TPE
+    :return: str, dictionary
+    """
+    if isinstance(config, dict) and isinstance(config.get('estimator'), (tuple, list)):
+        estimator, params = config['estimator'][0], config['estimator'][1]
+    else:
+        config_dict = config.get_dictionary() if hasattr(config, 'get_dictionary') else dict(config)
+        estimator, params = config_dict['estimator'], get_smac_config(config_dict)
+        for key, value in config_dict.items():
+            if key.startswith(PREPROCESSING_PREFIX + ':'):
+                params[key] = value
+    return estimator, dict((key, _to_builtin(value)) for key, value in params.items())
+
+
+def get_smac_configurations(config_space, configs, hierarchical=True):
+    """
+    Build the SMAC configurations of the canonical configurations, the invalid ones are skipped with a warning.
+    :param config_space: ConfigurationSpace
+    :param configs: list of (estimator, params)
+    :param hierarchical: bool, whether the hyper-parameters are prefixed with the estimator name
+    :return: list of Configuration
+    """
+    from ConfigSpace.configuration_space import Configuration
+    names = set(config_space.get_hyperparameter_names())
+    configurations = list()
+    for estimator, params in configs:
+        values = {'estimator': estimator} if hierarchical else dict()
+        for key, value in params.items():
+            if key.startswith(PREPROCESSING_PREFIX + ':'):
+                # The preprocessing is kept only if the space searches it.
+                if key in names:
+                    values[key] = value
+            elif hierarchical:
+                values['%s:%s' % (estimator, key)] = value
+            else:
+                values[key] = value
+        try:
+            configurations.append(Configuration(config_space, values=values))
+        except (ValueError, KeyError, TypeError) as e:
+            logging.getLogger(__name__).warning('Skip the initial configuration %s: %s' % (values, e))
+    return configurations
+
+
+def _get_hyperopt_param(node, value):
+    """
+    Find the label of a hyperopt expression and the value to record in the trials.
+    :return: (label, value) or None
+    """
+    if node.name == 'switch':
+        # hp.choice records the index of the option.
+        param = node.pos_args[0]
+        options = [option.obj if option.name == 'literal' else None for option in node.pos_args[1:]]
+        if param.name != 'hyperopt_param' or value not in options:
+            return None
+        return param.pos_args[0].obj, options.index(value)
+    # Skip the conversions such as scope.int.
+    while node.name != 'hyperopt_param':
+        if len(node.pos_args) == 0:
+            return None
+        node = node.pos_args[0]
+    return node.pos_args[0].obj, value
+
+
+def get_hyperopt_points(config_space, configs):
+    """
+    Build the hyperopt points of the canonical configurations, the invalid ones are skipped.
+    :param config_space: dictionary, the hyperopt space of each estimator
+    :param configs: list of (estimator, params)
+    :return: dictionary, the points to evaluate for each estimator
+    """
+    from hyperopt.pyll import Apply
+    points = dict()
+    for estimator, params in configs:
+        if estimator not in config_space:
+            continue
+        point = dict()
+        for key, node in config_space[estimator].items():
+            if not isinstance(node, Apply) or node.name == 'literal':
+                continue
+            param = _get_hyperopt_param(node, params[key]) if key in params else None
+            if param is None:
+                point = None
+                break
+            point[param[0]] = param[1]
+        if point is not None:
+            points.setdefault(estimator, list()).append(point)
+    return points
+
+
+class WarmStartStore(object):
+    """
+    Record the best configurations of past searches with the meta-features of their datasets,
+    and suggest the configurations of the nearest datasets to start a new search.
+    """
+
+    def __init__(self, path, top_k=10):
+        """
+        :param path: str, path of the JSON file
+        :param top_k: int, number of configurations recorded for each dataset
+        """
+        self.path = path
+        self.top_k = top_k
+        self.records = dict()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.records = json.load(f)
+        self.logger = logging.getLogger(__name__)
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.records, f)
+        os.replace(tmp_path, self.path)
+
+    def record(self, dataset_id, meta_features, configs, perfs):
+        """
+        Record the best configurations of a search, merged with the past searches on the same dataset.
+        :param dataset_id: str
+        :param meta_features: dictionary
+        :param configs: list of configurations of SMAC or TPE
+        :param perfs: list of float, the performance of the configurations, FAILED for the failed ones
+        """
+        ranked = list()
+        if dataset_id in self.records:
+            ranked.extend(self.records[dataset_id]['configs'])
+        for config, perf in zip(configs, perfs):
+            if not np.isfinite(perf) or perf == FAILED:
+                continue
+            estimator, params = get_canonical_config(config)
+            ranked.append({'estimator': estimator, 'params': params, 'perf': float(perf)})
+
+        best_configs, keys = list(), set()
+        for item in sorted(ranked, key=lambda x: -x['perf']):
+            key = json.dumps([item['estimator'], item['params']], sort_keys=True)
+            if key not in keys:
+                keys.add(key)
+                best_configs.append(item)
+        self.records[dataset_id] = {'meta_features': meta_features, 'configs': best_configs[:self.top_k]}
+        self.save()
+
+    def suggest(self, meta_features, n_configs=5, n_datasets=3, exclude=None):
+        """
+        Suggest the best configurations of the nearest datasets, taken in turn from the nearest one.
+        :param meta_features: dictionary
+        :param n_configs: int, number of configurations
+        :param n_datasets: int, number of nearest datasets
+        :param exclude: str, the dataset to exclude
+        :return: list of (estimator, params)
+        """
+        candidates = [(dataset_id, record) for dataset_id, record in self.records.items()
+                      if record['meta_features']['task'] == meta_features['task'] and dataset_id != exclude]
+        vector = _get_meta_vector(meta_features)
+        candidates.sort(key=lambda x: np.linalg.norm(_get_meta_vector(x[1]['meta_features']) - vector))
+        candidates = candidates[:n_datasets]
+
+        configs, keys = list(), set()
+        for rank in range(self.top_k):
+            for _, record in candidates:
+                if rank < len(record['configs']) and len(configs) < n_configs:
+                    item = record['configs'][rank]
+                    key = json.dumps([item['estimator'], item['params']], sort_keys=True)
+                    if key not in keys:
+                        keys.add(key)
+                        configs.append((item['estimator'], item['params']))
+        self.logger.info('Warm start with %d configurations from datasets: %s'
+                         % (len(configs), [dataset_id for dataset_id, _ in candidates]))
+        return configs
@@ -55,14 +55,14 @@ class BaseEstimator(object):
 
         if self.ensemble_size == 'ensemble_selection' and self.cross_valid == True:
             raise ValueError("Ensemble selection can not work with cv.")
-        # Delete the temporary model files.
+        # Delete the temporary model files, but keep the exported bundles.
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
         self.save_dir = save_dir
         ls = os.listdir(self.save_dir)
         for item in ls:
             c_path = os.path.join(self.save_dir, item)
-            if os.path.isfile(c_path):
+            if os.path.isfile(c_path) and item.endswith('.pkl'):
                 os.remove(c_path)
 
     def build_engine(self):
@@ -85,16 +85,52 @@ class BaseEstimator(object):
 
     def fit(self, data, **kwargs):
         assert data is not None and isinstance(data, (DataManager, pd.DataFrame))
+        if 'incremental' in kwargs and kwargs.pop('incremental'):
+            # Reuse the previous search, or the search saved in the history file.
+            if self._ml_engine is None:
+                self._ml_engine = self.build_engine()
+            self._ml_engine.update(data, **kwargs)
+            return self
         self._ml_engine = self.build_engine()
         self._ml_engine.fit(data, **kwargs)
         return self
 
+    def update(self, data, top_k=5, history=None, **kwargs):
+        """
+        Update the fitted estimator on the new training data.
+        The top-k configurations of the previous search are evaluated on the new data first,
+        then a short search continues from them and the ensemble is rebuilt.
+        :param data: instance of DataManager or DataFrame, the new training data
+        :param top_k: int, number of previous configurations to evaluate again
+        :param history: str, path of the results saved by the previous search, None means the last fit
+        :return: self
+        """
+        if self._ml_engine is None and history is None:
+            raise ValueError('The estimator is not fitted, and no history of a previous search is given!')
+        if 'metric' not in kwargs and self._ml_engine is not None and self._ml_engine.metric is not None:
+            # Keep the metric of the previous search.
+            kwargs['metric'] = self._ml_engine.metric
+        return self.fit(data, incremental=True, top_k=top_k, history=history, **kwargs)
+
     def predict(self, X, batch_size=None, n_jobs=1):
         return self._ml_engine.predict(X, batch_size=batch_size, n_jobs=n_jobs)
 
+    def distill(self, student='xgboost', augment_ratio=1., X_val=None, deploy=False):
+        return self._ml_engine.distill(student=student, augment_ratio=augment_ratio, X_val=X_val, deploy=deploy)
+
     def score(self, X, y):
         return self._ml_engine.score(X, y)
 
+    def export(self, path, compile_trees=True):
+        """
+        Export the fitted estimator into a single-file bundle, which is loaded by alphaml.utils.bundle.load_bundle.
+        :param path: str, path of the bundle
+        :param compile_trees: bool, whether to compile the tree models into flat node arrays for fast inference
+        :return: path
+        """
+        from alphaml.utils.bundle import export_bundle
+        return export_bundle(self, path, compile_trees=compile_trees)
+
     def predict_proba(self, X, batch_size=None, n_jobs=1):
         return self._ml_engine.predict_proba(X, batch_size=None, n_jobs=n_jobs)
 
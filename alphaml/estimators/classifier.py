@@ -21,7 +21,7 @@ class Classifier(BaseEstimator):
 
         # TODO:Automated feature engineering
         if isinstance(data, pd.DataFrame):
-            self.pre_pipeline = DP_Pipeline(None)
+            self.pre_pipeline = DP_Pipeline(kwargs['pipeline_config'] if 'pipeline_config' in kwargs else None)
             data = self.pre_pipeline.execute(data, phase='train')
 
         # Check the task type: {binary, multiclass}
@@ -22,7 +22,8 @@ class Regressor(BaseEstimator):
 
         # TODO:Automated feature engineering
         if isinstance(data, pd.DataFrame):
-            self.pre_pipeline = DP_Pipeline(None)
+            self.pre_pipeline = DP_Pipeline(kwargs['pipeline_config'] if 'pipeline_config' in kwargs else None,
+                                            task='regression')
             data = self.pre_pipeline.execute(data, phase='train', stratify=False)
         # Check the task type: {continuous}
         task_type = type_of_target(data.train_y)
@@ -0,0 +1,280 @@
+"""
+A single-file bundle of a fitted estimator for deployment.
+
+Layout:
+    magic (8 bytes) | version (uint32) | header length (uint64) | header (JSON) | segments
+Each segment starts at a multiple of SEGMENT_ALIGNMENT bytes. A segment is either a pickled object,
+deserialized on first access, or a numeric array, memory-mapped on access.
+"""
+import os
+import json
+import copy
+import time
+import struct
+import pickle as pkl
+import numpy as np
+
+BUNDLE_MAGIC = b'ALPHAMLB'
+BUNDLE_VERSION = 1
+SEGMENT_ALIGNMENT = 64
+_PREFIX_FORMAT = '<8sIQ'
+
+
+def _align(offset):
+    return (offset + SEGMENT_ALIGNMENT - 1) // SEGMENT_ALIGNMENT * SEGMENT_ALIGNMENT
+
+
+class BundleWriter(object):
+    def __init__(self):
+        self.meta = dict()
+        self.segments = list()
+
+    def add_object(self, name, obj):
+        self.add_bytes(name, pkl.dumps(obj, protocol=pkl.HIGHEST_PROTOCOL))
+
+    def add_bytes(self, name, data, kind='pickle'):
+        self.segments.append((name, {'kind': kind}, data))
+
+    def add_array(self, name, array):
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            raise ValueError('Object arrays can not be memory-mapped: %s!' % name)
+        spec = {'kind': 'array', 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        self.segments.append((name, spec, array.tobytes()))
+
+    def add_member(self, name, member, compile_trees=True):
+        """
+        Add an ensemble member. Tree models are compiled into flat node arrays if possible.
+        :param name: str
+        :param member: fitted model
+        :param compile_trees: bool, whether to compile the tree models
+        """
+        if compile_trees:
+            from alphaml.engine.components.models.tree_compiler import compile_tree_model
+            try:
+                compiled = compile_tree_model(member)
+            except ValueError:
+                compiled = None
+            if compiled is not None:
+                for array, value in compiled.get_arrays().items():
+                    self.add_array('%s.%s' % (name, array), value)
+                compiled.set_arrays(dict((array, None) for array in compiled.get_arrays()))
+                self.meta.setdefault('compiled', list()).append(name)
+                member = compiled
+        self.add_object(name, member)
+
+    def write(self, path):
+        header = {'version': BUNDLE_VERSION, 'meta': self.meta, 'segments': dict()}
+        # The offsets depend on the header length, so the header is sized with placeholders first.
+        for name, spec, data in self.segments:
+            header['segments'][name] = dict(spec, offset=0, length=len(data))
+        header_size = len(json.dumps(header).encode('utf8')) + 32 * len(self.segments)
+        offset = _align(struct.calcsize(_PREFIX_FORMAT) + header_size)
+        for name, spec, data in self.segments:
+            header['segments'][name]['offset'] = offset
+            offset = _align(offset + len(data))
+        header_bytes = json.dumps(header).encode('utf8')
+        assert struct.calcsize(_PREFIX_FORMAT) + len(header_bytes) <= \
+            min([segment['offset'] for segment in header['segments'].values()] or [np.inf])
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(struct.pack(_PREFIX_FORMAT, BUNDLE_MAGIC, BUNDLE_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for name, _, data in self.segments:
+                f.seek(header['segments'][name]['offset'])
+                f.write(data)
+            f.truncate(_align(f.tell()))
+        os.replace(tmp_path, path)
+        return path
+
+
+class BundleReader(object):
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, header_len = struct.unpack(_PREFIX_FORMAT, f.read(struct.calcsize(_PREFIX_FORMAT)))
+            if magic != BUNDLE_MAGIC:
+                raise ValueError('%s is not a model bundle!' % path)
+            if version > BUNDLE_VERSION:
+                raise ValueError('Bundle version %d is not supported, the latest version is %d!'
+                                 % (version, BUNDLE_VERSION))
+            self.header = json.loads(f.read(header_len).decode('utf8'))
+        self.version = version
+        self.meta = self.header['meta']
+        self._cache = dict()
+
+    def __contains__(self, name):
+        return name in self.header['segments']
+
+    def read_bytes(self, name):
+        segment = self.header['segments'][name]
+        with open(self.path, 'rb') as f:
+            f.seek(segment['offset'])
+            return f.read(segment['length'])
+
+    def get(self, name):
+        """
+        Load a segment on first access.
+        :param name: str
+        :return: the unpickled object or the read-only memory-mapped array
+        """
+        if name not in self._cache:
+            segment = self.header['segments'][name]
+            if segment['kind'] == 'array':
+                shape = tuple(segment['shape'])
+                if segment['length'] == 0:
+                    value = np.zeros(shape, dtype=np.dtype(segment['dtype']))
+                else:
+                    value = np.memmap(self.path, dtype=np.dtype(segment['dtype']), mode='r',
+                                      offset=segment['offset'], shape=shape)
+            else:
+                value = pkl.loads(self.read_bytes(name))
+            self._cache[name] = value
+        return self._cache[name]
+
+    def get_member(self, name):
+        """
+        Load an ensemble member, whose node arrays are memory-mapped if it is a compiled tree model.
+        :param name: str
+        :return: the member
+        """
+        if name not in self.meta.get('compiled', []) or name in self._cache:
+            return self.get(name)
+        from alphaml.engine.components.models.tree_compiler import ARRAY_NAMES
+        model = self.get(name)
+        model.set_arrays(dict((array, self.get('%s.%s' % (name, array))) for array in ARRAY_NAMES))
+        return model
+
+
+class LazyMemberList(object):
+    """A read-only list of ensemble members, deserialized one by one on first access."""
+
+    def __init__(self, reader, names):
+        self.reader = reader
+        self.names = names
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.reader.get_member(name) for name in self.names[index]]
+        return self.reader.get_member(self.names[index])
+
+    def __iter__(self):
+        for name in self.names:
+            yield self.reader.get_member(name)
+
+
+class BundlePredictor(object):
+    """The predictor loaded from a bundle, with the same predict API as the fitted estimator."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.meta = reader.meta
+        self.pre_pipeline = reader.get('pre_pipeline') if 'pre_pipeline' in reader else None
+        self.transform_plan = reader.get('transform_plan') if 'transform_plan' in reader else None
+        self.rev_map_dict = reader.get('label_map') if 'label_map' in reader else None
+        # The number of features of the arrays the model predicts, None if the bundle does not record it.
+        self.n_features_ = self.meta.get('n_features')
+        members = LazyMemberList(reader, self.meta['members'])
+        if self.meta['model_type'] == 'ensemble':
+            self.model = reader.get('ensemble')
+            self.model.ensemble_models = members
+            for attr in self.meta['ensemble_arrays']:
+                setattr(self.model, attr, reader.get('ensemble_%s' % attr))
+        else:
+            self.model = members[0]
+
+    def preprocess(self, X):
+        import pandas as pd
+        if isinstance(X, pd.DataFrame):
+            if self.transform_plan is not None:
+                return self.transform_plan.transform(X)
+            if self.pre_pipeline is None:
+                raise ValueError("The preprocessing pipeline is empty. Use DataFrame as the input of function fit.")
+            X = self.pre_pipeline.execute(X, phase='test').test_X
+        return X
+
+    def map_label(self, y):
+        if self.rev_map_dict is None:
+            return y
+        return np.array([self.rev_map_dict[label] for label in y])
+
+    def predict(self, X):
+        return self.map_label(self.model.predict(self.preprocess(X)))
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(self.preprocess(X))
+
+
+def export_bundle(estimator, path, compile_trees=True):
+    """
+    Export a fitted estimator into a single-file bundle.
+    :param estimator: fitted Classifier or Regressor
+    :param path: str, path of the bundle
+    :param compile_trees: bool, whether to compile the tree models into flat node arrays for fast inference
+    :return: path
+    """
+    engine = estimator._ml_engine
+    if engine is None:
+        raise ValueError('The estimator is not fitted!')
+    writer = BundleWriter()
+    writer.meta['estimator'] = type(estimator).__name__
+    writer.meta['task_type'] = getattr(estimator, 'task_type', None)
+    writer.meta['created'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    if getattr(estimator.pre_pipeline, 'plan', None) is not None:
+        # The compiled plan is all the inference needs from the preprocessing pipeline.
+        writer.add_object('transform_plan', estimator.pre_pipeline.plan)
+    elif estimator.pre_pipeline is not None:
+        pre_pipeline = copy.copy(estimator.pre_pipeline)
+        # The intermediate data of the last execution is not needed for inference.
+        pre_pipeline.cached_dm = dict()
+        writer.add_object('pre_pipeline', pre_pipeline)
+    if getattr(engine, 'rev_map_dict', None) is not None:
+        writer.add_object('label_map', engine.rev_map_dict)
+    train_X = engine.data_manager.train_X if getattr(engine, 'data_manager', None) is not None else None
+    writer.meta['n_features'] = int(train_X.shape[1]) if getattr(train_X, 'ndim', 0) == 2 else None
+
+    members = list()
+    writer.meta['ensemble_arrays'] = list()
+    if engine.student is not None:
+        writer.meta['model_type'] = 'single'
+        members.append(engine.student)
+    elif engine.ensemble_model is not None:
+        writer.meta['model_type'] = 'ensemble'
+        shell = copy.copy(engine.ensemble_model)
+        members.extend(shell.ensemble_models)
+        # The evaluator and the search results reference the training data.
+        shell.evaluator = None
+        shell.model_info = None
+        shell.ensemble_models = None
+        for attr in ['weights_']:
+            if isinstance(getattr(shell, attr, None), np.ndarray):
+                writer.add_array('ensemble_%s' % attr, getattr(shell, attr))
+                writer.meta['ensemble_arrays'].append(attr)
+                setattr(shell, attr, None)
+        writer.add_object('ensemble', shell)
+    else:
+        from alphaml.utils.save_ease import get_configuration_id
+        writer.meta['model_type'] = 'single'
+        save_path = os.path.join(engine.evaluator.save_dir,
+                                 '%s.pkl' % get_configuration_id(engine.optimizer.incumbent))
+        with open(save_path, 'rb') as f:
+            members.append(pkl.load(f))
+
+    writer.meta['members'] = ['member_%d' % i for i in range(len(members))]
+    for name, member in zip(writer.meta['members'], members):
+        writer.add_member(name, member, compile_trees=compile_trees)
+    return writer.write(path)
+
+
+def load_bundle(path):
+    """
+    Load a bundle for inference. The members are deserialized on first use.
+    :param path: str, path of the bundle
+    :return: BundlePredictor
+    """
+    return BundlePredictor(BundleReader(path))
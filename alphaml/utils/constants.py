@@ -42,3 +42,12 @@ CATEGORICAL = 'categorical'
 ORDINAL = 'ordinal'
 
 FEATURE_TYPES = [DISCRETE, NUMERICAL, TEXT, CATEGORICAL, ORDINAL]
+
+"""Constants used in the encoding of the categorical features
+"""
+ORDINAL_ENCODING = 'ordinal'
+ONEHOT_ENCODING = 'onehot'
+TARGET_ENCODING = 'target'
+FREQUENCY_ENCODING = 'frequency'
+
+CATEGORICAL_ENCODINGS = [ORDINAL_ENCODING, ONEHOT_ENCODING, TARGET_ENCODING, FREQUENCY_ENCODING]
@@ -0,0 +1,297 @@
+"""
+Serve a model bundle over HTTP.
+
+The concurrent requests are accumulated into micro-batches: a batch is predicted when it reaches max_batch_size rows
+or when its first request has waited max_latency milliseconds, and the predictions are scattered back to the requests.
+
+Endpoints:
+    POST /predict, POST /predict_proba  {"instances": [[...], ...]} -> {"predictions": [...]}
+    GET /metrics                        throughput and latency of each endpoint
+    GET /health
+"""
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+import socketserver
+import numpy as np
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class _Request(object):
+    def __init__(self, X):
+        self.X = X
+        self.arrival_time = time.time()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher(object):
+    """Accumulate the rows of concurrent requests into batches for a predict function."""
+
+    def __init__(self, predict_func, max_batch_size=64, max_latency=5., window_size=10000):
+        """
+        :param predict_func: callable, predict_func(X) returns an array with one row per row of X
+        :param max_batch_size: int, maximal number of rows in a batch
+        :param max_latency: float, maximal time (ms) the first request of a batch waits for other requests
+        :param window_size: int, number of latest requests used for the latency metrics
+        """
+        self.predict_func = predict_func
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=window_size)
+        self.request_cnt = 0
+        self.row_cnt = 0
+        self.batch_cnt = 0
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop after the current batch, the queued requests fail."""
+        with self.lock:
+            self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        while True:
+            try:
+                request = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            request.error = RuntimeError('The server is stopped')
+            request.done.set()
+
+    def submit(self, X):
+        """
+        Predict the rows of a request with the next batch.
+        :param X: array of shape = [n_samples, n_features]
+        :return: array with the predictions of the rows
+        """
+        request = _Request(np.asarray(X))
+        with self.lock:
+            # A request queued after the batcher stops would never be predicted.
+            if not self.running:
+                raise RuntimeError('The server is stopped')
+            self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def collect(self):
+        """
+        Wait for a request, then for more requests until the batch is full or the latency window expires.
+        :return: list of requests
+        """
+        try:
+            first = self.queue.get(timeout=0.1)
+        except queue.Empty:
+            return list()
+        batch, row_cnt = [first], len(first.X)
+        deadline = first.arrival_time + self.max_latency / 1000
+        while row_cnt < self.max_batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                request = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            row_cnt += len(request.X)
+        return batch
+
+    def predict_batch(self, batch):
+        """
+        Predict the requests of a batch together, or each request alone if the batch fails,
+        so that a bad request does not fail the other requests.
+        :param batch: list of requests with the same number of features
+        """
+        try:
+            pred = np.asarray(self.predict_func(np.vstack([request.X for request in batch])))
+        except Exception as err:
+            if len(batch) == 1:
+                self.logger.error('Prediction failed: %s' % str(err))
+                batch[0].error = err
+            else:
+                for request in batch:
+                    self.predict_batch([request])
+            return
+        offset = 0
+        for request in batch:
+            request.result = pred[offset: offset + len(request.X)]
+            offset += len(request.X)
+
+    def run(self):
+        while self.running:
+            batch = self.collect()
+            if len(batch) == 0:
+                continue
+            # The requests are stacked with the requests of the same width.
+            groups = dict()
+            for request in batch:
+                groups.setdefault(request.X.shape[1:], list()).append(request)
+            for group in groups.values():
+                self.predict_batch(group)
+            finish_time = time.time()
+            with self.lock:
+                self.batch_cnt += 1
+                for request in batch:
+                    self.request_cnt += 1
+                    self.row_cnt += len(request.X)
+                    self.latencies.append((finish_time - request.arrival_time) * 1000)
+            for request in batch:
+                request.done.set()
+
+    def get_metrics(self):
+        """
+        :return: dictionary, the throughput (rows/s), the mean batch size and the latency (ms) percentiles
+        """
+        with self.lock:
+            latencies = np.array(self.latencies)
+            elapsed_time = time.time() - self.start_time
+            metrics = {'requests': self.request_cnt,
+                       'rows': self.row_cnt,
+                       'batches': self.batch_cnt,
+                       'mean_batch_size': self.row_cnt / self.batch_cnt if self.batch_cnt > 0 else 0.,
+                       'throughput': self.row_cnt / elapsed_time if elapsed_time > 0 else 0.}
+        for percentile in [50, 90, 99]:
+            metrics['latency_p%d' % percentile] = float(np.percentile(latencies, percentile)) \
+                if len(latencies) > 0 else 0.
+        return metrics
+
+
+class _ModelRequestHandler(BaseHTTPRequestHandler):
+    def send_json(self, code, content):
+        body = json.dumps(content).encode('utf8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self.send_json(200, dict((name, batcher.get_metrics())
+                                     for name, batcher in self.server.model_server.batchers.items()))
+        elif self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        else:
+            self.send_json(404, {'error': 'Unknown path: %s' % self.path})
+
+    def do_POST(self):
+        batcher = self.server.model_server.batchers.get(self.path.strip('/'))
+        if batcher is None:
+            self.send_json(404, {'error': 'Unknown path: %s' % self.path})
+            return
+        try:
+            content = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf8'))
+            X = np.asarray(content['instances'], dtype=np.float64)
+            if X.ndim == 1:
+                X = X.reshape((1, -1))
+            n_features = self.server.model_server.n_features
+            if X.ndim != 2:
+                raise ValueError('Expected a 2-D array of instances')
+            if n_features is not None and X.shape[1] != n_features:
+                raise ValueError('Expected %d features, got %d' % (n_features, X.shape[1]))
+        except (ValueError, KeyError, TypeError) as err:
+            self.send_json(400, {'error': 'Invalid request: %s' % str(err)})
+            return
+        try:
+            pred = batcher.submit(X)
+        except Exception as err:
+            self.send_json(500, {'error': str(err)})
+            return
+        self.send_json(200, {'predictions': pred.tolist()})
+
+    def log_message(self, format, *args):
+        logging.getLogger(__name__).debug(format % args)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ModelServer(object):
+    """An HTTP server which loads a model once and predicts the requests in micro-batches."""
+
+    def __init__(self, model, host='127.0.0.1', port=8080, max_batch_size=64, max_latency=5., n_features=None):
+        """
+        :param model: str, path of a bundle, or a fitted model with predict and predict_proba
+        :param host: str
+        :param port: int, 0 means any free port
+        :param max_batch_size: int, maximal number of rows in a batch
+        :param max_latency: float, maximal time (ms) a request waits for other requests
+        :param n_features: int, number of features of the instances, the requests of other widths are rejected,
+            by default the number of features of the model if it records one
+        """
+        if isinstance(model, str):
+            from alphaml.utils.bundle import load_bundle
+            model = load_bundle(model)
+        self.model = model
+        if n_features is None:
+            n_features = getattr(model, 'n_features_', getattr(model, 'n_features_in_', None))
+        self.n_features = n_features
+        self.batchers = {'predict': MicroBatcher(model.predict, max_batch_size, max_latency),
+                         'predict_proba': MicroBatcher(model.predict_proba, max_batch_size, max_latency)}
+        self.httpd = _ThreadingHTTPServer((host, port), _ModelRequestHandler)
+        self.httpd.model_server = self
+        self.thread = None
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def start(self):
+        """Serve in a background thread."""
+        for batcher in self.batchers.values():
+            batcher.start()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.logger.info('Serving on %s:%d' % self.address[:2])
+        return self
+
+    def serve_forever(self):
+        for batcher in self.batchers.values():
+            batcher.start()
+        self.logger.info('Serving on %s:%d' % self.address[:2])
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self.thread is not None:
+            self.httpd.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.httpd.server_close()
+        for batcher in self.batchers.values():
+            batcher.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('bundle', type=str)
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max_batch_size', type=int, default=64)
+    parser.add_argument('--max_latency', type=float, default=5.)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    ModelServer(args.bundle, args.host, args.port, args.max_batch_size, args.max_latency).serve_forever()
@@ -0,0 +1,266 @@
+"""
+Self-contained benchmark for the throughput and quality of alpha-ml.
+
+The benchmark runs offline on the built-in datasets of scikit-learn and a synthetic dataset.
+Each (dataset, optimizer, ensemble method) case runs in a separate process, so that
+the peak memory of each case is measured independently and a crash does not stop the suite.
+
+Usage:
+    python test/benchmark/run_benchmark.py --output report_new.json
+    python test/benchmark/run_benchmark.py --compare report_old.json --output report_new.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import traceback
+import subprocess
+import multiprocessing
+import numpy as np
+
+project_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_folder)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--datasets', type=str, default='iris,wine,breast_cancer,digits,synthetic')
+parser.add_argument('--optimizers', type=str, default='smbo,mono_smbo,tpe,mono_tpe_smbo')
+parser.add_argument('--ensembles', type=str, default='none,bagging,blending,stacking,ensemble_selection')
+parser.add_argument('--run_count', type=int, default=20)
+parser.add_argument('--ensemble_size', type=int, default=10)
+parser.add_argument('--cv', action='store_true', help='Evaluate configurations with cross validation.')
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--latency_rows', type=int, default=100)
+parser.add_argument('--case_timeout', type=int, default=1800)
+parser.add_argument('--output', type=str, default='benchmark_report.json')
+parser.add_argument('--compare', type=str, default=None, help='A previous report to compare with.')
+
+# The validation accuracy used to measure the time-to-target of each dataset.
+TARGET_ACCURACY = {
+    'iris': 0.93,
+    'wine': 0.95,
+    'breast_cancer': 0.95,
+    'digits': 0.95,
+    'synthetic': 0.85
+}
+
+# Metrics compared across reports, and whether a larger value is better.
+COMPARED_METRICS = {
+    'test_accuracy': True,
+    'evals_per_minute': True,
+    'overhead_ratio': False,
+    'time_to_target': False,
+    'ensemble_time': False,
+    'latency_p50_ms': False,
+    'throughput_rows_per_sec': True,
+    'peak_memory_delta_mb': False
+}
+
+
+def load_dataset(dataset, seed):
+    if dataset == 'synthetic':
+        from sklearn.datasets import make_classification
+        X, y = make_classification(n_samples=2000, n_features=20, n_informative=10, n_classes=3,
+                                   random_state=seed)
+    else:
+        from alphaml.datasets.cls_dataset.dataset_loader import load_data
+        X, y, _ = load_data(dataset)
+    return X, y
+
+
+def get_memory():
+    # The current resident set size, which /proc/self/statm gives in pages on Linux.
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1024. / 1024.
+    except (OSError, IndexError, ValueError):
+        return get_peak_memory()
+
+
+def get_peak_memory():
+    # ru_maxrss is measured in kilobytes on Linux. The evaluations forked by the optimizer are waited children,
+    # and the case runs in its own process, so the children of earlier cases are not counted.
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024.
+
+
+def get_time_to_target(timing_list, config_values, target):
+    best_perf = -np.inf
+    for time_point, perf in zip(timing_list, config_values):
+        best_perf = max(best_perf, perf)
+        if best_perf >= target:
+            return time_point
+    return None
+
+
+def measure_prediction(estimator, X, latency_rows):
+    # Latency of single-row requests.
+    latency_list = list()
+    for i in range(min(latency_rows, len(X))):
+        start_time = time.time()
+        estimator.predict(X[i:i + 1])
+        latency_list.append((time.time() - start_time) * 1000)
+
+    # Throughput of batch requests with at least 1000 rows.
+    repeat = int(np.ceil(1000. / len(X)))
+    batch_X = np.vstack([X] * repeat)
+    start_time = time.time()
+    estimator.predict(batch_X)
+    batch_time = time.time() - start_time
+    return {
+        'latency_p50_ms': float(np.percentile(latency_list, 50)),
+        'latency_p95_ms': float(np.percentile(latency_list, 95)),
+        'throughput_rows_per_sec': len(batch_X) / batch_time
+    }
+
+
+def benchmark_case(dataset, optimizer, ensemble_method, args):
+    from alphaml.engine.components.data_manager import DataManager
+    from alphaml.estimators.classifier import Classifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score
+
+    # The forked process starts with the pages of the benchmark process, so the peak is measured from here.
+    base_memory = get_memory()
+    X, y = load_dataset(dataset, args.seed)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=args.seed, stratify=y)
+    dm = DataManager(X_train, y_train)
+
+    start_time = time.time()
+    cls = Classifier(optimizer=optimizer,
+                     ensemble_method=ensemble_method,
+                     ensemble_size=args.ensemble_size,
+                     cross_valid=args.cv,
+                     seed=args.seed,
+                     save_dir='data/save_models')
+    cls.fit(dm, metric='accuracy', runcount=args.run_count, task_name='%s_benchmark' % dataset)
+    fit_time = time.time() - start_time
+
+    engine = cls._ml_engine
+    opt = engine.optimizer
+    profile = opt.profiler.get_summary()
+    eval_cnt = len(opt.config_values)
+    target = TARGET_ACCURACY[dataset] if dataset in TARGET_ACCURACY else None
+
+    result = dict()
+    result['n_train'], result['n_features'] = X_train.shape
+    result['fit_time'] = fit_time
+    result['search_time'] = engine.search_time
+    result['ensemble_time'] = engine.ensemble_time
+    result['evaluations'] = eval_cnt
+    result['evals_per_minute'] = eval_cnt / engine.search_time * 60 if engine.search_time > 0 else None
+    result['overhead_ratio'] = profile['overhead_ratio']
+    result['suggest_time'] = profile['suggest_time']
+    result['eval_time'] = profile['eval_time']
+    result['bookkeeping_time'] = profile['bookkeeping_time']
+    result['best_val_accuracy'] = max(opt.config_values) if eval_cnt > 0 else None
+    result['target_accuracy'] = target
+    result['time_to_target'] = get_time_to_target(opt.timing_list, opt.config_values, target) \
+        if target is not None else None
+    result['test_accuracy'] = accuracy_score(y_test, cls.predict(X_test))
+    result.update(measure_prediction(cls, X_test, args.latency_rows))
+    result['peak_memory_mb'] = get_peak_memory()
+    result['peak_memory_delta_mb'] = result['peak_memory_mb'] - base_memory
+    return result
+
+
+def run_case(dataset, optimizer, ensemble_method, args, queue):
+    result = {'dataset': dataset, 'optimizer': optimizer, 'ensemble_method': ensemble_method}
+    work_dir = tempfile.mkdtemp(prefix='alphaml_benchmark_')
+    os.chdir(work_dir)
+    try:
+        result.update(benchmark_case(dataset, optimizer, ensemble_method, args))
+        result['status'] = 'success'
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = '%s: %s' % (type(e).__name__, str(e))
+        result['traceback'] = traceback.format_exc()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    queue.put(result)
+
+
+def get_environment():
+    env = dict()
+    try:
+        env['commit'] = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=project_folder,
+                                                stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        env['commit'] = None
+    env['python'] = platform.python_version()
+    env['platform'] = platform.platform()
+    env['cpu_count'] = multiprocessing.cpu_count()
+    import sklearn
+    env['numpy'] = np.__version__
+    env['sklearn'] = sklearn.__version__
+    return env
+
+
+def run_benchmark(args):
+    report = dict()
+    report['environment'] = get_environment()
+    report['settings'] = vars(args)
+    report['start_time'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    report['results'] = list()
+
+    for dataset in args.datasets.split(','):
+        for optimizer in args.optimizers.split(','):
+            for ensemble_method in args.ensembles.split(','):
+                print('Benchmark: %s, %s, %s' % (dataset, optimizer, ensemble_method))
+                queue = multiprocessing.Queue()
+                process = multiprocessing.Process(target=run_case,
+                                                  args=(dataset, optimizer, ensemble_method, args, queue))
+                process.start()
+                process.join(args.case_timeout)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+                    result = {'dataset': dataset, 'optimizer': optimizer, 'ensemble_method': ensemble_method,
+                              'status': 'timeout'}
+                elif queue.empty():
+                    result = {'dataset': dataset, 'optimizer': optimizer, 'ensemble_method': ensemble_method,
+                              'status': 'crashed', 'exitcode': process.exitcode}
+                else:
+                    result = queue.get()
+                print(json.dumps({key: value for key, value in result.items() if key != 'traceback'}))
+                report['results'].append(result)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Report saved in %s' % args.output)
+    return report
+
+
+def compare_reports(old_report, new_report):
+    """Print the relative change of the compared metrics between two reports."""
+
+    def get_key(result):
+        return result['dataset'], result['optimizer'], result['ensemble_method']
+
+    old_results = {get_key(result): result for result in old_report['results'] if result['status'] == 'success'}
+    print('Compare %s with %s' % (old_report['environment']['commit'], new_report['environment']['commit']))
+    for result in new_report['results']:
+        key = get_key(result)
+        if result['status'] != 'success' or key not in old_results:
+            continue
+        changes = list()
+        for metric, larger_is_better in COMPARED_METRICS.items():
+            old_value, new_value = old_results[key].get(metric), result.get(metric)
+            if old_value is None or new_value is None or old_value == 0:
+                continue
+            change = (new_value - old_value) / abs(old_value)
+            flag = '+' if (change > 0) == larger_is_better else '-'
+            changes.append('%s: %.4g -> %.4g (%s%.1f%%)' % (metric, old_value, new_value, flag, abs(change) * 100))
+        print('%s: %s' % ('/'.join(key), ', '.join(changes)))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    report = run_benchmark(args)
+    if args.compare is not None:
+        with open(args.compare, 'r') as f:
+            compare_reports(json.load(f), report)
@@ -1,7 +1,8 @@
 import numpy as np
 
 from alphaml.engine.components.data_manager import DataManager
-from alphaml.engine.components.data_preprocessing.encoder import one_hot, bucketizer, categorical_indexer
+from alphaml.engine.components.data_preprocessing.encoder import one_hot, bucketizer, categorical_indexer, \
+    frequency_encoder, target_encoder
 
 
 def test_one_hot():
@@ -92,7 +93,47 @@ def test_categorical_indexer():
     print(dm.test_X)
 
 
+def test_statistic_encoders():
+    train_x = np.array([["a", 1, "python", 4.5],
+                        ["b", 2, "c++", 6.8],
+                        ["a", 10, "java", 4.8],
+                        ["a", 3, "python", 5.1]], dtype=object)
+
+    valid_x = np.array([["a", 1, "scala", 4.5],
+                        ["d", 2, "c++", 6.8]], dtype=object)
+
+    test_x = np.array([["b", 1, "java", 4.5]], dtype=object)
+
+    dm = DataManager()
+    dm.feature_types = ["Categorical", "Discrete", "Categorical", "Float"]
+    dm.train_X = train_x
+    dm.val_X = valid_x
+    dm.test_X = test_x
+    dm = frequency_encoder(dm)
+
+    # The encoded features come first, and the unknown categories have the frequency 0.
+    assert dm.feature_types == ["Float", "Float", "Discrete", "Float"]
+    assert np.allclose(dm.train_X[:, 0], [0.75, 0.25, 0.75, 0.75])
+    assert np.allclose(dm.val_X[:, :2], [[0.75, 0.], [0., 0.25]])
+    assert np.allclose(dm.test_X, [[0.25, 0.25, 1, 4.5]])
+
+    dm = DataManager()
+    dm.feature_types = ["Categorical", "Discrete", "Categorical", "Float"]
+    dm.train_X = train_x
+    dm.train_y = np.array([1, 0, 1, 0])
+    dm.test_X = test_x
+    dm = target_encoder(dm, n_folds=2, smoothing=0.)
+
+    # The categories absent from the other fold take its prior mean instead of 0 / 0.
+    assert dm.train_X.shape == (4, 4) and dm.val_X is None
+    assert not np.isnan(dm.train_X).any()
+    assert np.allclose(dm.train_X[:, :2], [[0.5, 0.], [0.5, 0.5], [1., 0.5], [1., 1.]])
+    # The other data is encoded with the target means of all the training data.
+    assert np.allclose(dm.test_X, [[0., 1., 1, 4.5]])
+
+
 if __name__ == '__main__':
     # test_one_hot()
     # test_bucketizer()
     test_categorical_indexer()
+    test_statistic_encoders()
@@ -54,5 +54,25 @@ def test_impute_dm():
     print(dm.test_X)
 
 
+def test_impute_dm_values():
+    train_x = np.array([["a", 1., 4.5],
+                        ["b", np.nan, 6.5],
+                        ["???", 3., np.nan],
+                        ["b", 4., 5.5]], dtype=object)
+    test_x = np.array([[None, np.nan, np.nan]], dtype=object)
+
+    dm = DataManager()
+    dm.feature_types = ["Categorical", "Discrete", "Float"]
+    dm.train_X = train_x
+    dm.test_X = test_x
+    dm = impute_dm(dm, "???")
+
+    # The mode, the median and the mean of the training data.
+    assert dm.train_X.tolist() == [["a", 1., 4.5], ["b", 3., 6.5], ["b", 3., 5.5], ["b", 4., 5.5]]
+    assert dm.test_X.tolist() == [["b", 3., 5.5]]
+    assert dm.val_X is None
+
+
 if __name__ == '__main__':
     test_impute_dm()
+    test_impute_dm_values()
@@ -0,0 +1,24 @@
+import numpy as np
+from alphaml.engine.components.ensemble.aggregation import PredictionAggregator
+
+
+def test_aggregate():
+    rng = np.random.RandomState(1)
+    member_preds = [rng.dirichlet(np.ones(3), size=1000) for _ in range(5)]
+    weights = [0.4, 0.2, 0.2, 0.1, 0.1]
+
+    def predict_func(model, X):
+        return member_preds[model]
+
+    soft = PredictionAggregator(weights=weights, n_jobs=3).aggregate(list(range(5)), None, predict_func)
+    assert soft.dtype == np.float32
+    assert np.allclose(soft, np.average(member_preds, axis=0, weights=weights), atol=1e-6)
+
+    hard = PredictionAggregator(voting='hard').aggregate(list(range(5)), None, predict_func)
+    votes = np.array([np.argmax(pred, axis=1) for pred in member_preds])
+    assert np.allclose(hard[:, 0], np.mean(votes == 0, axis=0))
+    assert np.allclose(hard.sum(axis=1), 1)
+
+
+if __name__ == "__main__":
+    test_aggregate()
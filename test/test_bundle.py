@@ -0,0 +1,44 @@
+import os
+import tempfile
+import numpy as np
+from sklearn.datasets import load_breast_cancer
+from sklearn.ensemble import RandomForestClassifier
+from alphaml.utils.bundle import BundleWriter, BundleReader, load_bundle
+
+
+def test_segments():
+    path = os.path.join(tempfile.mkdtemp(), 'model.bundle')
+    writer = BundleWriter()
+    writer.meta['name'] = 'test'
+    weights = np.random.rand(10, 3)
+    writer.add_array('weights', weights)
+    writer.add_object('labels', {0: 'a', 1: 'b'})
+    writer.write(path)
+
+    reader = BundleReader(path)
+    assert reader.meta['name'] == 'test'
+    assert reader.header['segments']['weights']['offset'] % 64 == 0
+    assert isinstance(reader.get('weights'), np.memmap)
+    assert np.array_equal(reader.get('weights'), weights)
+    assert reader.get('labels') == {0: 'a', 1: 'b'}
+
+
+def test_lazy_members():
+    X, y = load_breast_cancer(return_X_y=True)
+    model = RandomForestClassifier(n_estimators=20, random_state=1).fit(X, y)
+    path = os.path.join(tempfile.mkdtemp(), 'model.bundle')
+    writer = BundleWriter()
+    writer.meta['model_type'] = 'single'
+    writer.meta['members'] = ['member_0']
+    writer.add_member('member_0', model)
+    writer.write(path)
+
+    predictor = load_bundle(path)
+    assert isinstance(predictor.model.value, np.memmap)
+    assert np.array_equal(predictor.predict(X), model.predict(X))
+    assert np.allclose(predictor.predict_proba(X), model.predict_proba(X))
+
+
+if __name__ == "__main__":
+    test_segments()
+    test_lazy_members()
@@ -0,0 +1,40 @@
+import pickle
+import tempfile
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+from alphaml.engine.components.data_manager import DataManager
+from alphaml.engine.evaluator.base import BaseClassificationEvaluator
+from alphaml.engine.evaluator.data_plane import DataPlane
+
+
+def test_attach_by_name():
+    plane = DataPlane(tempfile.mkdtemp())
+    X = np.random.rand(1000, 20)
+    plane.publish('train_X', X)
+    folds = list(StratifiedKFold(n_splits=3).split(X, np.arange(1000) % 2))
+    plane.publish_folds(folds)
+
+    # A worker only receives the directory of the data plane.
+    worker_plane = pickle.loads(pickle.dumps(plane))
+    assert len(pickle.dumps(plane)) < 1000
+    assert np.array_equal(worker_plane.attach('train_X'), X)
+    for (train_index, valid_index), (shared_train, shared_valid) in zip(folds, worker_plane.attach_folds()):
+        assert np.array_equal(train_index, shared_train)
+        assert np.array_equal(valid_index, shared_valid)
+
+
+def test_dispatch_size():
+    sizes = list()
+    for n in [1000, 10000]:
+        evaluator = BaseClassificationEvaluator(save_dir=tempfile.mkdtemp(), shared_data=True)
+        evaluator.data_manager = DataManager(np.random.rand(n, 20), np.arange(n) % 2)
+        evaluator.prepare()
+        sizes.append(len(pickle.dumps(evaluator)))
+        worker_evaluator = pickle.loads(pickle.dumps(evaluator))
+        assert np.array_equal(worker_evaluator.get_train_data()[0], evaluator.data_manager.train_X)
+    assert sizes[0] == sizes[1]
+
+
+if __name__ == "__main__":
+    test_attach_by_name()
+    test_dispatch_size()
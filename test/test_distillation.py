@@ -0,0 +1,51 @@
+import numpy as np
+from sklearn.datasets import load_breast_cancer
+from sklearn.ensemble import RandomForestClassifier
+from alphaml.engine.components.ensemble.distillation import EnsembleDistiller
+from alphaml.engine.components.pipeline.preprocessing_space import PreprocessedModel
+from alphaml.utils.constants import CLASSIFICATION
+
+
+def test_distill():
+    X, y = load_breast_cancer(return_X_y=True)
+    teacher = RandomForestClassifier(n_estimators=200, random_state=1).fit(X, y)
+    distiller = EnsembleDistiller(CLASSIFICATION, student='decision_tree', augment_ratio=2., random_state=1)
+    assert distiller.augment(X).shape == (2 * len(X), X.shape[1])
+
+    report = distiller.fit(teacher, X).evaluate(teacher, X)
+    print(report)
+    assert report['fidelity'] > 0.9
+    assert report['speedup'] > 1
+
+
+def test_categorical_augment():
+    rng = np.random.RandomState(1)
+    X = np.hstack([rng.randint(0, 5, (200, 1)), rng.rand(200, 2), rng.randint(0, 3, (200, 1))]).astype(np.float64)
+    distiller = EnsembleDistiller(CLASSIFICATION, augment_ratio=2., random_state=1,
+                                  categorical_cardinality={0: 5, 3: 3})
+    generated_X = distiller.augment(X)
+    # The codes are taken from the samples or their neighbors, the numerical features are perturbed.
+    assert set(generated_X[:, 0]) <= set(range(5)) and set(generated_X[:, 3]) <= set(range(3))
+    assert not np.isin(generated_X[:, 1], X[:, 1]).all()
+
+
+def test_categorical_student():
+    rng = np.random.RandomState(1)
+    X = np.hstack([rng.randint(0, 20, (300, 1)), rng.rand(300, 2)]).astype(np.float64)
+    teacher = RandomForestClassifier(n_estimators=50, random_state=1).fit(X, X[:, 0] % 2)
+    # The linear student is fitted on the one-hot expansion of the codes, the tree student on the codes.
+    distiller = EnsembleDistiller(CLASSIFICATION, student='liblinear_svc', random_state=1,
+                                  categorical_cardinality={0: 20})
+    student = distiller.fit(teacher, X).student
+    assert isinstance(student, PreprocessedModel)
+    assert student.estimator.estimator.coef_.shape[1] == 20 + 2
+    assert distiller.evaluate(teacher, X)['fidelity'] > 0.9
+    distiller = EnsembleDistiller(CLASSIFICATION, student='decision_tree', random_state=1,
+                                  categorical_cardinality={0: 20})
+    assert not isinstance(distiller.fit(teacher, X).student, PreprocessedModel)
+
+
+if __name__ == "__main__":
+    test_distill()
+    test_categorical_augment()
+    test_categorical_student()
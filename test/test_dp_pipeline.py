@@ -0,0 +1,499 @@
+import typing
+import threading
+import numpy as np
+from alphaml.engine.components.data_manager import DataManager
+from alphaml.engine.components.pipeline.base_operator import Operator, DATA_PERPROCESSING, FEATURE_GENERATION, \
+    FEATURE_SELECTION
+from alphaml.engine.components.pipeline.data_preprocessing_operator import FeatureEncoderOperator, ScalerOperator, \
+    ConstantRemoverOperator, VarianceRemoverOperator, IdenticalRemoverOperator
+from alphaml.engine.components.pipeline.feature_generation_operator import PolynomialFeaturesOperator, PCAOperator
+from alphaml.engine.components.pipeline.feature_selection_operator import NaiveSelectorOperator, select_columns
+from alphaml.engine.components.pipeline.data_preprocessing_pipeline import DP_Pipeline
+from alphaml.engine.components.pipeline.transform_plan import TransformPlan, EncodeStep, AffineStep, SelectStep, \
+    RowStatisticsStep, get_row_statistics
+
+
+class ScaleOperator(Operator):
+    def __init__(self, params, barrier=None):
+        super().__init__(FEATURE_GENERATION, 'fg_scale', params)
+        self.barrier = barrier
+        self.call_cnt = 0
+
+    def operate(self, dm_list: typing.List, phase='train'):
+        self.call_cnt += 1
+        if self.barrier is not None:
+            # Both branches must be running at the same time to pass the barrier.
+            self.barrier.wait()
+        result_dm = DataManager()
+        result_dm.train_X = dm_list[0].train_X * self.params
+        result_dm.train_y = dm_list[0].train_y
+        return result_dm
+
+
+class InputOperator(Operator):
+    def __init__(self):
+        super().__init__(DATA_PERPROCESSING, 'dp_input')
+        self.call_cnt = 0
+
+    def operate(self, dm_list: typing.List, phase='train'):
+        self.call_cnt += 1
+        result_dm = DataManager()
+        result_dm.train_X = dm_list[0].values[:, :-1].astype(np.float64)
+        result_dm.train_y = dm_list[0].values[:, -1]
+        return result_dm
+
+
+class ConcatOperator(Operator):
+    def __init__(self):
+        super().__init__(FEATURE_SELECTION, 'fs_concat')
+        self.call_cnt = 0
+
+    def operate(self, dm_list: typing.List, phase='train'):
+        self.call_cnt += 1
+        result_dm = DataManager()
+        result_dm.train_X = np.hstack([dm.train_X for dm in dm_list])
+        result_dm.train_y = dm_list[0].train_y
+        return result_dm
+
+
+def build_pipeline(n_jobs):
+    import pandas as pd
+    pipeline = DP_Pipeline(None, n_jobs=n_jobs)
+    barrier = threading.Barrier(2, timeout=10) if n_jobs > 1 else None
+    pipeline.pipeline_operators = [InputOperator(), ScaleOperator(2, barrier), ScaleOperator(3, barrier),
+                                   ConcatOperator()]
+    for node_id, operator in enumerate(pipeline.pipeline_operators):
+        operator.id = node_id
+    pipeline.pipeline_operators[1].origins = [0]
+    pipeline.pipeline_operators[2].origins = [0]
+    pipeline.pipeline_operators[3].origins = [1, 2]
+    df = pd.DataFrame(np.hstack([np.random.rand(100, 3), (np.arange(100) % 2).reshape((-1, 1))]))
+    return pipeline, df
+
+
+def test_parallel_branches():
+    pipeline, df = build_pipeline(n_jobs=2)
+    assert [len(level) for level in pipeline.get_levels()] == [1, 2, 1]
+    dm = pipeline.execute(df)
+    assert dm.train_X.shape == (100, 6)
+    assert np.allclose(dm.train_X[:, 3:], 1.5 * dm.train_X[:, :3])
+    # Only the final output is kept.
+    assert list(pipeline.cached_dm.keys()) == [3]
+
+
+def test_cached_execution():
+    pipeline, df = build_pipeline(n_jobs=1)
+    first_dm = pipeline.execute(df.copy())
+    second_dm = pipeline.execute(df.copy())
+    assert all(operator.call_cnt == 1 for operator in pipeline.pipeline_operators)
+    assert np.array_equal(first_dm.train_X, second_dm.train_X)
+
+    # A new input runs the operators again.
+    df.iloc[0, 0] = -1
+    pipeline.execute(df)
+    assert all(operator.call_cnt == 2 for operator in pipeline.pipeline_operators)
+
+
+def build_data(n_samples):
+    x = np.empty((n_samples, 4), dtype=object)
+    x[:, 0] = np.random.choice(['a', 'b', 'c'], n_samples)
+    x[:, 1] = np.random.rand(n_samples)
+    x[:, 2] = 1.
+    x[:, 3] = np.random.randint(0, 5, n_samples)
+    dm = DataManager()
+    dm.feature_types = ['Categorical', 'Float', 'Float', 'Discrete']
+    return dm, x
+
+
+def test_compiled_plan():
+    pipeline = DP_Pipeline(None)
+    pipeline.pipeline_operators = [FeatureEncoderOperator(1), ScalerOperator(0), ConstantRemoverOperator()]
+    for node_id, operator in enumerate(pipeline.pipeline_operators):
+        operator.id = node_id
+        operator.origins = [node_id - 1] if node_id > 0 else None
+
+    dm, dm.train_X = build_data(100)
+    dm.train_y = np.random.randint(0, 2, 100)
+    for operator in pipeline.pipeline_operators:
+        dm = operator.operate([dm], phase='train')
+
+    plan = pipeline.compile()
+    # The chain of operators is merged into one node.
+    assert len(plan.nodes) == 1
+    dm, dm.test_X = build_data(50)
+    test_X = dm.test_X.copy()
+    for operator in pipeline.pipeline_operators:
+        dm = operator.operate([dm], phase='test')
+    assert np.allclose(plan.transform(test_X), dm.test_X)
+
+
+def test_plan_steps():
+    categories = [np.array(['a', 'b']), np.array([1, 2, 3])]
+    x = np.array([['a', 1, 0.5], ['b', 3, 0.], ['c', 2, 1.]], dtype=object)
+    output = EncodeStep([0, 1], [2], categories).transform(x)
+    # The unknown category is encoded as zeros.
+    assert np.array_equal(output, [[1, 0, 1, 0, 0, 0.5], [0, 1, 0, 0, 1, 0.], [0, 0, 0, 1, 0, 1.]])
+
+    # Node 1 scales the shared output of node 0 in place, which must not affect node 2.
+    plan = TransformPlan([(0, [], [SelectStep([0, 1, 2]), SelectStep([2, 0])]),
+                          (1, [0], [AffineStep([0], [2.], [1.])]),
+                          (2, [0], [RowStatisticsStep()]),
+                          (3, [1, 2], [])])
+    assert np.array_equal(plan.nodes[0][2][0].index, [2, 0])
+    x = np.array([[0., 1., 2.], [3., 0., 0.]])
+    assert np.array_equal(plan.transform(x), [[5., 0., 1.], [1., 3., 1.]])
+    assert np.array_equal(x, [[0., 1., 2.], [3., 0., 0.]])
+
+
+def test_removers():
+    x = np.random.rand(200, 2000)
+    x[:, 10] = 1.
+    x[:, 20] = 1e-4 * np.random.rand(200)
+    x[:, 30] = x[:, 40]
+    x[:, 50] = -0. * x[:, 60]
+    x[:, 60] = 0.
+    removed = {ConstantRemoverOperator: [10, 50, 60],
+               VarianceRemoverOperator: [10, 20, 50, 60],
+               IdenticalRemoverOperator: [40, 60]}
+    for operator_class, removed_index in removed.items():
+        dm = DataManager()
+        dm.train_X, dm.test_X = x.copy(), x[:10].copy()
+        dm.feature_types = ['Float'] * 1999 + ['Categorical']
+        operator = operator_class()
+        dm = operator.operate([dm], phase='train')
+        keep_index = [i for i in range(2000) if i not in removed_index]
+        assert np.array_equal(dm.train_X, x[:, keep_index])
+        assert len(dm.feature_types) == len(keep_index) and dm.feature_types[-1] == 'Categorical'
+
+        dm.feature_types = ['Float'] * 1999 + ['Categorical']
+        dm = operator.operate([dm], phase='test')
+        assert np.array_equal(dm.test_X, x[:10, keep_index])
+
+
+def test_row_statistics():
+    import scipy.sparse as sp
+    x = sp.random(300, 50, density=0.1, format='csr', random_state=1)
+    x.data -= 0.5
+    x.data[:5] = 0.
+    x.data[5:10] = np.nan
+    dense_x = x.toarray()
+    statistics = ['zero', 'nan', 'negative', 'mean', 'std']
+    expected = np.vstack([(dense_x == 0).sum(axis=1), np.isnan(dense_x).sum(axis=1), (dense_x < 0).sum(axis=1),
+                          np.nanmean(dense_x, axis=1), np.nanstd(dense_x, axis=1)]).T
+    assert np.allclose(get_row_statistics(dense_x, statistics, chunk_size=64), expected)
+    assert np.allclose(get_row_statistics(x, statistics, chunk_size=64), expected)
+
+
+def test_polynomial_features():
+    from sklearn.preprocessing import PolynomialFeatures
+    x = np.random.rand(500, 6)
+    y = (x[:, 1] * x[:, 4] > 0.25).astype(int)
+    dm = DataManager()
+    dm.train_X, dm.train_y, dm.test_X = x, y, x[:20]
+    dm.feature_types = ['Float'] * 6
+
+    operator = PolynomialFeaturesOperator(3, block_size=4)
+    expected = PolynomialFeatures(degree=3, interaction_only=True).fit_transform(x)[:, 7:]
+    assert np.allclose(operator.operate([dm], phase='train').train_X, expected, rtol=1e-5)
+    assert operator.operate([dm], phase='test').test_X.dtype == np.float32
+
+    operator = PolynomialFeaturesOperator(2, top_k=1, block_size=4)
+    assert np.allclose(operator.operate([dm], phase='train').train_X[:, 0], x[:, 1] * x[:, 4], rtol=1e-5)
+
+
+def test_chunked_pca():
+    from sklearn.decomposition import PCA
+    x = np.random.rand(1000, 8) * np.array([10, 5, 2, 1, 1, 1, 1, 1])
+    dm = DataManager()
+    dm.train_X, dm.test_X = x, x[:50]
+    dm.feature_types = ['Float'] * 8
+
+    operator = PCAOperator(2, chunk_size=300)
+    train_X = operator.operate([dm], phase='train').train_X
+    assert train_X.shape == (1000, 2)
+    assert np.allclose(operator.operate([dm], phase='test').test_X, train_X[:50])
+    # The leading components match the PCA fitted on all rows.
+    components = PCA(n_components=2).fit(x).components_
+    assert np.allclose(np.abs((operator.pca.components_ * components).sum(axis=1)), 1, atol=1e-2)
+
+
+def test_cached_selector():
+    from sklearn.datasets import load_digits
+    from sklearn.feature_selection import SelectKBest, f_classif
+    from alphaml.engine.components.feature_engineering.selector import score_cache, compute_scores
+    x, y = load_digits(return_X_y=True)
+    assert np.allclose(compute_scores(f_classif, x, y, n_jobs=3), compute_scores(f_classif, x, y), equal_nan=True)
+
+    dm_list = list()
+    for block in [x[:, :40], x[:, 40:]]:
+        dm = DataManager()
+        dm.train_X, dm.train_y, dm.test_X = block, y, block[:30]
+        dm_list.append(dm)
+    operator = NaiveSelectorOperator([20, 1], n_jobs=2)
+    expected = SelectKBest(f_classif, k=20).fit(x, y).get_support(indices=True)
+    assert np.array_equal(operator.operate(dm_list, phase='train').train_X, x[:, expected])
+    assert np.array_equal(operator.operate(dm_list, phase='test').test_X, x[:30, expected])
+
+    # Selecting a different k reuses the cached scores of both inputs.
+    cache_size = len(score_cache.scores)
+    operator = NaiveSelectorOperator([10, 1])
+    operator.operate(dm_list, phase='train')
+    assert len(score_cache.scores) == cache_size
+    assert np.array_equal(select_columns([x[:, :40], x[:, 40:]], [50, 3, 41]), x[:, [50, 3, 41]])
+
+
+def test_preprocessor():
+    import tempfile
+    from sklearn.linear_model import LogisticRegression
+    from alphaml.engine.components.pipeline.preprocessing_space import Preprocessor, PreprocessedModel, \
+        PreprocessingCache, get_preprocessing_config
+
+    rng = np.random.RandomState(1)
+    x = rng.rand(200, 8)
+    x[:, 2] = 1.
+    y = (x[:, 0] + x[:, 1] > 1).astype(int)
+    config = get_preprocessing_config({'estimator': 'logistic_regression', 'logistic_regression:C': 1.,
+                                       'preprocessor:scaler': 'standard', 'preprocessor:generator': 'polynomial',
+                                       'preprocessor:polynomial_top_k': 10, 'preprocessor:selector': 'kbest',
+                                       'preprocessor:selector_k': 12})
+    assert config == {'scaler': 'standard', 'generator': 'polynomial', 'polynomial_top_k': 10,
+                      'selector': 'kbest', 'selector_k': 12}
+
+    preprocessor = Preprocessor(config)
+    train_X = preprocessor.fit_transform(x[:150], y[:150])
+    assert train_X.shape == (150, 12)
+    assert np.allclose(preprocessor.transform(x[:150]), train_X)
+    assert preprocessor.get_id() == Preprocessor(dict(config)).get_id()
+
+    # The preprocessed data of a configuration is cached in files until the size limit is exceeded.
+    cache = PreprocessingCache(tempfile.mkdtemp(), limit=1)
+    val_X = preprocessor.transform(x[150:])
+    cache.put((preprocessor.get_id(), 0), preprocessor, train_X, val_X)
+    cached_preprocessor, cached_train_X, cached_val_X = cache.get((preprocessor.get_id(), 0))
+    assert np.array_equal(cached_train_X, train_X) and np.array_equal(cached_val_X, val_X)
+    assert np.allclose(cached_preprocessor.transform(x[150:]), val_X)
+    assert cache.get((preprocessor.get_id(), 1)) is None
+    assert cache.hit_cnt == 1
+    cache.put((preprocessor.get_id(), 1), preprocessor, np.zeros((1024, 1024)), val_X)
+    assert cache.get((preprocessor.get_id(), 1)) is None
+    cache.clear()
+    assert cache.get((preprocessor.get_id(), 0)) is None
+
+    model = PreprocessedModel(Preprocessor(config), LogisticRegression()).fit(x[:150], y[:150])
+    assert model.predict(x[150:]).shape == (50,)
+    assert np.allclose(model.predict_proba(x[150:]), model.estimator.predict_proba(val_X))
+
+
+def test_native_categorical():
+    from sklearn.preprocessing import OneHotEncoder
+    from alphaml.engine.components.pipeline.transform_plan import OneHotCodeStep
+    from alphaml.engine.components.pipeline.preprocessing_space import Preprocessor
+
+    x = np.array([['b', 1., 0.5, 'x'],
+                  ['a', 1., 1.5, 'y'],
+                  ['c', 1., 2.5, 'x'],
+                  ['a', 1., 3.5, 'z']], dtype=object)
+    test_x = np.array([['c', 1., 0.1, 'w']], dtype=object)
+    dm, test_dm = DataManager(), DataManager()
+    dm.train_X, test_dm.test_X = x.copy(), test_x.copy()
+    dm.feature_types = ['Categorical', 'Float', 'Float', 'Categorical']
+    test_dm.feature_types = list(dm.feature_types)
+
+    encoder = FeatureEncoderOperator(2)
+    remover = ConstantRemoverOperator()
+    dm = remover.operate([encoder.operate([dm], phase='train')], phase='train')
+    # The constant column is removed, the codes are kept narrow and skipped by the numerical operators.
+    assert np.array_equal(dm.train_X, [[1., 0.5, 0.], [0., 1.5, 1.], [2., 2.5, 0.], [0., 3.5, 2.]])
+    assert dm.feature_types == ['Categorical-Code', 'Float', 'Categorical-Code']
+    assert dm.categorical_cardinality == {0: 3, 2: 3}
+
+    # The unknown categories are coded as -1, by the operators and by the compiled plan.
+    test_dm = remover.operate([encoder.operate([test_dm], phase='test')], phase='test')
+    assert np.array_equal(test_dm.test_X, [[2., 0.1, -1.]])
+    plan = TransformPlan([(0, [], encoder.compile()), (1, [0], remover.compile())])
+    assert np.array_equal(plan.transform(test_x), test_dm.test_X)
+
+    # The models consuming one-hot codes get them from the codes.
+    step = OneHotCodeStep(dm.categorical_cardinality)
+    expected = np.hstack([OneHotEncoder().fit_transform(x[:, [0, 3]]).toarray(), x[:, [2]].astype(float)])
+    assert np.array_equal(step.transform(dm.train_X), expected)
+    assert np.array_equal(step.transform(test_dm.test_X), [[0., 0., 1., 0., 0., 0., 0.1]])
+
+    preprocessor = Preprocessor({}, categorical_cardinality=dm.categorical_cardinality, encoding='onehot')
+    assert np.array_equal(preprocessor.fit_transform(dm.train_X, None), expected)
+    preprocessor = Preprocessor({'scaler': 'standard'}, categorical_cardinality=dm.categorical_cardinality)
+    train_X = preprocessor.fit_transform(dm.train_X, None)
+    assert np.array_equal(train_X[:, [0, 2]], dm.train_X[:, [0, 2]])
+    assert np.allclose(train_X[:, 1].mean(), 0)
+
+
+def test_statistic_encoders():
+    from alphaml.engine.components.pipeline.data_preprocessing_operator import FrequencyEncoderOperator, \
+        TargetEncoderOperator
+    from alphaml.engine.components.data_preprocessing.encoder import get_target_table
+
+    rng = np.random.RandomState(1)
+    categories = np.array(['id%d' % i for i in range(50)], dtype=object)
+    x = np.empty((1000, 2), dtype=object)
+    x[:, 0] = categories[rng.randint(0, 50, 1000)]
+    x[:, 1] = rng.rand(1000)
+    y = (rng.rand(1000) < 0.5).astype(int)
+    test_x = np.array([['id3', 0.5], ['unknown', 0.5]], dtype=object)
+
+    def get_dms():
+        dm, test_dm = DataManager(), DataManager()
+        dm.train_X, dm.train_y, test_dm.test_X = x.copy(), y, test_x.copy()
+        dm.feature_types, test_dm.feature_types = ['Categorical', 'Float'], ['Categorical', 'Float']
+        return dm, test_dm
+
+    dm, test_dm = get_dms()
+    operator = FrequencyEncoderOperator()
+    train_X = operator.operate([dm], phase='train').train_X
+    assert train_X.shape == (1000, 2) and operator.tables[0].dtype == np.float32
+    category, codes, counts = np.unique(x[:, 0], return_inverse=True, return_counts=True)
+    code = list(category).index('id3')
+    assert np.allclose(train_X[x[:, 0] == 'id3', 0], counts[code] / 1000.)
+    output = operator.operate([test_dm], phase='test').test_X
+    assert np.allclose(output, [[counts[code] / 1000., 0.5], [0., 0.5]])
+    assert np.allclose(TransformPlan([(0, [], operator.compile())]).transform(test_x), output)
+
+    dm, test_dm = get_dms()
+    operator = TargetEncoderOperator(5, smoothing=0.)
+    train_X = operator.operate([dm], phase='train').train_X
+    # The training data is encoded out of fold, so it differs from the in-sample means.
+    in_sample = get_target_table(codes, 50, y.reshape(-1, 1), 0.)
+    assert not np.allclose(train_X[:, 0], in_sample[codes, 0])
+    assert np.allclose(operator.tables[0], in_sample)
+    output = operator.operate([test_dm], phase='test').test_X
+    assert np.allclose(output, [[in_sample[code, 0], 0.5], [y.mean(), 0.5]])
+
+
+def test_imputer():
+    import pandas as pd
+    from alphaml.engine.components.pipeline.data_preprocessing_operator import ImputerOperator
+
+    df = pd.DataFrame({'a': [1., np.nan, 3., np.nan], 'b': [1, 2, 3, 4],
+                       'c': ['x', None, 'y', 'y'], 'label': [0, 1, 0, 1]})
+    test_df = pd.DataFrame({'a': [np.nan, 10.], 'b': [5, 6], 'c': [None, 'x']})
+    operator = ImputerOperator(add_indicator=True)
+    operator.feature_columns = ['a', 'b', 'c']
+    train_df = operator.impute_df(df[operator.feature_columns])
+    assert operator.fill_values == {'a': 2., 'b': 2.5, 'c': 'y'}
+    assert operator.indicator_columns == ['a', 'c']
+    assert list(train_df['a']) == [1., 2., 3., 2.] and list(train_df['c']) == ['x', 'y', 'y', 'y']
+    assert list(train_df['a_missing']) == [0, 1, 0, 1] and train_df['b'].dtype == np.int64
+    assert df['a'].isnull().sum() == 2
+
+    # The test data is filled with the statistics of the training data.
+    output = TransformPlan([(0, [], operator.compile())]).transform(test_df)
+    assert output.tolist() == [[2., 5, 'y', 1, 1], [10., 6, 'x', 0, 0]]
+    assert operator.impute_df(test_df, phase='test').values.tolist() == output.tolist()
+
+    # The numerical data is filled without converting it to objects.
+    operator = ImputerOperator(strategy='median')
+    operator.feature_columns = ['a', 'b']
+    operator.impute_df(df[operator.feature_columns])
+    x = np.array([[np.nan, 1.], [4., np.nan]])
+    output = TransformPlan([(0, [], operator.compile())]).transform(x)
+    assert output.dtype == np.float64 and np.array_equal(output, [[2., 1.], [4., 2.5]])
+    assert np.isnan(x[0, 0])
+
+
+def test_imputer_operate():
+    import pandas as pd
+    from alphaml.engine.components.pipeline.data_preprocessing_operator import ImputerOperator
+
+    df = pd.DataFrame({'a': [1., np.nan, 3., np.nan], 'b': [1, 2, 3, 4],
+                       'c': ['x', None, 'y', 'y'], 'label': [0, 1, 0, 1]})
+    test_df = pd.DataFrame({'a': [np.nan, 10.], 'b': [5, 6], 'c': [None, 'x']})
+    operator = ImputerOperator()
+    dm = operator.operate([df], phase='train')
+    # The feature types are set from the imputed columns, the label is the last column.
+    assert dm.feature_types == ['Float', 'Discrete', 'Categorical']
+    assert dm.train_X.tolist() == [[1., 1, 'x'], [2., 2, 'y'], [3., 3, 'y'], [2., 4, 'y']]
+    assert dm.train_y.tolist() == [0, 1, 0, 1]
+    dm = operator.operate([test_df], phase='test')
+    assert dm.feature_types == ['Float', 'Discrete', 'Categorical']
+    assert dm.test_X.tolist() == [[2., 5, 'y'], [10., 6, 'x']]
+
+
+def test_pipeline_end_to_end():
+    import pandas as pd
+
+    rng = np.random.RandomState(1)
+    df = pd.DataFrame({'a': rng.rand(100), 'b': rng.randint(0, 5, 100), 'c': rng.choice(['x', 'y', 'z'], 100),
+                       'd': np.ones(100), 'label': rng.randint(0, 2, 100)})
+    df.loc[3, 'a'] = np.nan
+    df.loc[5, 'c'] = None
+    test_df = df.drop(columns=['label']).iloc[:10]
+
+    # The default pipeline keeps the categorical codes and removes the constant feature.
+    pipeline = DP_Pipeline(None)
+    dm = pipeline.execute(df, phase='train')
+    assert dm.train_X.shape == (100, 3) and np.array_equal(dm.train_y, df['label'].values)
+    assert pipeline.categorical_cardinality == {2: 3}
+    test_X = pipeline.execute(test_df, phase='test').test_X
+    assert np.allclose(test_X, dm.train_X[:10])
+    # The operators give the same test data as the compiled plan.
+    pipeline.plan = None
+    assert np.allclose(pipeline.execute(test_df, phase='test').test_X, test_X)
+
+    pipeline = DP_Pipeline({'scaler': 'standard', 'generator': 'none', 'selector': 'kbest', 'selector_k': 2,
+                            'encoder': 'onehot'})
+    dm = pipeline.execute(df, phase='train')
+    assert dm.train_X.shape == (100, 2)
+    assert np.allclose(pipeline.execute(test_df, phase='test').test_X, dm.train_X[:10])
+
+
+def test_thread_safe_caches():
+    import pickle
+    from alphaml.engine.components.pipeline.data_preprocessing_pipeline import ResultCache
+    from alphaml.engine.components.feature_engineering.selector import ScoreCache
+
+    # Each output takes half of the limit, so the threads evict each other's entries.
+    cache, score_cache = ResultCache(limit=1), ScoreCache(limit=2)
+    dm = DataManager()
+    dm.train_X = np.zeros((256, 256))
+    errors = list()
+
+    def run(i):
+        try:
+            for j in range(100):
+                key = str((i + j) % 5)
+                if cache.get(key) is None:
+                    cache.put(key, dm)
+                assert score_cache.get(key, lambda: int(key)) == int(key)
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 0
+    assert cache.nbytes == sum(nbytes for _, nbytes in cache.results.values()) <= cache.limit
+    assert len(score_cache.scores) <= 2
+
+    # The cached outputs are not pickled.
+    cache = pickle.loads(pickle.dumps(cache))
+    assert cache.get('0') is None and cache.nbytes == 0
+
+
+if __name__ == "__main__":
+    test_parallel_branches()
+    test_cached_execution()
+    test_compiled_plan()
+    test_plan_steps()
+    test_removers()
+    test_row_statistics()
+    test_polynomial_features()
+    test_chunked_pca()
+    test_cached_selector()
+    test_preprocessor()
+    test_native_categorical()
+    test_statistic_encoders()
+    test_imputer()
+    test_imputer_operate()
+    test_pipeline_end_to_end()
+    test_thread_safe_caches()
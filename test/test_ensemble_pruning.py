@@ -0,0 +1,31 @@
+import numpy as np
+from sklearn.metrics import accuracy_score
+from alphaml.engine.components.ensemble.pruning import EnsemblePruner
+
+
+def test_prune_under_budget():
+    rng = np.random.RandomState(1)
+    labels = rng.randint(0, 2, 500)
+    onehot = np.eye(2)[labels]
+    # The expensive member is the most accurate one.
+    predictions = [0.6 * onehot + 0.4 * rng.rand(500, 2),
+                   0.3 * onehot + 0.7 * rng.rand(500, 2),
+                   0.2 * onehot + 0.8 * rng.rand(500, 2)]
+    latency, memory = np.array([5., 1., 1.]), np.array([10., 1., 1.])
+
+    def score_func(pred, y_true):
+        return accuracy_score(y_true, np.argmax(pred, axis=1))
+
+    weights = EnsemblePruner().prune(predictions, labels, score_func, latency, memory)
+    assert weights[0] > 0
+
+    pruner = EnsemblePruner(latency_budget=3.)
+    weights = pruner.prune(predictions, labels, score_func, latency, memory)
+    assert weights[0] == 0 and np.isclose(weights.sum(), 1)
+    curve = pruner.get_tradeoff_curve()
+    assert all(point['latency'] <= 3. for point in curve)
+    assert [point['size'] for point in curve] == sorted(point['size'] for point in curve)
+
+
+if __name__ == "__main__":
+    test_prune_under_budget()
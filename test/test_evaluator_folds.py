@@ -0,0 +1,119 @@
+import os
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+from sklearn.datasets import load_digits
+from sklearn.dummy import DummyClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+from alphaml.engine.components.data_manager import DataManager
+from alphaml.engine.components.components_manager import ComponentsManager
+from alphaml.engine.components.pipeline.data_preprocessing_pipeline import DP_Pipeline
+from alphaml.engine.components.pipeline.preprocessing_space import Preprocessor, PreprocessedModel
+from alphaml.engine.evaluator.base import BaseClassificationEvaluator
+
+
+def test_reused_folds():
+    X, y = np.random.rand(300, 5), np.arange(300) % 3
+    folds_list = list()
+    for _ in range(2):
+        evaluator = BaseClassificationEvaluator(kfold=3)
+        evaluator.data_manager = DataManager(X, y)
+        evaluator.metric_func = roc_auc_score
+        evaluator.prepare(random_state=1)
+        folds_list.append(evaluator.get_folds())
+
+    # The same seed gives the same folds, and the folds cover all the samples once.
+    valid_index = np.concatenate([valid for _, valid in folds_list[0]])
+    assert np.array_equal(np.sort(valid_index), np.arange(300))
+    for (train_1, valid_1), (train_2, valid_2) in zip(*folds_list):
+        assert np.array_equal(train_1, train_2) and np.array_equal(valid_1, valid_2)
+    assert evaluator.get_encoded_label().shape == (300, 3)
+
+
+def test_racing():
+    X, y = load_digits(return_X_y=True)
+    save_dir = tempfile.mkdtemp()
+    evaluator = BaseClassificationEvaluator(kfold=5, save_dir=save_dir, racing=True)
+    evaluator.data_manager = DataManager(X, y)
+    evaluator.metric_func = accuracy_score
+    evaluator.prepare(random_state=1)
+    save_path = os.path.join(save_dir, 'model.pkl')
+
+    good_loss = evaluator.validate(RandomForestClassifier(n_estimators=50, random_state=1), save_path)
+    bad_loss = evaluator.validate(DummyClassifier(strategy='most_frequent'), save_path)
+    state = evaluator.load_racing_state()
+    # The dummy classifier is aborted after the first fold with a censored loss.
+    assert bad_loss > good_loss
+    assert state['incumbent_loss'] == good_loss
+    assert state['fold_fit_cnt'] == 6 and state['saved_fit_cnt'] == 4
+
+
+def test_shared_preprocessing():
+    X, y = load_digits(return_X_y=True)
+    save_dir = tempfile.mkdtemp()
+    evaluator = BaseClassificationEvaluator(kfold=3, save_dir=save_dir)
+    evaluator.data_manager = DataManager(X, y)
+    evaluator.metric_func = accuracy_score
+    evaluator.prepare(random_state=1)
+    config = {'scaler': 'standard', 'selector': 'kbest', 'selector_k': 20}
+    estimators = [DecisionTreeClassifier(random_state=1),
+                  RandomForestClassifier(n_estimators=10, random_state=1)]
+
+    def evaluate(estimator, queue):
+        save_path = os.path.join(save_dir, 'model.pkl')
+        loss = evaluator.validate(PreprocessedModel(Preprocessor(dict(config)), estimator), save_path)
+        queue.put((loss, evaluator.preprocessing_cache.hit_cnt))
+
+    # Each configuration is evaluated in its own process, as SMAC does.
+    results = list()
+    for estimator in estimators:
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=evaluate, args=(estimator, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+    # The second configuration loads the splits preprocessed by the first one on all the folds.
+    assert [hit_cnt for _, hit_cnt in results] == [0, 3]
+    assert all(0 < loss < 1 for loss, _ in results)
+
+
+def test_categorical_encoding():
+    rng = np.random.RandomState(1)
+    city = rng.randint(0, 50, 500)
+    df = pd.DataFrame({'a': rng.rand(500), 'b': rng.rand(500),
+                       'city': ['city_%d' % code for code in city],
+                       'label': (city % 2 == 0).astype(int)})
+    dm = DP_Pipeline(None).execute(df)
+    assert list(dm.categorical_cardinality.values()) == [50]
+
+    evaluator = BaseClassificationEvaluator(kfold=3, save_dir=tempfile.mkdtemp())
+    evaluator.data_manager = dm
+    evaluator.metric_func = accuracy_score
+    evaluator.prepare(random_state=1)
+    config_dict = ComponentsManager().get_hyperparameter_search_space(
+        'binary', include=['decision_tree', 'liblinear_svc'])
+    estimators = dict()
+    for name in config_dict:
+        cs = ComponentsManager.build_hierarchical_configspace({name: config_dict[name]})
+        _, estimators[name] = evaluator.set_config(cs.get_default_configuration(), 'smac')
+        loss = evaluator.validate(estimators[name], os.path.join(evaluator.save_dir, 'model.pkl'))
+        assert 0 <= loss < 0.5
+
+    # The tree model is fitted on the code matrix, the linear model on the one-hot expansion.
+    tree, linear = estimators['decision_tree'], estimators['liblinear_svc']
+    assert not isinstance(tree, PreprocessedModel)
+    tree.fit(dm.train_X, dm.train_y)
+    assert tree.estimator.tree_.n_features == 3
+    assert isinstance(linear, PreprocessedModel)
+    linear.fit(dm.train_X, dm.train_y)
+    assert linear.estimator.estimator.coef_.shape[1] == 2 + 50
+
+
+if __name__ == "__main__":
+    test_reused_folds()
+    test_racing()
+    test_shared_preprocessing()
+    test_categorical_encoding()
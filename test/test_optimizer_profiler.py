@@ -0,0 +1,40 @@
+import time
+from alphaml.engine.optimizer.profiler import OptimizerProfiler
+
+
+def test_profile_split():
+    profiler = OptimizerProfiler().start()
+    suggest = profiler.timed_suggest(lambda: time.sleep(0.02))
+    evaluate = profiler.timed_evaluate(lambda: time.sleep(0.01))
+    for _ in range(5):
+        suggest()
+        evaluate()
+    profiler.stop()
+
+    summary = profiler.get_summary()
+    assert summary['iterations'] == 5
+    assert summary['evaluations'] == 5
+    assert summary['suggest_time'] > summary['eval_time']
+    assert 0.5 < summary['overhead_ratio'] < 1
+    print(summary)
+
+
+def test_refit_throttle():
+    profiler = OptimizerProfiler(max_overhead_ratio=0.5, refit_interval=3).start()
+    refits = list()
+    train = profiler.throttled_refit(lambda: refits.append(1))
+    suggest = profiler.timed_suggest(lambda: (train(), time.sleep(0.02)))
+    evaluate = profiler.timed_evaluate(lambda: time.sleep(0.002))
+    for _ in range(9):
+        suggest()
+        evaluate()
+    profiler.stop()
+
+    # The overhead dominates, so the surrogate is refit every 3 suggestions after the first one.
+    assert len(refits) == profiler.refit_cnt == 3
+    assert profiler.skipped_refit_cnt == 6
+
+
+if __name__ == "__main__":
+    test_profile_split()
+    test_refit_throttle()
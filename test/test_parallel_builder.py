@@ -0,0 +1,28 @@
+import numpy as np
+from sklearn.datasets import load_digits
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.model_selection import StratifiedKFold
+from alphaml.engine.components.ensemble.parallel_builder import ParallelEnsembleBuilder
+
+
+def test_parallel_fit():
+    X, y = load_digits(return_X_y=True)
+    splits = list(StratifiedKFold(n_splits=3).split(X, y))
+    jobs = [(DecisionTreeClassifier(max_depth=depth, random_state=1), train)
+            for depth in [4, 8] for train, _ in splits]
+
+    sequential = ParallelEnsembleBuilder(n_jobs=1).fit(jobs, X, y)
+    builder = ParallelEnsembleBuilder(n_jobs=2)
+    assert builder.get_n_jobs(X, len(jobs)) == 2
+    # A second worker does not fit in the memory with a huge limit for each worker.
+    assert ParallelEnsembleBuilder(n_jobs=2, worker_memory_limit=10 ** 9).get_n_jobs(X, len(jobs)) == 1
+    # The workers refit copies of the estimators.
+    parallel = builder.fit(jobs, X, y)
+
+    assert len(parallel) == 6
+    for model_1, model_2 in zip(sequential, parallel):
+        assert np.array_equal(model_1.predict(X), model_2.predict(X))
+
+
+if __name__ == "__main__":
+    test_parallel_fit()
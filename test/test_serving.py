@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import numpy as np
+from urllib.error import HTTPError
+from urllib.request import urlopen, Request
+from sklearn.datasets import load_breast_cancer
+from sklearn.ensemble import RandomForestClassifier
+from alphaml.utils.bundle import BundleWriter
+from alphaml.utils.serving import MicroBatcher, ModelServer
+
+
+def post(address, path, instances):
+    request = Request('http://%s:%d/%s' % (address[0], address[1], path),
+                      data=json.dumps({'instances': instances}).encode('utf8'),
+                      headers={'Content-Type': 'application/json'})
+    return json.loads(urlopen(request).read().decode('utf8'))['predictions']
+
+
+def test_micro_batch():
+    batch_sizes = list()
+
+    def predict(X):
+        batch_sizes.append(len(X))
+        return X.sum(axis=1)
+
+    batcher = MicroBatcher(predict, max_batch_size=16, max_latency=50).start()
+    results = dict()
+
+    def submit(i):
+        results[i] = batcher.submit(np.full((1, 3), i))
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.stop()
+    assert all(results[i][0] == 3 * i for i in range(32))
+    assert max(batch_sizes) <= 16 and len(batch_sizes) < 32
+    assert batcher.get_metrics()['requests'] == 32
+
+
+def test_bad_request():
+    def predict(X):
+        if (X < 0).any():
+            raise ValueError('Negative features')
+        return X.dot(np.arange(3))
+
+    batcher = MicroBatcher(predict, max_batch_size=16, max_latency=50).start()
+    results, errors = dict(), dict()
+
+    def submit(i):
+        try:
+            results[i] = batcher.submit(np.full((1, 2 if i == 3 else 3), -1 if i == 5 else i))
+        except ValueError as err:
+            errors[i] = err
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.stop()
+    # The requests of the wrong width or with invalid values fail alone.
+    assert sorted(errors.keys()) == [3, 5]
+    assert all(results[i][0] == 3 * i for i in range(8) if i not in errors)
+
+
+def test_stop():
+    started, release = threading.Event(), threading.Event()
+
+    def predict(X):
+        started.set()
+        release.wait()
+        return X.sum(axis=1)
+
+    batcher = MicroBatcher(predict, max_batch_size=1, max_latency=1).start()
+    results, errors = dict(), dict()
+
+    def submit(i):
+        try:
+            results[i] = batcher.submit(np.full((1, 3), i))
+        except RuntimeError as err:
+            errors[i] = err
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(4)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    while batcher.queue.qsize() < 3:
+        time.sleep(0.01)
+    stop_thread = threading.Thread(target=batcher.stop)
+    stop_thread.start()
+    while batcher.running:
+        time.sleep(0.01)
+    release.set()
+    stop_thread.join()
+    for thread in threads:
+        thread.join()
+    # The batch being predicted finishes, the queued requests and the later ones fail.
+    assert list(results.keys()) == [0] and sorted(errors.keys()) == [1, 2, 3]
+    try:
+        batcher.submit(np.zeros((1, 3)))
+        assert False
+    except RuntimeError:
+        pass
+
+
+def test_server():
+    X, y = load_breast_cancer(return_X_y=True)
+    model = RandomForestClassifier(n_estimators=20, random_state=1).fit(X, y)
+    server = ModelServer(model, port=0, max_latency=20).start()
+    try:
+        results = dict()
+
+        def request(i):
+            results[i] = post(server.address, 'predict_proba', X[i:i + 1].tolist())
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert np.allclose([results[i][0] for i in range(20)], model.predict_proba(X[:20]))
+        assert post(server.address, 'predict', X[:5].tolist()) == model.predict(X[:5]).tolist()
+        try:
+            post(server.address, 'predict', X[:5, :10].tolist())
+            assert False
+        except HTTPError as err:
+            assert err.code == 400
+
+        metrics = json.loads(urlopen('http://%s:%d/metrics' % server.address[:2]).read().decode('utf8'))
+        print(metrics)
+        assert metrics['predict_proba']['requests'] == 20
+        assert metrics['predict_proba']['batches'] < 20
+    finally:
+        server.shutdown()
+
+
+def test_bundle_server():
+    X, y = load_breast_cancer(return_X_y=True)
+    model = RandomForestClassifier(n_estimators=20, random_state=1).fit(X, y)
+    path = os.path.join(tempfile.mkdtemp(), 'model.bundle')
+    writer = BundleWriter()
+    writer.meta.update({'model_type': 'single', 'members': ['member_0'], 'n_features': X.shape[1]})
+    writer.add_member('member_0', model)
+    writer.write(path)
+
+    # The number of features recorded in the bundle rejects the requests of other widths.
+    server = ModelServer(path, port=0).start()
+    try:
+        assert server.n_features == X.shape[1]
+        assert post(server.address, 'predict', X[:5].tolist()) == model.predict(X[:5]).tolist()
+        try:
+            post(server.address, 'predict', X[:5, :10].tolist())
+            assert False
+        except HTTPError as err:
+            assert err.code == 400
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_micro_batch()
+    test_bad_request()
+    test_stop()
+    test_server()
+    test_bundle_server()
@@ -0,0 +1,74 @@
+import tempfile
+import numpy as np
+from sklearn.datasets import load_digits
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.tree import DecisionTreeClassifier
+from alphaml.engine.components.data_manager import DataManager
+from alphaml.engine.components.ensemble.stacking import Stacking
+
+
+class _Evaluator(object):
+    """Build the estimators of the configurations without a search."""
+    optimizer = 'smac'
+
+    def set_config(self, config, optimizer):
+        if config['estimator'] == 'random_forest':
+            return None, RandomForestClassifier(n_estimators=config['n_estimators'], random_state=1)
+        return None, DecisionTreeClassifier(max_depth=config['max_depth'], random_state=1)
+
+
+def get_stacking(inference_mode, memory_budget=None):
+    configs = [{'estimator': 'decision_tree', 'max_depth': 4},
+               {'estimator': 'decision_tree', 'max_depth': 6},
+               {'estimator': 'random_forest', 'n_estimators': 50}]
+    return Stacking((configs, [0.8, 0.82, 0.9]), 3, 'multiclass', accuracy_score, _Evaluator(),
+                    meta_learner='logistic', kfold=3, save_dir=tempfile.mkdtemp(), memory_budget=memory_budget,
+                    inference_mode=inference_mode)
+
+
+def test_refit():
+    X, y = load_digits(return_X_y=True)
+    stacking = get_stacking('refit').fit(DataManager(X, y))
+    # One model per config, trained on the full data.
+    assert len(stacking.ensemble_models) == len(stacking.config_list) == 3
+    for config, model in zip(stacking.config_list, stacking.ensemble_models):
+        _, estimator = _Evaluator().set_config(config, 'smac')
+        assert np.array_equal(model.predict(X), estimator.fit(X, y).predict(X))
+    assert stacking.get_feature(X).shape == (len(X), 30)
+    assert stacking.predict(X).shape == (len(X),)
+
+
+def test_fold_average():
+    X, y = load_digits(return_X_y=True)
+    stacking = get_stacking('fold_average').fit(DataManager(X, y))
+    assert len(stacking.ensemble_models) == 9
+    # The columns of each config hold the average predictions of its kfold models.
+    feature = stacking.get_feature(X)
+    splits = list(StratifiedKFold(n_splits=3).split(X, y))
+    for i, config in enumerate(stacking.config_list):
+        pred = np.zeros((len(X), 10))
+        for train, _ in splits:
+            _, estimator = _Evaluator().set_config(config, 'smac')
+            pred += estimator.fit(X[train], y[train]).predict_proba(X) / 3
+        assert np.allclose(feature[:, i * 10:(i + 1) * 10], pred)
+    assert stacking.predict_proba(X).shape == (len(X), 10)
+
+
+def test_pruned_modes():
+    X, y = load_digits(return_X_y=True)
+    for inference_mode, model_num in [('refit', 1), ('fold_average', 3)]:
+        # The random forest does not fit in the budget.
+        stacking = get_stacking(inference_mode, memory_budget=0.3).fit(DataManager(X, y))
+        assert 'random_forest' not in [config['estimator'] for config in stacking.config_list]
+        assert 0 < stacking.ensemble_size == len(stacking.config_list) < 3
+        assert len(stacking.ensemble_models) == model_num * stacking.ensemble_size
+        assert stacking.get_feature(X).shape == (len(X), 10 * stacking.ensemble_size)
+        assert stacking.predict(X).shape == (len(X),)
+
+
+if __name__ == "__main__":
+    test_refit()
+    test_fold_average()
+    test_pruned_modes()
@@ -0,0 +1,47 @@
+import pickle
+import numpy as np
+from sklearn.datasets import load_iris, load_breast_cancer, load_diabetes
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, \
+    ExtraTreesRegressor, GradientBoostingClassifier, GradientBoostingRegressor, AdaBoostClassifier, \
+    AdaBoostRegressor
+from alphaml.engine.components.models.tree_compiler import compile_tree_model
+
+
+def test_classifiers():
+    for X, y in [load_breast_cancer(return_X_y=True), load_iris(return_X_y=True)]:
+        for model in [DecisionTreeClassifier(random_state=1), RandomForestClassifier(n_estimators=50, random_state=1),
+                      ExtraTreesClassifier(n_estimators=50, random_state=1),
+                      GradientBoostingClassifier(n_estimators=50, random_state=1),
+                      AdaBoostClassifier(n_estimators=50, random_state=1)]:
+            model.fit(X, y)
+            compiled = compile_tree_model(model)
+            assert np.array_equal(compiled.predict(X), model.predict(X))
+            assert np.allclose(compiled.predict_proba(X), model.predict_proba(X))
+
+
+def test_regressors():
+    X, y = load_diabetes(return_X_y=True)
+    for model in [DecisionTreeRegressor(random_state=1), RandomForestRegressor(n_estimators=50, random_state=1),
+                  ExtraTreesRegressor(n_estimators=50, random_state=1),
+                  GradientBoostingRegressor(n_estimators=50, random_state=1),
+                  AdaBoostRegressor(n_estimators=50, random_state=1)]:
+        model.fit(X, y)
+        assert np.allclose(compile_tree_model(model).predict(X), model.predict(X))
+
+
+def test_small_batch():
+    X, y = load_breast_cancer(return_X_y=True)
+    model = RandomForestClassifier(n_estimators=100, random_state=1).fit(X, y)
+    compiled = compile_tree_model(model)
+    # The nodes of all trees are stored once in flat arrays, smaller than the pickled model.
+    assert len(compiled.feature) == sum(tree.tree_.node_count for tree in model.estimators_)
+    assert compiled.max_depth == max(tree.tree_.max_depth for tree in model.estimators_)
+    assert compiled.get_nbytes() < len(pickle.dumps(model))
+    for i in range(10):
+        assert np.allclose(compiled.predict_proba(X[i:i + 1]), model.predict_proba(X[i:i + 1]))
+
+if __name__ == "__main__":
+    test_classifiers()
+    test_regressors()
+    test_small_batch()
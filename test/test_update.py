@@ -0,0 +1,41 @@
+import tempfile
+import numpy as np
+from sklearn.datasets import load_breast_cancer
+from alphaml.engine.components.data_manager import DataManager
+from alphaml.estimators.classifier import Classifier
+
+
+def test_update():
+    X, y = load_breast_cancer(return_X_y=True)
+    index = np.random.RandomState(1).permutation(len(X))
+    X, y = X[index], y[index]
+    clf = Classifier(optimizer='smbo', ensemble_method='ensemble_selection', ensemble_size=5, cross_valid=False,
+                     include_models=['random_forest', 'extra_trees', 'decision_tree'], seed=1,
+                     save_dir=tempfile.mkdtemp())
+    clf.fit(DataManager(X[:400], y[:400]), metric='acc', runcount=20)
+    previous_configs = clf._ml_engine.optimizer.configs_list
+
+    # The grown data is searched with a fraction of the previous budget, starting from the top configurations.
+    clf.update(DataManager(X[:450], y[:450]), top_k=3)
+    optimizer = clf._ml_engine.optimizer
+    assert len(optimizer.configs_list) <= 6
+    assert all(config in previous_configs for config in optimizer.configs_list[:3])
+    assert clf.score(X[450:], y[450:]) > 0.9
+
+
+def test_consecutive_updates():
+    X, y = load_breast_cancer(return_X_y=True)
+    clf = Classifier(optimizer='smbo', ensemble_method='ensemble_selection', ensemble_size=5, cross_valid=False,
+                     include_models=['random_forest', 'decision_tree'], seed=1, save_dir=tempfile.mkdtemp())
+    clf.fit(DataManager(X[:400], y[:400]), metric='acc', runcount=20)
+
+    # Each update takes a fraction of the budget of the full search, not of the previous update.
+    for end in [450, 500]:
+        clf.update(DataManager(X[:end], y[:end]), top_k=1)
+        assert 2 < len(clf._ml_engine.optimizer.configs_list) <= 4
+        assert clf._ml_engine.search_kwargs['runcount'] == 20
+
+
+if __name__ == "__main__":
+    test_update()
+    test_consecutive_updates()
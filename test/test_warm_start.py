@@ -0,0 +1,76 @@
+import os
+import tempfile
+import numpy as np
+from hyperopt import hp
+from alphaml.engine.components.data_manager import DataManager
+from alphaml.utils.constants import FAILED
+from alphaml.engine.optimizer.warm_start import WarmStartStore, get_meta_features, get_hyperopt_points, \
+    get_canonical_config, get_smac_configurations
+
+
+def test_store():
+    path = os.path.join(tempfile.mkdtemp(), 'warm_start.json')
+    store = WarmStartStore(path, top_k=3)
+    small = get_meta_features(DataManager(np.random.rand(100, 5), np.arange(100) % 2), 'binary')
+    large = get_meta_features(DataManager(np.random.rand(5000, 50), np.arange(5000) % 3), 'multiclass')
+    rf = {'estimator': ('random_forest', {'n_estimators': 100, 'criterion': 'gini'})}
+    knn = {'estimator': ('k_nearest_neighbors', {'n_neighbors': 5})}
+    gb = {'estimator': ('gradient_boosting', {'learning_rate': 0.1})}
+    store.record('small', small, [rf, knn], [0.8, 0.9])
+    store.record('large', large, [gb], [0.95])
+    # The configurations of a dataset are merged over the searches.
+    store.record('small', small, [gb, knn], [0.7, 0.9])
+    assert len(store.records['small']['configs']) == 3
+
+    store = WarmStartStore(path)
+    configs = store.suggest(small, n_configs=3, n_datasets=1)
+    assert configs[0] == ('k_nearest_neighbors', {'n_neighbors': 5})
+    assert configs[1][0] == 'random_forest'
+    configs = store.suggest(small, n_configs=2, n_datasets=2)
+    assert configs == [('k_nearest_neighbors', {'n_neighbors': 5}), ('gradient_boosting', {'learning_rate': 0.1})]
+
+    # The failed configurations are not recorded.
+    store = WarmStartStore(os.path.join(tempfile.mkdtemp(), 'warm_start.json'))
+    store.record('small', small, [rf, knn], [FAILED, 0.9])
+    assert store.suggest(small) == [('k_nearest_neighbors', {'n_neighbors': 5})]
+
+
+def test_hyperopt_points():
+    space = {'random_forest': {'criterion': hp.choice('rf_criterion', ['gini', 'entropy']),
+                               'max_features': hp.uniform('rf_max_features', 0, 1)}}
+    points = get_hyperopt_points(space, [('random_forest', {'criterion': 'entropy', 'max_features': 0.3}),
+                                         ('random_forest', {'criterion': 'mse', 'max_features': 0.3}),
+                                         ('k_nearest_neighbors', {'n_neighbors': 5})])
+    assert points == {'random_forest': [{'rf_criterion': 1, 'rf_max_features': 0.3}]}
+
+
+def test_preprocessing_configs():
+    from ConfigSpace import ConfigurationSpace
+    from ConfigSpace.hyperparameters import UniformIntegerHyperparameter
+    from alphaml.engine.components.components_manager import ComponentsManager
+    from alphaml.engine.components.pipeline.preprocessing_space import get_hyperparameter_search_space
+
+    rf_space = ConfigurationSpace()
+    rf_space.add_hyperparameter(UniformIntegerHyperparameter('n_estimators', 10, 100, default_value=50))
+    preprocessing_space = get_hyperparameter_search_space()
+    config_space = ComponentsManager.build_hierarchical_configspace({'random_forest': rf_space}, preprocessing_space)
+    config_space.seed(1)
+    configs = config_space.sample_configuration(5)
+
+    # The canonical configurations keep the preprocessing searched jointly with the models.
+    path = os.path.join(tempfile.mkdtemp(), 'warm_start.json')
+    store = WarmStartStore(path)
+    meta_features = get_meta_features(DataManager(np.random.rand(100, 5), np.arange(100) % 2), 'binary')
+    store.record('joint', meta_features, configs, [0.5, 0.6, 0.7, 0.8, 0.9])
+    canonical_configs = store.suggest(meta_features, n_configs=5)
+    assert all('preprocessor:scaler' in params for _, params in canonical_configs)
+    assert canonical_configs[0] == get_canonical_config(configs[-1])
+    configurations = get_smac_configurations(config_space, canonical_configs)
+    assert len(configurations) == len(set(configs))
+    assert configurations[0] == configs[-1]
+
+
+if __name__ == "__main__":
+    test_store()
+    test_hyperopt_points()
+    test_preprocessing_configs()